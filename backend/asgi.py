@@ -0,0 +1,292 @@
+"""ASGI entry point.
+
+/api/chat, /api/chat/stream and /health are served natively with asyncio:
+the retrieval chain runs through ``ainvoke``/``astream`` (the OpenAI client
+uses async httpx), so a waiting LLM call does not hold a thread and one
+process can keep hundreds of conversations in flight. Every other route,
+and CORS preflight requests, go to the Flask app.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 8000 --workers 2
+"""
+import os
+import json
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+# a2wsgi (requirements.txt) runs Flask in a thread pool; uvicorn's own WSGI middleware is deprecated
+from a2wsgi import WSGIMiddleware
+
+import main
+from metrics import HTTP_REQUESTS, new_trace_id
+
+logger = logging.getLogger(__name__)
+
+CHAT_ASYNC_CONCURRENCY = int(os.environ.get("CHAT_ASYNC_CONCURRENCY", "200"))
+CHAT_ASYNC_QUEUE_TIMEOUT = float(os.environ.get("CHAT_ASYNC_QUEUE_TIMEOUT", "30"))
+WSGI_THREADS = int(os.environ.get("WSGI_THREADS", "10"))
+
+SYSTEM_ERROR_RESPONSE = main.error_response(main.CHAT_SYSTEM_ERROR_MESSAGE)
+
+
+class ChatBusy(Exception):
+    """No chat slot became free within the queue timeout"""
+
+
+class ConcurrencyLimiter:
+    """Caps the number of chats talking to the LLM at once, the rest wait in line"""
+
+    def __init__(self, limit: int, queue_timeout: float):
+        self.limit = limit
+        self.queue_timeout = queue_timeout
+        self._semaphore = None
+        self._active = 0
+        self._waiting = 0
+        self._peak = 0
+        self._rejected = 0
+
+    @asynccontextmanager
+    async def slot(self):
+        # Created lazily so it belongs to the server's event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.limit)
+
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._rejected += 1
+            raise ChatBusy()
+        finally:
+            self._waiting -= 1
+
+        self._active += 1
+        self._peak = max(self._peak, self._active)
+        try:
+            yield
+        finally:
+            self._active -= 1
+            self._semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'limit': self.limit,
+            'active': self._active,
+            'waiting': self._waiting,
+            'peak': self._peak,
+            'rejected': self._rejected,
+        }
+
+
+chat_limiter = ConcurrencyLimiter(CHAT_ASYNC_CONCURRENCY, CHAT_ASYNC_QUEUE_TIMEOUT)
+wsgi_app = WSGIMiddleware(main.app, workers=WSGI_THREADS)
+
+
+async def read_json(receive) -> Optional[Dict[str, Any]]:
+    """Request body parsed as JSON, None if it is missing or invalid"""
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get('body', b"")
+        if not message.get('more_body'):
+            break
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def response_headers(content_type: str, extra: Optional[Dict[str, str]] = None) -> list:
+    headers = {'content-type': content_type, 'access-control-allow-origin': '*', **(extra or {})}
+    return [(name.encode('latin-1'), value.encode('latin-1')) for name, value in headers.items()]
+
+
+async def send_json(send, status: int, payload: Dict[str, Any]) -> None:
+    body = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': response_headers('application/json')})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def wait_for_startup(send) -> bool:
+    """Hold the request until the app is initialized, sends 503 and returns False on timeout"""
+    if await asyncio.to_thread(main.startup.wait, main.STARTUP_WAIT_TIMEOUT):
+        return True
+    await send({'type': 'http.response.start', 'status': 503, 'headers': response_headers(
+        'application/json', {'retry-after': '5'}
+    )})
+    await send({'type': 'http.response.body', 'body': b'{"error": "Service is starting, try again shortly"}'})
+    return False
+
+
+async def chat(scope, receive, send) -> None:
+    """Async /api/chat, same request and response as the Flask endpoint"""
+    if not await wait_for_startup(send):
+        return
+    try:
+        session_id, user_message, message_count, error = await asyncio.to_thread(
+            main.begin_chat_turn, await read_json(receive)
+        )
+        if error:
+            return await send_json(send, 400, {'error': error})
+
+        history, user_messages = await asyncio.to_thread(main.get_session_history, session_id, message_count)
+
+        start_time = time.monotonic()
+        cache_state = await asyncio.to_thread(main.lookup_cached_response, user_message, message_count)
+        if cache_state['match']:
+            response_data = dict(cache_state['response'])
+        else:
+            response_data = await asyncio.to_thread(main.route_message, user_message)
+            if response_data is None:
+                async with chat_limiter.slot():
+                    response_data = await main.travel_bot.aprocess_message(user_message, history, user_messages)
+        processing_time = time.monotonic() - start_time
+
+        await asyncio.to_thread(main.finish_chat_turn, session_id, user_message, response_data, cache_state)
+
+        await send_json(send, 200, {
+            'response': response_data,
+            'session_id': session_id,
+            'processing_time': processing_time,
+            'cache': cache_state['match'],
+            'timestamp': datetime.now().isoformat()
+        })
+
+    except ChatBusy:
+        await send_json(send, 503, {'response': SYSTEM_ERROR_RESPONSE, 'error': 'Too many concurrent chats'})
+    except Exception as e:
+        logger.error(f"Chat error: {e}")
+        await send_json(send, 500, {'response': SYSTEM_ERROR_RESPONSE, 'error': str(e)})
+
+
+async def chat_stream(scope, receive, send) -> None:
+    """Async /api/chat/stream, same Server-Sent Events as the Flask endpoint"""
+    if not await wait_for_startup(send):
+        return
+    session_id, user_message, message_count, error = await asyncio.to_thread(
+        main.begin_chat_turn, await read_json(receive)
+    )
+    if error:
+        return await send_json(send, 400, {'error': error})
+
+    history, user_messages = await asyncio.to_thread(main.get_session_history, session_id, message_count)
+
+    await send({'type': 'http.response.start', 'status': 200, 'headers': response_headers(
+        'text/event-stream; charset=utf-8', {'cache-control': 'no-cache', 'x-accel-buffering': 'no'}
+    )})
+
+    async def emit(event: str, data: Dict[str, Any]) -> None:
+        await send({'type': 'http.response.body', 'body': main.sse_event(event, data).encode('utf-8'),
+                    'more_body': True})
+
+    start_time = time.monotonic()
+    time_to_first_token = None
+    try:
+        await emit('start', {'session_id': session_id})
+
+        cache_state = await asyncio.to_thread(main.lookup_cached_response, user_message, message_count)
+        routed_response = None
+        if not cache_state['match']:
+            routed_response = await asyncio.to_thread(main.route_message, user_message)
+
+        if cache_state['match']:
+            response_data = dict(cache_state['response'])
+            time_to_first_token = time.monotonic() - start_time
+            await emit('token', {'text': response_data.get('content', '')})
+        elif routed_response is not None:
+            response_data = routed_response
+            time_to_first_token = time.monotonic() - start_time
+            await emit('token', {'text': response_data['content']})
+        else:
+            async with chat_limiter.slot():
+                async for item in main.travel_bot.astream_message(user_message, history, user_messages):
+                    if isinstance(item, dict):
+                        response_data = item
+                        continue
+                    if time_to_first_token is None:
+                        time_to_first_token = time.monotonic() - start_time
+                    await emit('token', {'text': item})
+
+        await asyncio.to_thread(main.finish_chat_turn, session_id, user_message, response_data, cache_state)
+
+        await emit('done', {
+            'response': response_data,
+            'session_id': session_id,
+            'processing_time': time.monotonic() - start_time,
+            'time_to_first_token': time_to_first_token,
+            'cache': cache_state['match'],
+            'timestamp': datetime.now().isoformat()
+        })
+
+    except ChatBusy:
+        await emit('error', {'response': SYSTEM_ERROR_RESPONSE, 'error': 'Too many concurrent chats'})
+    except Exception as e:
+        logger.error(f"Chat stream error: {e}")
+        try:
+            await emit('error', {'response': SYSTEM_ERROR_RESPONSE, 'error': str(e)})
+        except Exception:
+            # Client is gone
+            return
+
+    try:
+        await send({'type': 'http.response.body', 'body': b"", 'more_body': False})
+    except Exception:
+        pass
+
+
+async def health(scope, receive, send) -> None:
+    # Served from memory, cheap enough to run on the event loop
+    status = main.health_status()
+    status['async_chat'] = chat_limiter.stats()
+    await send_json(send, 200, status)
+
+
+async def traced(handler, scope, receive, send) -> None:
+    """Run a native handler under a trace id and record its latency, like the Flask request hooks"""
+    headers = dict(scope.get('headers') or [])
+    trace_id = new_trace_id(headers.get(b'x-request-id', b'').decode('latin-1'))
+    status = 500
+
+    async def send_traced(message) -> None:
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+            message = dict(message, headers=list(message.get('headers', [])) + [(b'x-request-id', trace_id.encode('latin-1'))])
+        await send(message)
+
+    start = time.perf_counter()
+    try:
+        await handler(scope, receive, send_traced)
+    finally:
+        HTTP_REQUESTS.observe(time.perf_counter() - start, method=scope['method'], endpoint=scope['path'], status=status)
+
+
+ROUTES = {
+    ('POST', '/api/chat'): chat,
+    ('POST', '/api/chat/stream'): chat_stream,
+    ('GET', '/health'): health,
+}
+
+
+async def app(scope, receive, send) -> None:
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                # Initialization continues in the background, /health/ready reports when it is done
+                main.startup.start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    handler = ROUTES.get((scope.get('method'), scope.get('path'))) if scope['type'] == 'http' else None
+    if handler:
+        await traced(handler, scope, receive, send)
+    else:
+        await wsgi_app(scope, receive, send)
@@ -0,0 +1,386 @@
+"""Benchmark suite for ingestion, retrieval and chat.
+
+Runs in-process against the configured components (use LLM_PROVIDER=local
+to benchmark without network or quota). Vectors go to a temporary
+Chroma collection and BM25 index, and benchmark rows are deleted from
+travel_packages afterwards, so the real data is not touched.
+
+    python bench.py --output results.json
+    python bench.py --scale 1 4 --sizes 100 1000 5000 --concurrency 1 8 32 --requests 200
+    python bench.py --url --only chat   # server on http://localhost:8000 (python main.py / uvicorn)
+    python bench.py --compare baseline.json results.json
+"""
+import os
+import re
+import math
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Any, Optional, List, Callable, Tuple
+
+CHAT_QUESTIONS = [
+    "Koja putovanja imate za Grčku?",
+    "Koliko košta putovanje u Lisabon?",
+    "Kada su polasci za Portugaliju?",
+    "Preporuči mi putovanje avionom do 1000 eura",
+    "Šta je uključeno u cenu aranžmana?",
+    "Koji hoteli su u ponudi?",
+    "Da li postoji popust za rani booking?",
+    "Koliko traje tura po Portugalu?",
+]
+RETRIEVAL_QUERIES = [
+    "cena aranžmana sa doručkom",
+    "polazak autobusom iz Beograda",
+    "Lisabon Porto 29.04.",
+    "hotel 4* pored plaže",
+    "fakultativni izleti i doplate",
+]
+BENCH_PREFIX = "bench_"
+# python main.py and the uvicorn command in asgi.py both listen here
+DEFAULT_SERVER_URL = "http://localhost:8000"
+
+
+def summarize(samples: List[float]) -> Dict[str, Any]:
+    """Latency summary in milliseconds"""
+    if not samples:
+        return {'count': 0}
+    ordered = sorted(samples)
+
+    def percentile(p: float) -> float:
+        # Nearest-rank percentile
+        index = max(0, math.ceil(p / 100 * len(ordered)) - 1)
+        return round(ordered[index] * 1000, 2)
+
+    return {
+        'count': len(ordered),
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 2),
+        'p50_ms': percentile(50),
+        'p95_ms': percentile(95),
+        'p99_ms': percentile(99),
+        'max_ms': round(ordered[-1] * 1000, 2),
+    }
+
+
+def timed(fn: Callable, *args, **kwargs) -> Tuple[Any, float]:
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def perturb(text: str, seed: int) -> str:
+    """Copy of a document with different numbers, so chunk hashes and cached embeddings differ"""
+    rng = random.Random(seed)
+    return f"Varijanta {seed}\n" + re.sub(r'\d+', lambda match: str(rng.randint(1, 10 ** len(match.group(0)) - 1)), text)
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+
+@contextmanager
+def isolated_stores(main):
+    """Point the app at a temporary vector store and keyword index for the duration.
+
+    The extraction cache is switched off too, so every run measures real LLM calls.
+    """
+    saved = (main.vector_store, main.bm25_index, main.travel_bot, main.response_cache)
+    extraction_cache = main.extractor.cache if main.extractor else None
+    directory = tempfile.mkdtemp(prefix="turbot_bench_")
+    try:
+        if main.embeddings is not None:
+            from langchain_chroma import Chroma
+            main.vector_store = Chroma(
+                collection_name="bench_docs",
+                embedding_function=main.embeddings,
+                persist_directory=directory
+            )
+            main.bm25_index = main.BM25Index(os.path.join(directory, "bm25_index.json"))
+        else:
+            main.vector_store = None
+            main.bm25_index = None
+        main.travel_bot = main.TravelBot()
+        if main.extractor:
+            main.extractor.cache = None
+        yield directory
+    finally:
+        main.vector_store, main.bm25_index, main.travel_bot, main.response_cache = saved
+        if main.extractor:
+            main.extractor.cache = extraction_cache
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def delete_bench_rows(main) -> None:
+    with main.get_db_connection() as conn:
+        if conn is None:
+            return
+        with conn.cursor() as cursor:
+            cursor.execute("DELETE FROM travel_packages WHERE filename LIKE %s", (BENCH_PREFIX + "%",))
+        conn.commit()
+
+
+def load_documents(main, upload_dir: str, limit: Optional[int]) -> Tuple[List[Tuple[str, str]], List[float]]:
+    """(name, text) of the uploaded documents and the time spent reading each"""
+    documents, read_times = [], []
+    names = sorted(name for name in os.listdir(upload_dir)
+                   if main.allowed_file(name)) if os.path.isdir(upload_dir) else []
+    for name in names[:limit]:
+        text, seconds = timed(main.read_file_content, os.path.join(upload_dir, name))
+        read_times.append(seconds)
+        if text.strip():
+            documents.append((name, text))
+    return documents, read_times
+
+
+def bench_ingestion(main, documents: List[Tuple[str, str]], read_times: List[float],
+                    scales: List[int]) -> Dict[str, Any]:
+    """Per-stage timings over the documents, repeated for each synthetic corpus scale"""
+    results = {'documents': len(documents), 'read_file_content': summarize(read_times), 'scales': []}
+    chunker = main.StructuredChunker(max_chars=main.CHUNK_MAX_CHARS)
+
+    for scale in scales:
+        corpus = [(f"{BENCH_PREFIX}{scale}_{copy}_{main.get_source_name(name)}",
+                   text if copy == 0 else perturb(text, copy))
+                  for copy in range(scale) for name, text in documents]
+        stages = {'chunking': [], 'extraction': [], 'db_save': [], 'embedding': []}
+        chunks = characters = 0
+
+        with isolated_stores(main):
+            start = time.perf_counter()
+            for filename, text in corpus:
+                pieces, seconds = timed(chunker.split_page, text)
+                stages['chunking'].append(seconds)
+                chunks += len(pieces)
+                characters += len(text)
+
+                data, seconds = timed(main.extract_structured_data, text, filename)
+                stages['extraction'].append(seconds)
+
+                _, seconds = timed(main.save_to_database, filename, data, text)
+                stages['db_save'].append(seconds)
+
+                if main.vector_store is not None:
+                    sync = main.VectorStoreSync(filename)
+                    start_embedding = time.perf_counter()
+                    sync.feed(text)
+                    sync.finish()
+                    stages['embedding'].append(time.perf_counter() - start_embedding)
+            elapsed = time.perf_counter() - start
+
+        delete_bench_rows(main)
+        results['scales'].append({
+            'scale': scale,
+            'documents': len(corpus),
+            'characters': characters,
+            'chunks': chunks,
+            'elapsed_s': round(elapsed, 3),
+            'documents_per_s': round(len(corpus) / elapsed, 3) if elapsed else None,
+            'stages': {stage: summarize(samples) for stage, samples in stages.items()},
+        })
+    return results
+
+
+def bench_retrieval(main, texts: List[str], sizes: List[int], rounds: int) -> Dict[str, Any]:
+    """Vector and hybrid retrieval latency as the collection grows"""
+    if main.embeddings is None:
+        return {'skipped': 'no embeddings configured'}
+
+    chunker = main.StructuredChunker(max_chars=main.CHUNK_MAX_CHARS)
+    base_chunks = [chunk['text'] for text in texts for chunk in chunker.split_page(text)] or RETRIEVAL_QUERIES
+    results = []
+
+    with isolated_stores(main):
+        added = 0
+        for size in sorted(sizes):
+            batch = [perturb(base_chunks[index % len(base_chunks)], index) for index in range(added, size)]
+            ids = [f"{BENCH_PREFIX}{index}" for index in range(added, size)]
+            for start in range(0, len(batch), 256):
+                main.vector_store.add_texts(batch[start:start + 256], ids=ids[start:start + 256])
+            with main.bm25_index.transaction() as index:
+                for doc_id, text in zip(ids, batch):
+                    index.add(doc_id, text)
+            added = size
+
+            retriever = main.HybridRetriever(vector_store=main.vector_store, bm25_index=main.bm25_index,
+                                             k=main.RETRIEVAL_K, fetch_k=main.RETRIEVAL_FETCH_K)
+            vector_times, keyword_times, hybrid_times = [], [], []
+            for _ in range(rounds):
+                for query in RETRIEVAL_QUERIES:
+                    vector_times.append(timed(main.vector_store.similarity_search, query, k=main.RETRIEVAL_FETCH_K)[1])
+                    keyword_times.append(timed(main.bm25_index.search, query, k=main.RETRIEVAL_FETCH_K)[1])
+                    hybrid_times.append(timed(retriever.invoke, query)[1])
+
+            results.append({
+                'collection_size': size,
+                'vector': summarize(vector_times),
+                'bm25': summarize(keyword_times),
+                'hybrid': summarize(hybrid_times),
+            })
+    return {'sizes': results}
+
+
+def bench_chat(main, concurrency_levels: List[int], requests: int, url: Optional[str],
+               use_cache: bool) -> Dict[str, Any]:
+    """/api/chat latency percentiles and throughput under concurrent load"""
+    if url:
+        import httpx
+        client_factory = lambda: httpx.Client(base_url=url, timeout=120)
+        post = lambda client, payload: client.post('/api/chat', json=payload)
+    else:
+        client_factory = main.app.test_client
+        post = lambda client, payload: client.post('/api/chat', json=payload)
+
+    results = []
+    saved_cache = main.response_cache
+    if not use_cache:
+        main.response_cache = None
+    try:
+        for concurrency in concurrency_levels:
+            latencies, errors = [], 0
+            lock = threading.Lock()
+            local = threading.local()
+
+            def one(index: int) -> None:
+                nonlocal errors
+                if not hasattr(local, 'client'):
+                    local.client = client_factory()
+                payload = {'message': CHAT_QUESTIONS[index % len(CHAT_QUESTIONS)]}
+                start = time.perf_counter()
+                try:
+                    ok = post(local.client, payload).status_code == 200
+                except Exception:
+                    ok = False
+                elapsed = time.perf_counter() - start
+                with lock:
+                    latencies.append(elapsed)
+                    errors += 0 if ok else 1
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                list(pool.map(one, range(requests)))
+            elapsed = time.perf_counter() - start
+
+            results.append({
+                'concurrency': concurrency,
+                'requests': requests,
+                'errors': errors,
+                'elapsed_s': round(elapsed, 3),
+                'requests_per_s': round(requests / elapsed, 3) if elapsed else None,
+                'latency': summarize(latencies),
+            })
+    finally:
+        main.response_cache = saved_cache
+    return {'target': url or 'in-process', 'levels': results}
+
+
+def flatten(data: Any, prefix: str = "") -> Dict[str, float]:
+    """Numeric leaves keyed by path; list items are keyed by their scale/size/concurrency"""
+    values = {}
+    if isinstance(data, dict):
+        for key, value in data.items():
+            values.update(flatten(value, f"{prefix}.{key}" if prefix else key))
+    elif isinstance(data, list):
+        for index, item in enumerate(data):
+            label = index
+            if isinstance(item, dict):
+                for key in ('scale', 'collection_size', 'concurrency'):
+                    if key in item:
+                        label = f"{key}={item[key]}"
+                        break
+            values.update(flatten(item, f"{prefix}[{label}]"))
+    elif isinstance(data, (int, float)) and not isinstance(data, bool):
+        values[prefix] = data
+    return values
+
+
+def compare(baseline_path: str, current_path: str) -> None:
+    """Print the relative change of every metric present in both result files"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = flatten(json.load(f).get('results', {}))
+    with open(current_path, encoding='utf-8') as f:
+        current = flatten(json.load(f).get('results', {}))
+
+    for key in sorted(baseline.keys() & current.keys()):
+        old, new = baseline[key], current[key]
+        change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+        print(f"{key:<70} {old:>12} {new:>12} {change:>9}")
+
+
+def main_cli(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="TurBot backend benchmarks")
+    parser.add_argument('--only', nargs='+', choices=['ingestion', 'retrieval', 'chat'],
+                        default=['ingestion', 'retrieval', 'chat'])
+    parser.add_argument('--uploads', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads'))
+    parser.add_argument('--max-documents', type=int, default=None)
+    parser.add_argument('--scale', type=int, nargs='+', default=[1, 4],
+                        help="synthetic corpus sizes as multiples of the upload folder")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 5000],
+                        help="collection sizes (chunks) for the retrieval benchmark")
+    parser.add_argument('--rounds', type=int, default=5, help="retrieval query rounds per size")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--requests', type=int, default=100, help="chat requests per concurrency level")
+    parser.add_argument('--url', nargs='?', const=DEFAULT_SERVER_URL, default=None,
+                        help=f"benchmark chat against a running server instead of in-process (default {DEFAULT_SERVER_URL})")
+    parser.add_argument('--with-cache', action='store_true', help="keep the chat response cache enabled")
+    parser.add_argument('--output', default=None, help="write JSON results here instead of stdout")
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'))
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import main
+    main.startup.wait()
+
+    documents, read_times = load_documents(main, args.uploads, args.max_documents)
+    results = {}
+    if 'ingestion' in args.only:
+        results['ingestion'] = bench_ingestion(main, documents, read_times, args.scale)
+    if 'retrieval' in args.only:
+        results['retrieval'] = bench_retrieval(main, [text for _, text in documents], args.sizes, args.rounds)
+    if 'chat' in args.only:
+        with isolated_stores(main):
+            if main.vector_store is not None and not args.url:
+                for name, text in documents:
+                    sync = main.VectorStoreSync(BENCH_PREFIX + name)
+                    sync.feed(text)
+                    sync.finish()
+                main.travel_bot = main.TravelBot()
+            results['chat'] = bench_chat(main, args.concurrency, args.requests, args.url, args.with_cache)
+
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'llm_provider': main.LLM_PROVIDER,
+        'llm_available': main.llm is not None,
+        'embeddings_available': main.embeddings is not None,
+        'parameters': vars(args),
+        'results': results,
+    }
+    output = json.dumps(report, ensure_ascii=False, indent=2, default=str)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main_cli())
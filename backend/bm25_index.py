@@ -0,0 +1,247 @@
+import os
+import re
+import json
+import math
+import fcntl
+import threading
+import logging
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, List, Tuple, Iterable
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from keyword_matcher import fold
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r'\d+(?:[.,/]\d+)*|\w+')
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased, diacritic-insensitive tokens; dates also yield their day.month prefix"""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(fold(text)):
+        tokens.append(token)
+        # "29.04.2025" should also match a query for "29.04."
+        parts = token.split('.')
+        if len(parts) == 3 and all(part.isdigit() for part in parts):
+            tokens.append(f"{parts[0]}.{parts[1]}")
+    return tokens
+
+
+def matches_where(metadata: Dict[str, Any], where: Dict[str, Any]) -> bool:
+    """Evaluate a Chroma ``where`` clause ($and, $or, $eq, $in and plain equality) on chunk metadata"""
+    for key, condition in where.items():
+        if key == '$and':
+            matched = all(matches_where(metadata, clause) for clause in condition)
+        elif key == '$or':
+            matched = any(matches_where(metadata, clause) for clause in condition)
+        elif isinstance(condition, dict) and '$in' in condition:
+            matched = metadata.get(key) in condition['$in']
+        elif isinstance(condition, dict):
+            matched = metadata.get(key) == condition.get('$eq')
+        else:
+            matched = metadata.get(key) == condition
+        if not matched:
+            return False
+    return True
+
+
+class BM25Index:
+    """In-process inverted index with BM25 scoring, persisted as JSON.
+
+    Mutations go through ``transaction()`` which takes an exclusive file lock,
+    reloads the file if another process changed it and saves on exit, so all
+    gunicorn workers converge on the same index. Readers reload lazily when
+    the file's mtime changes.
+    """
+
+    def __init__(self, path: str, k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+
+        self._lock = threading.RLock()
+        self._mtime = None
+        self._reset()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._reload_if_changed()
+
+    def _reset(self) -> None:
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        self.postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def _reload_if_changed(self) -> None:
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+
+        with self._lock:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.error(f"Could not load BM25 index {self.path}: {e}")
+                return
+
+            self._reset()
+            for doc_id, doc in data.get('docs', {}).items():
+                self._add(doc_id, doc['text'], doc.get('metadata', {}))
+            self._mtime = mtime
+
+    def _save(self) -> None:
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'docs': {
+                doc_id: {'text': doc['text'], 'metadata': doc['metadata']}
+                for doc_id, doc in self.docs.items()
+            }}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self._mtime = os.stat(self.path).st_mtime_ns
+
+    @contextmanager
+    def transaction(self):
+        """Exclusive, cross-process mutation scope; the index is saved on success"""
+        with self._lock:
+            with open(f"{self.path}.lock", 'w') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    self._reload_if_changed()
+                    try:
+                        yield self
+                    except Exception:
+                        # Drop partial in-memory changes
+                        self._mtime = None
+                        self._reset()
+                        self._reload_if_changed()
+                        raise
+                    self._save()
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _add(self, doc_id: str, text: str, metadata: Dict[str, Any]) -> None:
+        if doc_id in self.docs:
+            self._remove(doc_id)
+
+        term_counts = Counter(tokenize(text))
+        for term, count in term_counts.items():
+            self.postings[term][doc_id] = count
+        length = sum(term_counts.values())
+        self.docs[doc_id] = {'text': text, 'metadata': metadata, 'length': length, 'terms': list(term_counts)}
+        self.total_length += length
+
+    def _remove(self, doc_id: str) -> None:
+        doc = self.docs.pop(doc_id, None)
+        if not doc:
+            return
+        for term in doc['terms']:
+            postings = self.postings.get(term)
+            if postings:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self.postings[term]
+        self.total_length -= doc['length']
+
+    def add(self, doc_id: str, text: str, metadata: Optional[Dict[str, Any]] = None) -> None:
+        """Add or replace a chunk (call inside ``transaction()``)"""
+        self._add(doc_id, text, metadata or {})
+
+    def remove(self, doc_ids: Iterable[str]) -> None:
+        """Remove chunks (call inside ``transaction()``)"""
+        for doc_id in doc_ids:
+            self._remove(doc_id)
+
+    def update_metadata(self, doc_id: str, metadata: Dict[str, Any]) -> None:
+        """Replace a chunk's metadata without re-tokenizing it (call inside ``transaction()``)"""
+        doc = self.docs.get(doc_id)
+        if doc:
+            doc['metadata'] = metadata
+
+    def search(self, query: str, k: int = 10, where: Optional[Dict[str, Any]] = None) -> List[Tuple[str, float]]:
+        """Top-k (doc_id, score) pairs for the query, only chunks matching the Chroma-style ``where``"""
+        self._reload_if_changed()
+
+        with self._lock:
+            n_docs = len(self.docs)
+            if not n_docs:
+                return []
+            avg_length = self.total_length / n_docs
+
+            scores: Dict[str, float] = defaultdict(float)
+            allowed: Dict[str, bool] = {}
+            for term in set(tokenize(query)):
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    if where and not allowed.setdefault(doc_id, matches_where(self.docs[doc_id]['metadata'], where)):
+                        continue
+                    length_norm = 1 - self.b + self.b * self.docs[doc_id]['length'] / avg_length
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + self.k1 * length_norm)
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def get_document(self, doc_id: str) -> Optional[Document]:
+        with self._lock:
+            doc = self.docs.get(doc_id)
+            if not doc:
+                return None
+            return Document(page_content=doc['text'], metadata=dict(doc['metadata']), id=doc_id)
+
+
+class HybridRetriever(BaseRetriever):
+    """Vector + BM25 retrieval fused with reciprocal rank fusion"""
+
+    vector_store: Any
+    bm25_index: Any
+    k: int = 4
+    fetch_k: int = 10
+    rrf_k: int = 60
+
+    @staticmethod
+    def _doc_key(doc: Document) -> str:
+        if getattr(doc, 'id', None):
+            return doc.id
+        metadata = doc.metadata
+        if metadata.get('source_name') and metadata.get('chunk_hash'):
+            return f"{metadata['source_name']}:{metadata['chunk_hash']}"
+        return doc.page_content
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun,
+                                filter: Optional[Dict[str, Any]] = None) -> List[Document]:
+        """Fused results; ``filter`` is a Chroma where clause applied to both searches"""
+        search_kwargs = {'filter': filter} if filter else {}
+        vector_docs = self.vector_store.similarity_search(query, k=self.fetch_k, **search_kwargs)
+        keyword_hits = self.bm25_index.search(query, k=self.fetch_k, where=filter)
+
+        scores: Dict[str, float] = defaultdict(float)
+        documents: Dict[str, Document] = {}
+
+        for rank, doc in enumerate(vector_docs):
+            key = self._doc_key(doc)
+            scores[key] += 1.0 / (self.rrf_k + rank + 1)
+            documents.setdefault(key, doc)
+
+        for rank, (doc_id, _) in enumerate(keyword_hits):
+            scores[doc_id] += 1.0 / (self.rrf_k + rank + 1)
+            if doc_id not in documents:
+                doc = self.bm25_index.get_document(doc_id)
+                if doc:
+                    documents[doc_id] = doc
+
+        ranked = sorted(scores, key=lambda key: scores[key], reverse=True)
+        return [documents[key] for key in ranked if key in documents][:self.k]
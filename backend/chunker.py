@@ -0,0 +1,152 @@
+import re
+import hashlib
+from typing import Dict, Any, List
+
+# "PROGRAM PUTOVANJA:", "ARANŽMAN NE OBUHVATA:", "3. Dan (28.04.2025) COSTA BRAVA"
+HEADING_PATTERN = re.compile(r'^(?:[A-ZČĆŠŽĐ][A-ZČĆŠŽĐ0-9 ,.\-–()/]{3,80}:?|\d{1,2}\s*\.\s*dana?\b.{0,100})$', re.IGNORECASE)
+UPPERCASE_PATTERN = re.compile(r'[a-zčćšžđ]')
+# Price-list rows: "Hotel H Top Olympic 3* - Calella", "499 479 eur", "899€"
+TABLE_ROW_PATTERN = re.compile(r'^(?:hotel\b.*\d\s*\*.*|[\d.,\s]+(?:€|eur[ao]?)|.{0,60}\d\s*(?:€|eur[ao]?)(?:\s*/.*)?)$', re.IGNORECASE)
+SENTENCE_END_PATTERN = re.compile(r'(?<=[.!?])\s+')
+
+
+def _is_heading(line: str) -> bool:
+    if not HEADING_PATTERN.match(line):
+        return False
+    # Day headers may be mixed case, other headings are all caps
+    return bool(re.match(r'^\d', line)) or not UPPERCASE_PATTERN.search(line)
+
+
+def _blocks(text: str) -> List[tuple]:
+    """(kind, text) blocks of one page: heading lines, table row runs and paragraphs"""
+    blocks: List[tuple] = []
+    kind, lines = None, []
+
+    def close():
+        if lines:
+            blocks.append((kind, "\n".join(lines)))
+
+    for raw in text.splitlines():
+        line = raw.rstrip()
+        stripped = line.strip()
+        if not stripped:
+            # Blank lines separate paragraphs, but not the rows of a table
+            if kind == 'text':
+                close()
+                kind, lines = None, []
+            continue
+
+        if _is_heading(stripped):
+            close()
+            blocks.append(('heading', stripped))
+            kind, lines = None, []
+            continue
+
+        line_kind = 'table' if TABLE_ROW_PATTERN.match(stripped) else 'text'
+        if line_kind != kind:
+            close()
+            kind, lines = line_kind, []
+        lines.append(line)
+    close()
+    return blocks
+
+
+def _split_long(text: str, max_chars: int) -> List[str]:
+    """Pieces of at most max_chars, cut at line ends, then sentence ends, then anywhere"""
+    units = []  # (separator, text)
+    for line in text.split("\n"):
+        if len(line) <= max_chars:
+            units.append(("\n", line))
+            continue
+        for number, sentence in enumerate(SENTENCE_END_PATTERN.split(line)):
+            for start in range(0, len(sentence), max_chars):
+                separator = "" if start else ("\n" if number == 0 else " ")
+                units.append((separator, sentence[start:start + max_chars]))
+
+    pieces, current = [], ""
+    for separator, unit in units:
+        if current and len(current) + len(separator) + len(unit) > max_chars:
+            pieces.append(current)
+            current = ""
+        current = f"{current}{separator}{unit}" if current else unit
+    if current.strip():
+        pieces.append(current)
+    return pieces
+
+
+class StructuredChunker:
+    """Splits document pages into retrieval chunks along the document's structure.
+
+    A chunk never spans two pages. Sections (a heading such as "ARANŽMAN
+    OBUHVATA:" or "3. Dan ..." and what follows it) are packed whole into
+    chunks of up to ``max_chars``; only a section longer than that is
+    split, between paragraphs and table runs first, so a hotel line stays
+    with its price row. Chunks do not overlap: a split section repeats its
+    heading in each piece instead, so the continuation still says what it
+    is about.
+    """
+
+    def __init__(self, max_chars: int = 1000):
+        self.max_chars = max_chars
+
+    def split_page(self, text: str) -> List[Dict[str, Any]]:
+        """Chunks of one page: text plus the first heading in it"""
+        sections: List[tuple] = []  # (heading, blocks)
+        for kind, block in _blocks(text):
+            if kind == 'heading' or not sections:
+                sections.append((block if kind == 'heading' else None, [] if kind == 'heading' else [block]))
+            else:
+                sections[-1][1].append(block)
+
+        chunks: List[Dict[str, Any]] = []
+        current, current_section = "", None
+
+        def emit():
+            nonlocal current, current_section
+            if current.strip():
+                chunks.append({'text': current.strip(), 'section': current_section})
+            current, current_section = "", None
+
+        for heading, blocks in sections:
+            whole = "\n".join(([heading] if heading else []) + blocks)
+            # Whole sections are packed together while they fit
+            if len(whole) <= self.max_chars:
+                if current and len(current) + len(whole) + 1 > self.max_chars:
+                    emit()
+                current = f"{current}\n{whole}" if current else whole
+                current_section = current_section or heading
+                continue
+
+            # A section too long for one chunk splits between blocks, then table rows, lines or sentences
+            emit()
+            repeated = heading if heading and len(heading) < self.max_chars // 4 else ""
+            current, current_section = heading or "", heading
+            limit = self.max_chars - len(repeated) - 1
+            for block in blocks:
+                for piece in [block] if len(block) <= limit else _split_long(block, limit):
+                    if current and len(current) + len(piece) + 1 > self.max_chars:
+                        emit()
+                        current, current_section = repeated, heading
+                    current = f"{current}\n{piece}" if current else piece
+        emit()
+        return chunks
+
+    def split_pages(self, pages: List[tuple]) -> List[Dict[str, Any]]:
+        """Chunks of (page_number, text) pages with page and position in the document"""
+        chunks = []
+        for page_number, text in pages:
+            for chunk in self.split_page(text or ""):
+                chunk['page'] = page_number
+                chunk['position'] = len(chunks)
+                chunks.append(chunk)
+        return chunks
+
+
+def chunk_id(source_name: str, page: int, index: int, text: str) -> str:
+    """Deterministic id from the document, the chunk's place on its page and its content.
+
+    The position is per page, so an edit on one page leaves the ids of
+    chunks on other pages unchanged.
+    """
+    digest = hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+    return f"{source_name}:p{page}:{index}:{digest}"
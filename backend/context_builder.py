@@ -0,0 +1,293 @@
+import os
+import re
+import html
+import json
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, List, Callable
+
+logger = logging.getLogger(__name__)
+
+HTML_TAG_PATTERN = re.compile(r'<[^>]+>')
+
+
+class TokenCounter:
+    """Token counting with the model's tiktoken encoding.
+
+    The encoding is loaded on first use; if it is not available (tiktoken
+    missing or its BPE file cannot be downloaded) counts fall back to an
+    estimate of four characters per token.
+    """
+
+    CHARS_PER_TOKEN = 4
+
+    def __init__(self, model: str):
+        self.model = model
+        self._encoding = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _get_encoding(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    try:
+                        import tiktoken
+                        try:
+                            self._encoding = tiktoken.encoding_for_model(self.model)
+                        except KeyError:
+                            self._encoding = tiktoken.get_encoding("o200k_base")
+                    except Exception as e:
+                        logger.warning(f"tiktoken encoding unavailable, estimating token counts: {e}")
+                    self._loaded = True
+        return self._encoding
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        encoding = self._get_encoding()
+        if encoding is None:
+            return (len(text) + self.CHARS_PER_TOKEN - 1) // self.CHARS_PER_TOKEN
+        return len(encoding.encode(text, disallowed_special=()))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Longest prefix of the text that fits in max_tokens"""
+        if max_tokens <= 0:
+            return ""
+        encoding = self._get_encoding()
+        if encoding is None:
+            return text[:max_tokens * self.CHARS_PER_TOKEN]
+        tokens = encoding.encode(text, disallowed_special=())
+        return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+
+
+def message_text(message: Dict[str, Any]) -> str:
+    """One history line; bot answers are reduced from their JSON/HTML to plain text"""
+    content = message['content']
+    if message['role'] == 'assistant':
+        try:
+            content = json.loads(content).get('content', content)
+        except (ValueError, AttributeError):
+            pass
+        content = html.unescape(HTML_TAG_PATTERN.sub(' ', content))
+    content = re.sub(r'\s+', ' ', content).strip()
+    role = "Korisnik" if message['role'] == 'user' else "TurBot"
+    return f"{role}: {content}"
+
+
+class ContextBuilder:
+    """Packs retrieved chunks and conversation history into token budgets.
+
+    Chunks are taken in retrieval order; exact duplicates and chunks
+    contained in an already selected one are dropped, and text shared with
+    a selected chunk (the splitter's overlap) is cut off. History keeps the
+    running summary of older turns plus as many recent messages as fit.
+    """
+
+    min_truncated_tokens = 50
+
+    def __init__(self, counter: TokenCounter, context_tokens: int = 1500, history_tokens: int = 500,
+                 min_overlap: int = 50, max_overlap: int = 400):
+        self.counter = counter
+        self.context_tokens = context_tokens
+        self.history_tokens = history_tokens
+        self.min_overlap = min_overlap
+        self.max_overlap = max_overlap
+
+        self._lock = threading.Lock()
+        self._prompts = 0
+        self._context_tokens_total = 0
+        self._histories = 0
+        self._history_tokens_total = 0
+        self._chunks_deduplicated = 0
+        self._chunks_dropped = 0
+        self._messages_dropped = 0
+
+    def _overlap(self, first: str, second: str) -> int:
+        """Length of the longest suffix of ``first`` that is a prefix of ``second``"""
+        probe = second[:self.min_overlap]
+        if len(probe) < self.min_overlap:
+            return 0
+        tail = first[-self.max_overlap:]
+        start = tail.find(probe)
+        while start != -1:
+            if second.startswith(tail[start:]):
+                return len(tail) - start
+            start = tail.find(probe, start + 1)
+        return 0
+
+    def _strip_overlaps(self, text: str, selected: List[str]) -> str:
+        for other in selected:
+            head = self._overlap(other, text)
+            if head:
+                text = text[head:].strip()
+            tail = self._overlap(text, other)
+            if tail:
+                text = text[:-tail].strip()
+        return text
+
+    def pack_documents(self, docs: List[Any]) -> str:
+        """Context text from retrieved documents within the context token budget"""
+        selected: List[str] = []
+        used = 0
+        deduplicated = dropped = 0
+
+        for position, doc in enumerate(docs):
+            text = (getattr(doc, 'page_content', doc) or "").strip()
+            if not text or any(text in other for other in selected):
+                deduplicated += 1
+                continue
+
+            stripped = self._strip_overlaps(text, selected)
+            if len(stripped) < len(text):
+                deduplicated += 1
+            if not stripped:
+                continue
+
+            tokens = self.counter.count(stripped)
+            remaining = self.context_tokens - used
+            if tokens > remaining:
+                # Keep a meaningful head of the chunk, drop everything after it
+                if remaining >= self.min_truncated_tokens:
+                    head = self.counter.truncate(stripped, remaining)
+                    selected.append(head)
+                    used += self.counter.count(head)
+                    position += 1
+                dropped += len(docs) - position
+                break
+
+            selected.append(stripped)
+            used += tokens
+
+        with self._lock:
+            self._prompts += 1
+            self._context_tokens_total += used
+            self._chunks_deduplicated += deduplicated
+            self._chunks_dropped += dropped
+        return "\n\n".join(selected)
+
+    def build_history(self, summary: str, messages: List[Dict[str, Any]]) -> str:
+        """History text: summary of older turns followed by the most recent messages that fit"""
+        budget = self.history_tokens
+        summary_text = ""
+        if summary:
+            # The summary may take at most half of the budget
+            summary_text = "Sažetak ranijeg razgovora: " + self.counter.truncate(summary, budget // 2)
+            budget -= self.counter.count(summary_text)
+
+        lines: List[str] = []
+        for message in reversed(messages):
+            line = message_text(message)
+            tokens = self.counter.count(line)
+            if tokens > budget:
+                break
+            lines.append(line)
+            budget -= tokens
+
+        with self._lock:
+            self._histories += 1
+            self._history_tokens_total += self.history_tokens - budget
+            self._messages_dropped += len(messages) - len(lines)
+        return "\n".join(([summary_text] if summary_text else []) + list(reversed(lines)))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'prompts': self._prompts,
+                'context_token_budget': self.context_tokens,
+                'history_token_budget': self.history_tokens,
+                'avg_context_tokens': round(self._context_tokens_total / self._prompts, 1) if self._prompts else 0.0,
+                'avg_history_tokens': round(self._history_tokens_total / self._histories, 1) if self._histories else 0.0,
+                'chunks_deduplicated': self._chunks_deduplicated,
+                'chunks_dropped': self._chunks_dropped,
+                'history_messages_dropped': self._messages_dropped,
+            }
+
+
+class HistorySummarizer:
+    """Folds messages older than the recent window into the session's running summary.
+
+    Runs in a background thread after each turn, so the summary is updated
+    incrementally (previous summary + newly aged messages) and never adds
+    latency to a chat request. With a counter, the LLM is only called once
+    the unsummarized history exceeds ``token_budget`` and at least
+    ``batch_messages`` messages have aged, so one call folds several turns.
+    """
+
+    def __init__(self, store, summarize_fn: Callable[[str, str], str], recent_messages: int = 4,
+                 counter: Optional[TokenCounter] = None, token_budget: int = 500, batch_messages: int = 4):
+        self.store = store
+        self.summarize_fn = summarize_fn
+        self.recent_messages = recent_messages
+        self.counter = counter
+        self.token_budget = token_budget
+        self.batch_messages = batch_messages
+
+        self._lock = threading.Lock()
+        self._executor = None
+        self._executor_pid = None
+        self._inflight = set()
+        self._summaries = 0
+        self._skipped = 0
+        self._errors = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-summary")
+                self._executor_pid = os.getpid()
+                self._inflight = set()
+            return self._executor
+
+    def schedule(self, session_id: str) -> None:
+        """Update the session summary in the background if messages left the recent window"""
+        executor = self._get_executor()
+        with self._lock:
+            if session_id in self._inflight:
+                return
+            self._inflight.add(session_id)
+        executor.submit(self._run, session_id)
+
+    def _run(self, session_id: str) -> None:
+        try:
+            self.summarize(session_id)
+        except Exception as e:
+            logger.error(f"History summary error for session {session_id}: {e}")
+            with self._lock:
+                self._errors += 1
+        finally:
+            with self._lock:
+                self._inflight.discard(session_id)
+
+    def summarize(self, session_id: str) -> bool:
+        """Fold aged messages into the summary now, returns whether it changed"""
+        summary, summary_upto = self.store.get_summary(session_id)
+        messages = [message for message in self.store.get_messages(session_id)
+                    if message.get('seq', 0) > summary_upto]
+        aged = messages[:-self.recent_messages] if self.recent_messages else messages
+        if not aged:
+            return False
+
+        if self.counter is not None:
+            history_tokens = self.counter.count(summary) + sum(
+                self.counter.count(message_text(message)) for message in messages)
+            # The history still fits, or too few messages aged to be worth an LLM call
+            if history_tokens <= self.token_budget or len(aged) < self.batch_messages:
+                with self._lock:
+                    self._skipped += 1
+                return False
+
+        transcript = "\n".join(message_text(message) for message in aged)
+        new_summary = self.summarize_fn(summary, transcript)
+        if not new_summary:
+            return False
+
+        self.store.set_summary(session_id, new_summary, aged[-1]['seq'])
+        with self._lock:
+            self._summaries += 1
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'summaries': self._summaries, 'skipped': self._skipped, 'errors': self._errors}
@@ -0,0 +1,252 @@
+import os
+import time
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, List
+
+import psycopg2
+from psycopg2 import extensions
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be checked out in time"""
+
+
+class ConnectionPool:
+    """Thread-safe PostgreSQL connection pool.
+
+    Connections are handed out LIFO so the hottest ones stay warm, checked
+    with a cheap ``SELECT 1`` when they have been idle for a while, and idle
+    connections above ``min_size`` are closed after ``idle_timeout`` seconds.
+    ``timeout`` bounds the wait for a free slot, ``connect_timeout`` the
+    opening of a new connection.
+    """
+
+    def __init__(self, dsn: Optional[str], min_size: int = 1, max_size: int = 10,
+                 timeout: float = 5.0, idle_timeout: float = 300.0,
+                 health_check_after: float = 30.0, connect_timeout: int = 5):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Invalid pool size configuration")
+
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+        self.connect_timeout = connect_timeout
+
+        self._lock = threading.Condition()
+        self._idle: List[tuple] = []  # (connection, returned_at)
+        self._in_use = set()
+        self._opening = 0
+        self._closed = False
+
+        # Stats
+        self._waiters = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._connections_opened = 0
+        self._connections_closed = 0
+        self._failed_health_checks = 0
+        self._total_wait_time = 0.0
+        self._max_wait_time = 0.0
+
+        for _ in range(min_size):
+            try:
+                conn = self._connect()
+            except Exception as e:
+                logger.error(f"Database pool prefill error: {e}")
+                break
+            self._idle.append((conn, time.monotonic()))
+
+    def _connect(self):
+        # Without a timeout an unreachable host blocks the calling thread for minutes
+        conn = psycopg2.connect(self.dsn, connect_timeout=self.connect_timeout)
+        with self._lock:
+            self._connections_opened += 1
+        return conn
+
+    def _discard(self, conn) -> None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._connections_closed += 1
+
+    def _is_healthy(self, conn, idle_for: float) -> bool:
+        if conn.closed:
+            return False
+        if idle_for < self.health_check_after:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _reap_idle(self) -> List[Any]:
+        """Remove expired idle connections; caller must hold the lock"""
+        now = time.monotonic()
+        total = len(self._idle) + len(self._in_use) + self._opening
+        expired = []
+        # Oldest connections sit at the front of the LIFO stack
+        while self._idle and total > self.min_size and now - self._idle[0][1] > self.idle_timeout:
+            conn, _ = self._idle.pop(0)
+            expired.append(conn)
+            total -= 1
+        return expired
+
+    def getconn(self, timeout: Optional[float] = None):
+        """Check out a connection, waiting up to ``timeout`` seconds"""
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        while True:
+            candidate = None
+            expired = []
+            open_new = False
+
+            with self._lock:
+                if self._closed:
+                    raise PoolTimeout("Connection pool is closed")
+
+                while True:
+                    expired = self._reap_idle()
+                    if self._idle:
+                        candidate = self._idle.pop()
+                        self._in_use.add(candidate[0])
+                        break
+                    if len(self._in_use) + self._opening < self.max_size:
+                        self._opening += 1
+                        open_new = True
+                        break
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeout(f"No database connection available within {timeout}s")
+                    self._waiters += 1
+                    try:
+                        self._lock.wait(remaining)
+                    finally:
+                        self._waiters -= 1
+
+            for conn in expired:
+                self._discard(conn)
+
+            if open_new:
+                conn = None
+                try:
+                    conn = self._connect()
+                finally:
+                    with self._lock:
+                        self._opening -= 1
+                        if conn is not None:
+                            self._in_use.add(conn)
+                        self._lock.notify()
+            else:
+                conn, returned_at = candidate
+                if not self._is_healthy(conn, time.monotonic() - returned_at):
+                    with self._lock:
+                        self._in_use.discard(conn)
+                        self._failed_health_checks += 1
+                        self._lock.notify()
+                    self._discard(conn)
+                    continue
+
+            wait_time = time.monotonic() - started
+            with self._lock:
+                self._checkouts += 1
+                self._total_wait_time += wait_time
+                self._max_wait_time = max(self._max_wait_time, wait_time)
+            return conn
+
+    def putconn(self, conn, close: bool = False) -> None:
+        """Return a connection to the pool"""
+        if not close and not conn.closed:
+            try:
+                status = conn.get_transaction_status()
+                if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                    close = True
+                elif status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                close = True
+
+        with self._lock:
+            self._in_use.discard(conn)
+            if close or conn.closed or self._closed:
+                discard = True
+            else:
+                discard = False
+                self._idle.append((conn, time.monotonic()))
+            expired = self._reap_idle()
+            self._lock.notify()
+
+        if discard:
+            self._discard(conn)
+        for expired_conn in expired:
+            self._discard(expired_conn)
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None):
+        """Borrow a connection for the duration of a ``with`` block"""
+        conn = self.getconn(timeout)
+        try:
+            yield conn
+        except Exception:
+            self.putconn(conn, close=conn.closed != 0)
+            raise
+        else:
+            self.putconn(conn)
+
+    def closeall(self) -> None:
+        """Close every idle connection and refuse further checkouts"""
+        with self._lock:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle = []
+            self._lock.notify_all()
+        for conn in idle:
+            self._discard(conn)
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of pool usage for sizing and monitoring"""
+        with self._lock:
+            return {
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'in_use': len(self._in_use),
+                'idle': len(self._idle),
+                'opening': self._opening,
+                'waiters': self._waiters,
+                'checkouts': self._checkouts,
+                'timeouts': self._timeouts,
+                'connections_opened': self._connections_opened,
+                'connections_closed': self._connections_closed,
+                'failed_health_checks': self._failed_health_checks,
+                'total_wait_time': round(self._total_wait_time, 6),
+                'avg_wait_time': round(self._total_wait_time / self._checkouts, 6) if self._checkouts else 0.0,
+                'max_wait_time': round(self._max_wait_time, 6),
+            }
+
+
+def pool_from_env(dsn: Optional[str]) -> ConnectionPool:
+    """Build a pool using DB_POOL_* environment settings"""
+    return ConnectionPool(
+        dsn,
+        min_size=int(os.environ.get("DB_POOL_MIN", "1")),
+        max_size=int(os.environ.get("DB_POOL_MAX", "10")),
+        timeout=float(os.environ.get("DB_POOL_TIMEOUT", "5")),
+        idle_timeout=float(os.environ.get("DB_POOL_IDLE_TIMEOUT", "300")),
+        health_check_after=float(os.environ.get("DB_POOL_HEALTH_CHECK_AFTER", "30")),
+        connect_timeout=int(os.environ.get("DB_CONNECT_TIMEOUT", "5")),
+    )
@@ -0,0 +1,108 @@
+import logging
+import importlib.util
+from typing import Iterator, List, Tuple
+
+# pypdf and python-docx are imported on first use, only their presence is checked here
+DOCX_AVAILABLE = importlib.util.find_spec("docx") is not None
+if not DOCX_AVAILABLE:
+    print("python-docx not available. DOCX files won't be supported.")
+
+logger = logging.getLogger(__name__)
+
+# Extensions worth sending to a parser process; plain text is read inline
+CPU_BOUND_EXTENSIONS = {'pdf', 'docx'}
+
+# Pages per parser task when a PDF is fanned out over a process pool
+PDF_PAGES_PER_TASK = 4
+
+class DocumentReadError(Exception):
+    """A document could not be read to the end"""
+
+def get_file_extension(file_path: str) -> str:
+    """Get lowercased file extension without the dot"""
+    return file_path.split('.')[-1].lower()
+
+def read_docx(file_path: str) -> str:
+    """Read DOCX file content"""
+    if not DOCX_AVAILABLE:
+        raise ImportError("python-docx not available")
+    
+    try:
+        import docx
+        doc = docx.Document(file_path)
+        return "\n".join([para.text for para in doc.paragraphs])
+    except Exception as e:
+        logger.error(f"Error reading DOCX file {file_path}: {e}")
+        return ""
+
+def read_file_content(file_path: str) -> str:
+    """Read content from various file types"""
+    try:
+        file_ext = get_file_extension(file_path)
+        
+        if file_ext == 'txt':
+            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+                return f.read()
+        elif file_ext == 'pdf':
+            return "\n".join(text for _, text in iter_document_pages(file_path))
+        elif file_ext == 'docx':
+            return read_docx(file_path)
+        else:
+            logger.warning(f"Unsupported file type: {file_ext}")
+            return ""
+    except Exception as e:
+        logger.error(f"Error reading file {file_path}: {e}")
+        return ""
+
+def extract_pdf_pages(file_path: str, start: int, end: int) -> List[str]:
+    """Extract text of pages [start, end) of a PDF (runs in parser processes)"""
+    from pypdf import PdfReader
+    reader = PdfReader(file_path)
+    return [reader.pages[i].extract_text() for i in range(start, min(end, len(reader.pages)))]
+
+def read_file_content_in_process(file_path: str) -> List[str]:
+    """Whole-file read for parser processes, returned as a single page"""
+    return [read_file_content(file_path)]
+
+def iter_document_pages(file_path: str, executor=None,
+                        pages_per_task: int = PDF_PAGES_PER_TASK) -> Iterator[Tuple[int, str]]:
+    """Yield (page_number, text) as pages are parsed, in page order.
+
+    With a process pool executor, PDF page ranges are parsed in parallel and
+    yielded as soon as all earlier pages are done. Without one, pages are
+    parsed lazily one at a time. Non-PDF files are yielded as a single page.
+    Raises DocumentReadError when a PDF fails part way, so the caller does
+    not take the pages read so far for the whole document.
+    """
+    file_ext = get_file_extension(file_path)
+
+    if file_ext != 'pdf':
+        if executor is not None and file_ext in CPU_BOUND_EXTENSIONS:
+            text = executor.submit(read_file_content_in_process, file_path).result()[0]
+        else:
+            text = read_file_content(file_path)
+        if text:
+            yield 1, text
+        return
+
+    try:
+        from pypdf import PdfReader
+        if executor is None:
+            for page_number, page in enumerate(PdfReader(file_path).pages, start=1):
+                yield page_number, page.extract_text()
+            return
+
+        page_count = len(PdfReader(file_path).pages)
+        futures = [
+            executor.submit(extract_pdf_pages, file_path, start, start + pages_per_task)
+            for start in range(0, page_count, pages_per_task)
+        ]
+        page_number = 0
+        for future in futures:
+            for text in future.result():
+                page_number += 1
+                yield page_number, text
+
+    except Exception as e:
+        logger.error(f"Error reading file {file_path}: {e}")
+        raise DocumentReadError(f"Could not read {file_path}: {e}") from e
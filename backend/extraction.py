@@ -0,0 +1,456 @@
+import os
+import re
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+import logging
+from typing import Dict, Any, Optional, List, Tuple
+
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.output_parsers import StrOutputParser
+
+logger = logging.getLogger(__name__)
+
+# Bump when the prompt or schema changes, cached extractions are keyed by it
+EXTRACTION_VERSION = "2"
+
+_NULLABLE_STRING = {"type": ["string", "null"]}
+_NULLABLE_NUMBER = {"type": ["number", "null"]}
+_NULLABLE_INTEGER = {"type": ["integer", "null"]}
+_STRING_LIST = {"type": "array", "items": {"type": "string"}}
+
+
+def _object(properties: Dict[str, Any]) -> Dict[str, Any]:
+    # Strict structured output wants every property listed as required
+    return {"type": "object", "properties": properties, "required": list(properties), "additionalProperties": False}
+
+
+PACKAGE_SCHEMA = _object({
+    "title": _NULLABLE_STRING,
+    "description": _NULLABLE_STRING,
+    "destinations": _STRING_LIST,
+    "duration_days": _NULLABLE_INTEGER,
+    "duration_nights": _NULLABLE_INTEGER,
+    "transport_type": _NULLABLE_STRING,
+    "dates": {"type": "array", "items": _object({
+        "departure_date": _NULLABLE_STRING,
+        "return_date": _NULLABLE_STRING,
+        "price_regular": _NULLABLE_NUMBER,
+        "price_discounted": _NULLABLE_NUMBER,
+    })},
+    "hotels": {"type": "array", "items": _object({
+        "name": _NULLABLE_STRING,
+        "category": _NULLABLE_STRING,
+        "location": _NULLABLE_STRING,
+    })},
+    "includes": _STRING_LIST,
+    "excludes": _STRING_LIST,
+    "highlights": _STRING_LIST,
+    "additional_costs": _object({
+        "single_room_supplement": _NULLABLE_NUMBER,
+        "optional_tours": _NULLABLE_NUMBER,
+        "other": _NULLABLE_STRING,
+    }),
+})
+
+BATCH_SCHEMA = dict(_object({
+    "sections": {"type": "array", "items": _object({
+        "id": {"type": "string"},
+        "package": PACKAGE_SCHEMA,
+    })},
+}), title="travel_package_sections")
+
+EXTRACTION_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """Analiziraj sledeće delove turističkih dokumenata i za svaki deo izdvoji strukturirane podatke.
+
+VAŽNO: Izvlači SAMO podatke koji STVARNO postoje u tom delu. Ne izmišljaj podatke!
+Delovi su označeni sa "### Deo <id>". Za svaki deo vrati jedan element liste "sections" sa istim id.
+Ako podatak ne postoji u delu, stavi null ili praznu listu. Cene su brojevi (bez valute), datumi su tekst kao u dokumentu.
+
+Odgovori SAMO JSON objektom oblika:
+{{"sections": [{{"id": "id dela", "package": {{"title": ..., "description": ..., "destinations": [...], "duration_days": ..., "duration_nights": ..., "transport_type": ..., "dates": [{{"departure_date": ..., "return_date": ..., "price_regular": ..., "price_discounted": ...}}], "hotels": [{{"name": ..., "category": ..., "location": ...}}], "includes": [...], "excludes": [...], "highlights": [...], "additional_costs": {{"single_room_supplement": ..., "optional_tours": ..., "other": ...}}}}}}]}}"""),
+    ("human", "{sections}")
+])
+
+# Errors worth repeating the same request for; HTTP errors are told apart by status code
+TRANSIENT_ERROR_NAMES = {"APITimeoutError", "APIConnectionError", "ReadTimeout", "ConnectTimeout", "ConnectError"}
+
+SCALAR_FIELDS = ("title", "description", "duration_days", "duration_nights", "transport_type")
+LIST_FIELDS = ("destinations", "includes", "excludes", "highlights")
+
+
+def split_sections(content: str, max_chars: int) -> List[str]:
+    """Split a document into sections of at most max_chars, on paragraph or line boundaries"""
+    content = content.strip()
+    if len(content) <= max_chars:
+        return [content] if content else []
+
+    sections, current = [], ""
+    for block in re.split(r'(\n\s*\n)', content):
+        if len(current) + len(block) <= max_chars:
+            current += block
+            continue
+        if current.strip():
+            sections.append(current.strip())
+        current = ""
+        # A paragraph longer than a section is split on lines, then hard
+        while len(block) > max_chars:
+            cut = block.rfind("\n", 0, max_chars)
+            cut = cut if cut > max_chars // 2 else max_chars
+            sections.append(block[:cut].strip())
+            block = block[cut:]
+        current = block
+    if current.strip():
+        sections.append(current.strip())
+    return sections
+
+
+def parse_json_answer(text: str) -> Dict[str, Any]:
+    """JSON object from a model answer, tolerating markdown fences and surrounding text"""
+    start, end = text.find('{'), text.rfind('}') + 1
+    if start == -1 or end <= start:
+        raise ValueError("No JSON object in answer")
+    return json.loads(text[start:end])
+
+
+def is_transient(error: Exception) -> bool:
+    """Timeouts, dropped connections, rate limits and server errors"""
+    status = getattr(error, "status_code", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    return isinstance(error, (TimeoutError, ConnectionError)) or type(error).__name__ in TRANSIENT_ERROR_NAMES
+
+
+def _key(value: Any) -> str:
+    return re.sub(r'\s+', ' ', str(value)).strip().casefold()
+
+
+def merge_packages(parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combine per-section extractions of one document.
+
+    Scalars come from the first section that has them, lists are joined
+    without duplicates, departures with the same dates are merged and keep
+    the prices any section found.
+    """
+    merged: Dict[str, Any] = {field: None for field in SCALAR_FIELDS}
+    merged.update({field: [] for field in LIST_FIELDS})
+    merged.update({"dates": [], "hotels": [], "additional_costs": {}})
+    seen = {field: set() for field in LIST_FIELDS + ("hotels",)}
+    dates: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+    for part in parts:
+        for field in SCALAR_FIELDS:
+            if merged[field] in (None, "") and part.get(field) not in (None, ""):
+                merged[field] = part[field]
+
+        for field in LIST_FIELDS:
+            for item in part.get(field) or []:
+                if item and _key(item) not in seen[field]:
+                    seen[field].add(_key(item))
+                    merged[field].append(item)
+
+        for hotel in part.get("hotels") or []:
+            if isinstance(hotel, dict) and hotel.get("name") and _key(hotel["name"]) not in seen["hotels"]:
+                seen["hotels"].add(_key(hotel["name"]))
+                merged["hotels"].append(hotel)
+
+        for date in part.get("dates") or []:
+            if not isinstance(date, dict) or not (date.get("departure_date") or date.get("return_date")):
+                continue
+            key = (_key(date.get("departure_date") or ""), _key(date.get("return_date") or ""))
+            if key not in dates:
+                dates[key] = dict(date)
+                merged["dates"].append(dates[key])
+            else:
+                for field, value in date.items():
+                    if dates[key].get(field) is None and value is not None:
+                        dates[key][field] = value
+
+        for field, value in (part.get("additional_costs") or {}).items():
+            if merged["additional_costs"].get(field) is None and value is not None:
+                merged["additional_costs"][field] = value
+
+    return merged
+
+
+class ExtractionCache:
+    """SQLite store of per-section extractions, keyed by hash of version + model + section text.
+
+    Unchanged sections of a re-uploaded document are not sent to the LLM
+    again. Least recently used entries are evicted above ``max_entries``.
+    """
+
+    def __init__(self, db_path: str, max_entries: int = 50000, evict_to: float = 0.9):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.evict_to = evict_to
+
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS extractions (
+                    key TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_extractions_last_used ON extractions(last_used)")
+            self._entries = conn.execute("SELECT COUNT(*) FROM extractions").fetchone()[0]
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{EXTRACTION_VERSION}\x00{model}\x00{text}".encode('utf-8')).hexdigest()
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[Dict[str, Any]]]:
+        keys = [self.make_key(model, text) for text in texts]
+        conn = self._connect()
+        try:
+            found = {}
+            for start in range(0, len(keys), 500):
+                batch = list(set(keys[start:start + 500]))
+                placeholders = ",".join("?" * len(batch))
+                found.update(conn.execute(
+                    f"SELECT key, data FROM extractions WHERE key IN ({placeholders})", batch
+                ).fetchall())
+            if found:
+                now = time.time()
+                conn.executemany("UPDATE extractions SET last_used = ? WHERE key = ?", [(now, key) for key in found])
+        finally:
+            conn.close()
+
+        results = [json.loads(found[key]) if key in found else None for key in keys]
+        hits = sum(1 for result in results if result is not None)
+        with self._lock:
+            self._hits += hits
+            self._misses += len(results) - hits
+        return results
+
+    def put_many(self, model: str, texts: List[str], results: List[Dict[str, Any]]) -> None:
+        now = time.time()
+        rows = [(self.make_key(model, text), json.dumps(result, ensure_ascii=False), now)
+                for text, result in zip(texts, results)]
+        conn = self._connect()
+        try:
+            before = conn.total_changes
+            conn.executemany("INSERT OR REPLACE INTO extractions (key, data, last_used) VALUES (?, ?, ?)", rows)
+            with self._lock:
+                self._entries += conn.total_changes - before
+                over_limit = self._entries > self.max_entries
+            if over_limit:
+                total = conn.execute("SELECT COUNT(*) FROM extractions").fetchone()[0]
+                excess = total - int(self.max_entries * self.evict_to)
+                if excess > 0:
+                    conn.execute(
+                        "DELETE FROM extractions WHERE key IN "
+                        "(SELECT key FROM extractions ORDER BY last_used LIMIT ?)", (excess,)
+                    )
+                with self._lock:
+                    self._entries = total - max(excess, 0)
+        finally:
+            conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': self._entries,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+class StructuredExtractor:
+    """Extracts travel packages from documents with as few LLM calls as possible.
+
+    Documents are split into sections; sections not in the cache are packed,
+    across documents, into requests of up to ``batch_sections`` sections /
+    ``batch_chars`` characters, which run concurrently. Models that support
+    it answer under the JSON schema (strict structured output), so answers
+    always parse; others get the schema in the prompt and a lenient parser.
+    A structured request that fails for any other reason than a transient
+    error (e.g. the provider rejects the schema) is repeated with the plain
+    prompt; transient errors are retried up to ``retries`` times with
+    backoff. Section results are merged back into one package per document.
+    """
+
+    def __init__(self, llm, model_name: str, cache: Optional[ExtractionCache] = None,
+                 section_chars: int = 6000, batch_chars: int = 18000, batch_sections: int = 4,
+                 max_sections: int = 20, max_tokens: int = 4096, concurrency: int = 4,
+                 retries: int = 2, retry_delay: float = 1.0, callbacks: Optional[list] = None):
+        self.model_name = model_name
+        self.cache = cache
+        self.section_chars = section_chars
+        self.batch_chars = batch_chars
+        self.batch_sections = batch_sections
+        self.max_sections = max_sections
+        self.concurrency = concurrency
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.callbacks = callbacks or []
+
+        # A batch answer holds several packages, more than a chat answer's token limit
+        if (getattr(llm, 'max_tokens', None) or max_tokens) < max_tokens:
+            llm = llm.model_copy(update={'max_tokens': max_tokens})
+
+        self.prompt_chain = EXTRACTION_PROMPT | llm | StrOutputParser()
+        try:
+            self.structured_chain = EXTRACTION_PROMPT | llm.with_structured_output(
+                BATCH_SCHEMA, method="json_schema", strict=True
+            )
+        except (NotImplementedError, TypeError, ValueError, AttributeError):
+            self.structured_chain = None
+
+        self._lock = threading.Lock()
+        self._documents = 0
+        self._sections = 0
+        self._requests = 0
+        self._failed_requests = 0
+        self._retries = 0
+        self._structured_fallbacks = 0
+
+    def _batches(self, sections: List[Tuple[str, str]]) -> List[List[Tuple[str, str]]]:
+        batches, current, size = [], [], 0
+        for section_id, text in sections:
+            if current and (len(current) >= self.batch_sections or size + len(text) > self.batch_chars):
+                batches.append(current)
+                current, size = [], 0
+            current.append((section_id, text))
+            size += len(text)
+        if current:
+            batches.append(current)
+        return batches
+
+    def _parse(self, answer: Any) -> Dict[str, Dict[str, Any]]:
+        data = answer if isinstance(answer, dict) else parse_json_answer(answer)
+        return {str(item.get("id")): item.get("package") or {}
+                for item in data.get("sections", []) if isinstance(item, dict)}
+
+    def _answer(self, prompts: List[Dict[str, str]]) -> List[Any]:
+        """Parsed {section id: package} per prompt, or the exception its last attempt ended with"""
+        outcomes: List[Any] = [None] * len(prompts)
+        structured = [self.structured_chain is not None] * len(prompts)
+        attempts = [0] * len(prompts)
+        todo = list(range(len(prompts)))
+        requests = 0
+
+        while todo:
+            retry = []
+            groups = [(use_schema, [i for i in todo if structured[i] == use_schema]) for use_schema in (True, False)]
+            for use_schema, group in groups:
+                if not group:
+                    continue
+                chain = self.structured_chain if use_schema else self.prompt_chain
+                answers = chain.batch(
+                    [prompts[i] for i in group],
+                    config={"callbacks": self.callbacks, "max_concurrency": self.concurrency},
+                    return_exceptions=True
+                )
+                requests += len(group)
+                for i, answer in zip(group, answers):
+                    try:
+                        if isinstance(answer, Exception):
+                            raise answer
+                        outcomes[i] = self._parse(answer)
+                        continue
+                    except Exception as e:
+                        outcomes[i] = e
+                    if is_transient(outcomes[i]) and attempts[i] < self.retries:
+                        attempts[i] += 1
+                        retry.append(i)
+                    elif use_schema:
+                        logger.warning(f"Structured extraction failed ({outcomes[i]}), retrying with the plain prompt")
+                        structured[i] = False
+                        retry.append(i)
+                        with self._lock:
+                            self._structured_fallbacks += 1
+
+            if retry and any(attempts[i] for i in retry):
+                time.sleep(self.retry_delay * 2 ** (max(attempts[i] for i in retry) - 1))
+            with self._lock:
+                self._requests += requests
+                self._retries += len(retry)
+            todo, requests = retry, 0
+        return outcomes
+
+    def extract_many(self, documents: List[Tuple[str, str]]) -> Dict[str, Dict[str, Any]]:
+        """Structured data for (key, content) documents, {} for a document nothing could be extracted from"""
+        sections = []  # (document key, section id, text)
+        for key, content in documents:
+            for text in split_sections(content or "", self.section_chars)[:self.max_sections]:
+                sections.append((key, str(len(sections)), text))
+
+        texts = [text for _, _, text in sections]
+        cached = self.cache.get_many(self.model_name, texts) if self.cache and texts else [None] * len(texts)
+        results: Dict[str, Dict[str, Any]] = {
+            section_id: result for (_, section_id, _), result in zip(sections, cached) if result is not None
+        }
+
+        missing = [(section_id, text) for (_, section_id, text), result in zip(sections, cached) if result is None]
+        batches = self._batches(missing)
+        if batches:
+            answers = self._answer(
+                [{"sections": "\n\n".join(f"### Deo {section_id}\n{text}" for section_id, text in batch)}
+                 for batch in batches]
+            )
+            fresh_texts, fresh_results = [], []
+            failed = 0
+            for batch, parsed in zip(batches, answers):
+                if isinstance(parsed, Exception):
+                    failed += 1
+                    logger.error(f"Extraction request for {len(batch)} section(s) failed: {parsed}")
+                    continue
+                for section_id, text in batch:
+                    if section_id in parsed:
+                        results[section_id] = parsed[section_id]
+                        fresh_texts.append(text)
+                        fresh_results.append(parsed[section_id])
+            if self.cache and fresh_texts:
+                self.cache.put_many(self.model_name, fresh_texts, fresh_results)
+            with self._lock:
+                self._failed_requests += failed
+
+        with self._lock:
+            self._documents += len(documents)
+            self._sections += len(sections)
+
+        extracted = {}
+        for key, _ in documents:
+            parts = [results[section_id] for doc_key, section_id, _ in sections
+                     if doc_key == key and section_id in results]
+            extracted[key] = merge_packages(parts) if parts else {}
+        return extracted
+
+    def extract(self, content: str) -> Dict[str, Any]:
+        return self.extract_many([("document", content)])["document"]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {
+                'structured_output': self.structured_chain is not None,
+                'documents': self._documents,
+                'sections': self._sections,
+                'requests': self._requests,
+                'failed_requests': self._failed_requests,
+                'retries': self._retries,
+                'structured_fallbacks': self._structured_fallbacks,
+            }
+        if self.cache:
+            stats['cache'] = self.cache.stats()
+        return stats
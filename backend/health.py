@@ -0,0 +1,123 @@
+import os
+import time
+import threading
+import logging
+from datetime import datetime
+from typing import Dict, Any, Callable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class HealthMonitor:
+    """Checks dependencies on a background interval and serves the results from memory.
+
+    Each check is a callable that raises when the dependency is unhealthy.
+    Gauges are callables whose value is costly to read, such as a row
+    count; they are read in the same rounds. Probes read the last results
+    (status, latency, time of the check, gauge values) without touching
+    the dependencies themselves, so frequent load-balancer probes and
+    metric scrapes cost nothing. The checker thread belongs to one process and is
+    restarted on first use after a fork.
+    """
+
+    def __init__(self, interval: float = 15.0):
+        self.interval = interval
+        self._checks: List[Tuple[str, Callable[[], Any]]] = []
+        self._results: Dict[str, Dict[str, Any]] = {}
+        self._gauges: List[Tuple[str, Callable[[], Any]]] = []
+        self._values: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pid = None
+
+    def add_check(self, name: str, check: Callable[[], Any]) -> None:
+        self._checks.append((name, check))
+        self._results[name] = self._empty_result()
+
+    def add_gauge(self, name: str, read: Callable[[], Any]) -> None:
+        self._gauges.append((name, read))
+        self._values[name] = None
+
+    @staticmethod
+    def _empty_result() -> Dict[str, Any]:
+        return {'ok': None, 'latency_ms': None, 'checked_at': None, 'error': None, 'consecutive_failures': 0}
+
+    def start(self) -> None:
+        """Start the checker thread in this process unless it is already running"""
+        if self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._wakeup = threading.Event()
+            self._results = {name: self._empty_result() for name, _ in self._checks}
+            self._values = {name: None for name, _ in self._gauges}
+            threading.Thread(target=self._loop, name="health-monitor", daemon=True).start()
+
+    def _loop(self) -> None:
+        while True:
+            self.run_checks()
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+
+    def run_checks(self) -> None:
+        """Run every check and read every gauge once now"""
+        for name, check in self._checks:
+            start = time.perf_counter()
+            try:
+                check()
+                ok, error = True, None
+            except Exception as e:
+                ok, error = False, str(e) or type(e).__name__
+            latency_ms = round((time.perf_counter() - start) * 1000, 2)
+
+            with self._lock:
+                previous = self._results.get(name) or self._empty_result()
+                if not ok and previous['ok'] is not False:
+                    logger.warning(f"Health check {name} failed: {error}")
+                elif ok and previous['ok'] is False:
+                    logger.info(f"Health check {name} recovered")
+                self._results[name] = {
+                    'ok': ok,
+                    'latency_ms': latency_ms,
+                    'checked_at': datetime.now().isoformat(),
+                    'error': error,
+                    'consecutive_failures': 0 if ok else previous['consecutive_failures'] + 1,
+                }
+
+        for name, read in self._gauges:
+            try:
+                value = read()
+            except Exception as e:
+                logger.warning(f"Reading {name} failed: {e}")
+                value = None
+            with self._lock:
+                self._values[name] = value
+
+    def refresh(self) -> None:
+        """Ask the checker thread for an immediate round, e.g. once initialization is done"""
+        self.start()
+        self._wakeup.set()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Last result of every check"""
+        self.start()
+        with self._lock:
+            return {name: dict(result) for name, result in self._results.items()}
+
+    def value(self, name: str) -> Any:
+        """Last value read for a gauge, None until the first round"""
+        self.start()
+        with self._lock:
+            return self._values.get(name)
+
+    def stats(self) -> Dict[str, Any]:
+        """Flat view of the results for /metrics"""
+        values = {}
+        for name, result in self.snapshot().items():
+            values[f"{name}_up"] = 1 if result['ok'] else 0
+            if result['latency_ms'] is not None:
+                values[f"{name}_latency_ms"] = result['latency_ms']
+        return values
@@ -0,0 +1,250 @@
+import re
+import html
+import json
+import time
+import threading
+import logging
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List, Callable
+
+from psycopg2.extras import RealDictCursor
+
+from keyword_matcher import fold
+
+logger = logging.getLogger(__name__)
+
+INTENT_KEYWORDS = {
+    'price': ["cena", "cene", "cenu", "kosta", "kostaju", "kosta li", "price", "cost", "eur", "evra"],
+    'dates': ["polazak", "polasci", "polaska", "datum", "datumi", "kada", "termin", "termini", "when", "departure", "dates"],
+    'duration': ["traje", "trajanje", "koliko dana", "nocenja", "nocenje", "duration", "how long", "days"],
+    'hotel': ["hotel", "hoteli", "hotela", "smestaj", "accommodation"],
+}
+
+# Messages with these words need the full assistant (reservations, comparisons, advice)
+RAG_ONLY_KEYWORDS = ["rezerv", "bukir", "booking", "hocu da idem", "preporuc", "uporedi", "najbolj", "zasto"]
+
+# Destination matches of recent messages, the router and the retrieval scope read the same message
+MATCH_CACHE_SIZE = 256
+
+# Serbian case endings of place names: "Lisabonu", "Portugaliji", "Rimom"; "Rim" must not match "Rimini"
+CASE_ENDINGS = "a|e|i|o|u|om|em|oj|ju|ji|iji|jom"
+
+
+def destination_pattern(folded: str) -> re.Pattern:
+    """Whole-word pattern for a folded destination name and its inflected forms"""
+    words = folded.split()
+    last = words[-1]
+    if len(last) > 3 and last[-1] in "aeio":
+        # The final vowel is part of the ending: Portugalij-a, Portugalij-i
+        inflected = rf"{re.escape(last[:-1])}(?:{CASE_ENDINGS})"
+    else:
+        inflected = rf"{re.escape(last)}(?:{CASE_ENDINGS})?"
+    # Earlier words of a multi-word name ("Sveta Gora") are matched as written
+    prefix = "".join(rf"{re.escape(word)}\W+" for word in words[:-1])
+    return re.compile(rf"\b{prefix}{inflected}\b")
+
+
+class IntentRouter:
+    """Answer simple price/date/duration/hotel questions straight from travel_packages.
+
+    Questions are routed here only when they name a known destination and
+    ask for one of the structured fields; everything else goes to RAG.
+    """
+
+    def __init__(self, connection: Callable, version_fn: Optional[Callable[[], str]] = None,
+                 max_packages: int = 5, retry_interval: float = 30.0):
+        self._connection = connection
+        self._version_fn = version_fn
+        self.max_packages = max_packages
+        self.retry_interval = retry_interval
+
+        self._lock = threading.Lock()
+        self._destinations: Dict[str, re.Pattern] = {}  # stored name -> pattern of its forms
+        self._destinations_version = None
+        self._retry_at = 0.0
+        self._matches: OrderedDict = OrderedDict()  # message -> (destinations dict, matched names)
+        self._counts = {'structured': 0, 'rag': 0, 'no_data': 0}
+
+    def _known_destinations(self) -> Dict[str, str]:
+        """Destination names present in the catalog, refreshed when documents change.
+
+        After a failed lookup the last known names are used and the database
+        is not asked again for ``retry_interval`` seconds, so an unreachable
+        database does not cost every chat message a connection attempt.
+        """
+        version = self._version_fn() if self._version_fn else None
+        if self._destinations_version is not None and version == self._destinations_version:
+            return self._destinations
+        if time.monotonic() < self._retry_at:
+            return self._destinations
+
+        try:
+            with self._connection() as conn:
+                if conn is None:
+                    raise RuntimeError("no database connection")
+                with conn.cursor() as cursor:
+                    cursor.execute("""
+                        SELECT DISTINCT jsonb_array_elements_text(destinations)
+                        FROM travel_packages
+                        WHERE jsonb_typeof(destinations) = 'array'
+                    """)
+                    names = [row[0] for row in cursor.fetchall() if row[0]]
+        except Exception as e:
+            logger.warning(f"Could not load catalog destinations, retrying in {self.retry_interval}s: {e}")
+            with self._lock:
+                self._retry_at = time.monotonic() + self.retry_interval
+            return self._destinations
+
+        with self._lock:
+            self._destinations = {name: destination_pattern(fold(name).strip()) for name in names if fold(name).strip()}
+            self._destinations_version = version
+        return self._destinations
+
+    def match_destinations(self, message: str) -> List[str]:
+        """Catalog destinations named in the message"""
+        known = self._known_destinations()
+        with self._lock:
+            cached = self._matches.get(message)
+            if cached and cached[0] is known:
+                self._matches.move_to_end(message)
+                return list(cached[1])
+
+        text = fold(message)
+        destinations = [name for name, pattern in known.items() if pattern.search(text)]
+
+        with self._lock:
+            self._matches[message] = (known, destinations)
+            self._matches.move_to_end(message)
+            while len(self._matches) > MATCH_CACHE_SIZE:
+                self._matches.popitem(last=False)
+        return list(destinations)
+
+    def detect(self, message: str) -> Optional[Dict[str, Any]]:
+        """Detect a structured question, returns {'intents': [...], 'destinations': [...]}"""
+        text = fold(message)
+        if any(keyword in text for keyword in RAG_ONLY_KEYWORDS):
+            return None
+
+        words = re.findall(r'\w+', text)
+        intents = [
+            intent for intent, keywords in INTENT_KEYWORDS.items()
+            if any((keyword in text) if ' ' in keyword else (keyword in words) for keyword in keywords)
+        ]
+        if not intents:
+            return None
+
+        destinations = self.match_destinations(message)
+        if not destinations:
+            return None
+        return {'intents': intents, 'destinations': destinations}
+
+    def _fetch_packages(self, destinations: List[str]) -> List[Dict[str, Any]]:
+        with self._connection() as conn:
+            if conn is None:
+                return []
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                # @> on the destinations column is served by its GIN index
+                conditions = " OR ".join(["destinations @> %s::jsonb"] * len(destinations))
+                cursor.execute(f"""
+                    SELECT title, destinations, duration_days, duration_nights, transport_type,
+                           dates, prices, hotels
+                    FROM travel_packages
+                    WHERE {conditions}
+                    ORDER BY updated_at DESC
+                    LIMIT %s
+                """, [json.dumps([name], ensure_ascii=False) for name in destinations] + [self.max_packages])
+                return [dict(row) for row in cursor.fetchall()]
+
+    @staticmethod
+    def _format_price(value: Any) -> str:
+        if value in (None, "", 0):
+            return ""
+        return f"{value} EUR" if isinstance(value, (int, float)) else html.escape(str(value))
+
+    @staticmethod
+    def _join(values: List[Any], separator: str) -> str:
+        return separator.join(html.escape(str(value)) for value in values if value not in (None, ""))
+
+    def _render(self, package: Dict[str, Any], intents: List[str]) -> str:
+        title = html.escape(package.get('title') or "") or self._join(package.get('destinations') or [], ", ")
+        parts = [f"<h3>{title}</h3>"]
+
+        if 'dates' in intents or 'price' in intents:
+            rows = []
+            for date in package.get('dates') or []:
+                if not isinstance(date, dict):
+                    continue
+                period = self._join([date.get('departure_date'), date.get('return_date')], " – ")
+                prices = []
+                if 'price' in intents:
+                    regular = self._format_price(date.get('price_regular'))
+                    discounted = self._format_price(date.get('price_discounted'))
+                    if regular:
+                        prices.append(f"cena: {regular}")
+                    if discounted:
+                        prices.append(f"sa popustom: {discounted}")
+                if period or prices:
+                    rows.append(f"<li>{period}{' – ' + ', '.join(prices) if prices else ''}</li>")
+            if rows:
+                parts.append("<p>Termini:</p><ul>" + "".join(rows) + "</ul>")
+
+        if 'price' in intents:
+            extra = package.get('prices') or {}
+            if isinstance(extra, dict):
+                supplement = self._format_price(extra.get('single_room_supplement'))
+                if supplement:
+                    parts.append(f"<p>Doplata za jednokrevetnu sobu: {supplement}</p>")
+
+        if 'duration' in intents:
+            days, nights = package.get('duration_days'), package.get('duration_nights')
+            if days or nights:
+                duration = ", ".join(filter(None, [
+                    f"{days} dana" if days else "",
+                    f"{nights} noćenja" if nights else ""
+                ]))
+                transport = f" ({html.escape(package['transport_type'])})" if package.get('transport_type') else ""
+                parts.append(f"<p>Trajanje: {duration}{transport}</p>")
+
+        if 'hotel' in intents:
+            hotels = [
+                self._join([hotel.get('name'), hotel.get('category'), hotel.get('location')], " ")
+                for hotel in package.get('hotels') or [] if isinstance(hotel, dict)
+            ]
+            hotels = [hotel for hotel in hotels if hotel]
+            if hotels:
+                parts.append("<p>Smeštaj:</p><ul>" + "".join(f"<li>{hotel}</li>" for hotel in hotels) + "</ul>")
+
+        # Only the title means none of the asked fields are stored
+        return "".join(parts) if len(parts) > 1 else ""
+
+    def route(self, message: str) -> Optional[Dict[str, Any]]:
+        """Answer from the database, or None if the message should go through RAG"""
+        try:
+            detected = self.detect(message)
+            if detected:
+                packages = self._fetch_packages(detected['destinations'])
+                sections = [self._render(package, detected['intents']) for package in packages]
+                sections = [section for section in sections if section]
+                if sections:
+                    self._count('structured')
+                    return {
+                        "content": "".join(sections),
+                        "reserve": False,
+                        "gmail": ""
+                    }
+                self._count('no_data')
+                return None
+        except Exception as e:
+            logger.error(f"Intent routing error: {e}")
+
+        self._count('rag')
+        return None
+
+    def _count(self, path: str) -> None:
+        with self._lock:
+            self._counts[path] += 1
+
+    def stats(self) -> Dict[str, int]:
+        """How many messages took each path"""
+        with self._lock:
+            return dict(self._counts)
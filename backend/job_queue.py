@@ -0,0 +1,266 @@
+import os
+import json
+import uuid
+import time
+import sqlite3
+import threading
+import logging
+from datetime import datetime
+from typing import Dict, Any, Optional, Callable
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_SUCCEEDED = 'succeeded'
+JOB_FAILED = 'failed'
+
+
+class JobQueue:
+    """Background job queue persisted in a local SQLite file.
+
+    Several processes (e.g. gunicorn workers) may share the same file; a job
+    is claimed atomically inside an IMMEDIATE transaction so it only ever
+    runs once. Handlers are plain callables registered per job kind that take
+    the JSON payload and return a JSON-serializable result. Finished jobs are
+    kept for ``keep_finished`` seconds so clients can read their result, then
+    deleted.
+    """
+
+    def __init__(self, db_path: str, workers: int = 2, poll_interval: float = 1.0,
+                 stale_after: float = 3600.0, keep_finished: float = 7 * 86400.0,
+                 prune_interval: float = 3600.0):
+        self.db_path = db_path
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.keep_finished = keep_finished
+        self.prune_interval = prune_interval
+
+        self._handlers: Dict[str, Callable[[Dict[str, Any]], Any]] = {}
+        self._threads = []
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._pid = None
+        self._next_prune = 0.0
+
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_db(self) -> None:
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs(status, created_at)")
+        finally:
+            conn.close()
+
+    def register(self, kind: str, handler: Callable[[Dict[str, Any]], Any]) -> None:
+        """Register the handler that runs jobs of the given kind"""
+        self._handlers[kind] = handler
+
+    def submit(self, kind: str, payload: Dict[str, Any]) -> str:
+        """Enqueue a job and return its id"""
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'")
+
+        job_id = str(uuid.uuid4())
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, status, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, kind, JOB_QUEUED, json.dumps(payload, ensure_ascii=False), time.time())
+            )
+        finally:
+            conn.close()
+
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get job status and result"""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+
+        if not row:
+            return None
+
+        def _iso(ts):
+            return datetime.fromtimestamp(ts).isoformat() if ts else None
+
+        return {
+            'job_id': row['id'],
+            'kind': row['kind'],
+            'status': row['status'],
+            'result': json.loads(row['result']) if row['result'] else None,
+            'error': row['error'],
+            'attempts': row['attempts'],
+            'created_at': _iso(row['created_at']),
+            'started_at': _iso(row['started_at']),
+            'finished_at': _iso(row['finished_at']),
+        }
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs per status"""
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        finally:
+            conn.close()
+        return {row['status']: row['n'] for row in rows}
+
+    def _claim(self) -> Optional[sqlite3.Row]:
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1",
+                (JOB_QUEUED,)
+            ).fetchone()
+            if row:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, started_at = ?, attempts = attempts + 1 WHERE id = ?",
+                    (JOB_RUNNING, time.time(), row['id'])
+                )
+            conn.execute("COMMIT")
+            return row
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _finish(self, job_id: str, status: str, result: Any = None, error: Optional[str] = None) -> None:
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                (
+                    status,
+                    json.dumps(result, ensure_ascii=False, default=str) if result is not None else None,
+                    error,
+                    time.time(),
+                    job_id
+                )
+            )
+        finally:
+            conn.close()
+
+    def requeue_stale(self) -> int:
+        """Put back jobs left running by a worker that died"""
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, started_at = NULL WHERE status = ? AND started_at < ?",
+                (JOB_QUEUED, JOB_RUNNING, time.time() - self.stale_after)
+            )
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+    def prune(self) -> int:
+        """Delete succeeded and failed jobs that finished more than keep_finished seconds ago"""
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+                (JOB_SUCCEEDED, JOB_FAILED, time.time() - self.keep_finished)
+            )
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+    def _prune_if_due(self) -> None:
+        if time.monotonic() < self._next_prune:
+            return
+        self._next_prune = time.monotonic() + self.prune_interval
+        pruned = self.prune()
+        if pruned:
+            logger.info(f"Pruned {pruned} finished job(s)")
+
+    def run_next(self) -> bool:
+        """Claim and run a single job, returns False if the queue was empty"""
+        row = self._claim()
+        if not row:
+            return False
+
+        job_id, kind = row['id'], row['kind']
+        handler = self._handlers.get(kind)
+        if not handler:
+            self._finish(job_id, JOB_FAILED, error=f"No handler for job kind '{kind}'")
+            return True
+
+        started = time.monotonic()
+        try:
+            result = handler(json.loads(row['payload']))
+            self._finish(job_id, JOB_SUCCEEDED, result=result)
+            logger.info(f"Job {job_id} ({kind}) finished in {time.monotonic() - started:.2f}s")
+        except Exception as e:
+            logger.error(f"Job {job_id} ({kind}) failed: {e}")
+            self._finish(job_id, JOB_FAILED, error=str(e))
+        return True
+
+    def _worker_loop(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                if self.run_next():
+                    continue
+                # Idle workers also keep the table from growing in long-running processes
+                self._prune_if_due()
+            except Exception as e:
+                logger.error(f"Job worker error: {e}")
+
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def start(self) -> None:
+        """Start worker threads (once per process)"""
+        if self._pid == os.getpid() and self._threads:
+            return
+
+        self._pid = os.getpid()
+        self._stopping.clear()
+        requeued = self.requeue_stale()
+        if requeued:
+            logger.warning(f"Requeued {requeued} stale job(s)")
+        self._prune_if_due()
+
+        self._threads = []
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Job queue started with {self.workers} worker(s) at {self.db_path}")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Signal worker threads to stop and wait for them"""
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
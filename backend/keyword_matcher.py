@@ -0,0 +1,106 @@
+import re
+import unicodedata
+from typing import Dict, Iterable, Optional, Set
+
+# Serbian Latin diacritics (precomposed and the combining caron/acute left
+# by decomposed text) and their plain spelling
+DIACRITIC_REPLACEMENTS = (
+    ('č', 'c'), ('ć', 'c'), ('š', 's'), ('ž', 'z'), ('đ', 'dj'),
+    ('\u030c', ''), ('\u0301', ''),
+)
+# Accents left after the replacements above ("café", "Nürnberg"), once decomposed
+COMBINING_MARKS_PATTERN = re.compile('[\u0300-\u036f]+')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+END = ''
+
+# Large texts are folded and scanned in slices, so an early exit skips the rest
+SCAN_CHUNK_CHARS = 65536
+
+
+def fold(text: str) -> str:
+    """Lowercase text without diacritics, đ becomes dj.
+
+    The one normalization shared by keyword matching, the intent router,
+    the BM25 tokenizer, the retrieval scope and the response cache.
+    Serbian letters go through chained ``str.replace`` calls, which run at
+    C speed on multi-megabyte documents; only text that still has other
+    accented letters is decomposed with NFKD.
+    """
+    text = text.lower()
+    for letter, plain in DIACRITIC_REPLACEMENTS:
+        if letter in text:
+            text = text.replace(letter, plain)
+    if text.isascii():
+        return text
+    return COMBINING_MARKS_PATTERN.sub('', unicodedata.normalize('NFKD', text))
+
+
+def _trie_pattern(node: Dict[str, dict]) -> str:
+    """Regex for a keyword trie; optional tails make the longest keyword win"""
+    alternatives = [
+        (r'\s+' if char == ' ' else re.escape(char)) + _trie_pattern(child)
+        for char, child in sorted(node.items()) if char != END
+    ]
+    if not alternatives:
+        return ''
+    pattern = alternatives[0] if len(alternatives) == 1 else '(?:' + '|'.join(alternatives) + ')'
+    return f'(?:{pattern})?' if END in node else pattern
+
+
+class KeywordMatcher:
+    """All keywords compiled into one trie-shaped regex, so a text is scanned once.
+
+    Matching is case- and diacritic-insensitive ("smestaj" finds "Smeštaj"
+    and the other way around) and, like a plain substring test, finds
+    keywords inside longer words; at each position the longest keyword
+    counts. Scanning stops as soon as the caller's limit is reached.
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        self._keywords: Dict[str, str] = {}
+        for keyword in keywords:
+            self._keywords.setdefault(WHITESPACE_PATTERN.sub(' ', fold(keyword).strip()), keyword)
+
+        trie: Dict[str, dict] = {}
+        for keyword in self._keywords:
+            node = trie
+            for char in keyword:
+                node = node.setdefault(char, {})
+            node[END] = {}
+        # The lookahead lets keywords overlap ("tura" inside "avantura")
+        self._pattern = re.compile(f'(?=({_trie_pattern(trie)}))')
+        # Slices overlap so a keyword on a slice border is still found
+        self._overlap = max((len(keyword) for keyword in self._keywords), default=0) + 16
+
+    def __len__(self) -> int:
+        return len(self._keywords)
+
+    def _keyword(self, match: re.Match) -> Optional[str]:
+        return self._keywords.get(WHITESPACE_PATTERN.sub(' ', match.group(1)))
+
+    def matches(self, text: str, limit: Optional[int] = None, found: Optional[Set[str]] = None) -> Set[str]:
+        """Distinct keywords found in the text.
+
+        Stops scanning once ``limit`` keywords are known. ``found`` carries
+        keywords from earlier parts of the same document (e.g. previous
+        pages) and is updated in place.
+        """
+        found = set() if found is None else found
+        if limit is not None and len(found) >= limit:
+            return found
+
+        for start in range(0, max(len(text), 1), SCAN_CHUNK_CHARS):
+            chunk = text[max(0, start - self._overlap):start + SCAN_CHUNK_CHARS]
+            for match in self._pattern.finditer(fold(chunk)):
+                keyword = self._keyword(match)
+                if keyword is None or keyword in found:
+                    continue
+                found.add(keyword)
+                if limit is not None and len(found) >= limit:
+                    return found
+        return found
+
+    def search(self, text: str) -> Optional[str]:
+        """First keyword in the text, None if there is none"""
+        match = self._pattern.search(fold(text))
+        return self._keyword(match) if match else None
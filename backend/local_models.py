@@ -0,0 +1,199 @@
+import re
+import json
+import time
+import random
+import asyncio
+import hashlib
+import logging
+from typing import Any, Dict, Iterator, AsyncIterator, List, Optional
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForLLMRun, AsyncCallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from bm25_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+DATE_PATTERN = re.compile(r'\b\d{1,2}\.\d{1,2}\.(?:\d{4}\.?)?')
+PRICE_PATTERN = re.compile(r'(\d[\d.,]*)\s*(?:eur|€|evra)', re.IGNORECASE)
+EMAIL_PATTERN = re.compile(r'[\w.+-]+@[\w-]+\.[\w.]+')
+SECTION_PATTERN = re.compile(r'^### Deo (\S+)\n(.*?)(?=^### Deo |\Z)', re.MULTILINE | re.DOTALL)
+
+
+def _seeded_random(text: str) -> random.Random:
+    return random.Random(int(hashlib.sha256(text.encode('utf-8')).hexdigest()[:16], 16))
+
+
+class HashEmbeddings(Embeddings):
+    """Deterministic local embeddings: hashed bag of words, L2-normalized.
+
+    Texts sharing words get similar vectors, so retrieval behaves sensibly
+    without any network call. ``latency`` seconds per call simulate a
+    remote embedding API.
+    """
+
+    def __init__(self, size: int = 256, latency: float = 0.0):
+        self.size = size
+        self.latency = latency
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.size, dtype=np.float32)
+        for token in tokenize(text):
+            digest = hashlib.md5(token.encode('utf-8')).digest()
+            bucket = int.from_bytes(digest[:4], 'little') % self.size
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        if not norm:
+            vector[0] = 1.0
+            norm = 1.0
+        return (vector / norm).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
+class LocalTravelChatModel(BaseChatModel):
+    """Deterministic stand-in for the chat model, for offline load tests.
+
+    Answers are templated from the prompt: extraction prompts get a JSON
+    package per document section, built from the dates, prices and title
+    found in it, summary prompts a short summary, and chat prompts the
+    TurBot JSON answer quoting the retrieved context. Every call waits
+    ``latency`` ± ``jitter`` seconds (derived from the prompt, so runs are
+    repeatable); streamed answers arrive in ``chunk_chars`` pieces
+    ``token_delay`` seconds apart.
+    """
+
+    latency: float = 0.5
+    jitter: float = 0.2
+    token_delay: float = 0.01
+    chunk_chars: int = 8
+
+    @property
+    def _llm_type(self) -> str:
+        return "local-travel"
+
+    @staticmethod
+    def _prompt(messages: List[BaseMessage]) -> str:
+        return "\n".join(str(message.content) for message in messages)
+
+    def _delay(self, prompt: str) -> float:
+        jitter = _seeded_random(prompt).uniform(-self.jitter, self.jitter) if self.jitter else 0.0
+        return max(0.0, self.latency + jitter)
+
+    @staticmethod
+    def _section(prompt: str, start: str, end: Optional[str]) -> str:
+        begin = prompt.find(start)
+        if begin == -1:
+            return ""
+        begin += len(start)
+        finish = prompt.find(end, begin) if end else -1
+        return prompt[begin:finish if finish != -1 else None].strip()
+
+    def _extraction_answer(self, request: str) -> str:
+        sections = SECTION_PATTERN.findall(request)
+        return json.dumps({
+            "sections": [{"id": section_id, "package": self._package(document)} for section_id, document in sections]
+        }, ensure_ascii=False)
+
+    @staticmethod
+    def _package(document: str) -> Dict[str, Any]:
+        lines = [line.strip() for line in document.splitlines() if line.strip()]
+        dates = DATE_PATTERN.findall(document)
+        prices = [price.replace('.', '').replace(',', '.') for price in PRICE_PATTERN.findall(document)]
+        return {
+            "title": lines[0][:120] if lines else "Turistički aranžman",
+            "description": " ".join(lines[1:3])[:300],
+            "destinations": [],
+            "duration_days": None,
+            "duration_nights": None,
+            "transport_type": None,
+            "dates": [
+                {"departure_date": date, "return_date": None,
+                 "price_regular": float(prices[index]) if index < len(prices) else None,
+                 "price_discounted": None}
+                for index, date in enumerate(dates[:10])
+            ],
+            "hotels": [],
+            "includes": [],
+            "excludes": [],
+            "highlights": [],
+            "additional_costs": {}
+        }
+
+    def _chat_answer(self, prompt: str, question: str) -> str:
+        context = self._section(prompt, "Dostupni kontekst:", "Istorija razgovora:")
+        snippet = re.sub(r'\s+', ' ', context)[:300] if context else "Nemam podatke o tome u dokumentima."
+        email = EMAIL_PATTERN.search(context)
+        return json.dumps({
+            "content": f"<p>Odgovor na: {question}</p><p>{snippet}</p>",
+            "reserve": any(word in question.lower() for word in ("rezerv", "bukir", "booking")),
+            "gmail": email.group(0) if email else ""
+        }, ensure_ascii=False)
+
+    def _answer(self, messages: List[BaseMessage]) -> str:
+        prompt = self._prompt(messages)
+        if "Analiziraj sledeće delove turističkih dokumenata" in prompt:
+            return self._extraction_answer(str(messages[-1].content))
+        if "Sažmi razgovor" in prompt:
+            transcript = self._section(prompt, "Novi deo razgovora:", "Odgovori samo")
+            return re.sub(r'\s+', ' ', transcript)[:300]
+        return self._chat_answer(prompt, str(messages[-1].content).strip())
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        prompt = self._prompt(messages)
+        time.sleep(self._delay(prompt))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._answer(messages)))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                         **kwargs: Any) -> ChatResult:
+        prompt = self._prompt(messages)
+        await asyncio.sleep(self._delay(prompt))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._answer(messages)))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None,
+                **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        prompt = self._prompt(messages)
+        time.sleep(self._delay(prompt))
+        answer = self._answer(messages)
+        for start in range(0, len(answer), self.chunk_chars):
+            if start and self.token_delay:
+                time.sleep(self.token_delay)
+            piece = answer[start:start + self.chunk_chars]
+            if run_manager:
+                run_manager.on_llm_new_token(piece)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=piece))
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        prompt = self._prompt(messages)
+        await asyncio.sleep(self._delay(prompt))
+        answer = self._answer(messages)
+        for start in range(0, len(answer), self.chunk_chars):
+            if start and self.token_delay:
+                await asyncio.sleep(self.token_delay)
+            piece = answer[start:start + self.chunk_chars]
+            if run_manager:
+                await run_manager.on_llm_new_token(piece)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=piece))
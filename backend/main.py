@@ -1,34 +1,54 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 import os
 import json
 import uuid
 import re
+import hashlib
+import time
+import threading
+import contextvars
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
 from typing import Dict, Any, Optional, List
 from werkzeug.utils import secure_filename
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
 import logging
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from db_pool import ConnectionPool, pool_from_env
+from job_queue import JobQueue
+from embedding_cache import EmbeddingCache, CachedEmbeddings
+from extraction import ExtractionCache, StructuredExtractor
+from rule_extraction import RuleExtractor, combine as combine_extraction
+from response_cache import ResponseCache, DocumentSetVersion
+from bm25_index import BM25Index, HybridRetriever
+from retrieval_scope import RetrievalScope, scope_metadata, is_scope_key
+from chunker import StructuredChunker, chunk_id
+from intent_router import IntentRouter
+from keyword_matcher import KeywordMatcher
+from package_catalog import CatalogQuery, CatalogQueryError, CatalogCache, search_columns, date_rows
+from context_builder import TokenCounter, ContextBuilder, HistorySummarizer
+from metrics import (
+    REGISTRY, HTTP_REQUESTS, CHAT_STAGE_SECONDS, INGEST_STAGE_SECONDS, DB_SECONDS, CACHE_REQUESTS,
+    CHAT_RESPONSES, LLMMetricsCallback, new_trace_id, current_trace_id, trace, install_trace_logging
+)
+from session_store import SessionStore, MemorySessionStore, SQLiteSessionStore, PostgresSessionStore, MAX_SESSION_ID_LENGTH
+from startup import Startup
+from health import HealthMonitor
+import requests
 from langchain_core.prompts import ChatPromptTemplate
-from langchain.chains import create_retrieval_chain
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain.text_splitter import CharacterTextSplitter
-from langchain_chroma import Chroma
-from langchain.schema import Document
-from langchain_community.document_loaders import PyPDFLoader
+from langchain_core.runnables import RunnablePassthrough, RunnableLambda
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.documents import Document
+from document_reader import read_file_content, iter_document_pages, DocumentReadError, DOCX_AVAILABLE
+# The model clients, Chroma and the full langchain package are imported when
+# the components are initialized, so importing this module (worker boot) stays fast
 LANGCHAIN_AVAILABLE = True
 
-try:
-    import docx
-    DOCX_AVAILABLE = True
-except ImportError:
-    DOCX_AVAILABLE = False
-    print("python-docx not available. DOCX files won't be supported.")
-
 # Configure logging
 logging.basicConfig(level=logging.INFO)
+install_trace_logging()
 logger = logging.getLogger(__name__)
 
 # Initialize Flask app
@@ -42,11 +62,63 @@ app.config['UPLOAD_FOLDER'] = 'uploads'
 # Ensure directories exist
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 if LANGCHAIN_AVAILABLE:
-    os.makedirs('chroma', exist_ok=True)
+    os.makedirs(os.environ.get("CHROMA_DIR", "chroma"), exist_ok=True)
 
 # Constants
 ALLOWED_EXTENSIONS = {'txt', 'pdf', 'docx'} if DOCX_AVAILABLE else {'txt', 'pdf'}
 DATABASE_URL = os.environ.get("DATABASE_URL")
+JOB_QUEUE_PATH = os.environ.get("JOB_QUEUE_PATH", "jobs.db")
+JOB_KEEP_FINISHED = float(os.environ.get("JOB_KEEP_FINISHED", "604800"))
+# "openai" (remote models) or "local" (deterministic offline stand-ins for load testing)
+LLM_PROVIDER = os.environ.get("LLM_PROVIDER", "openai")
+LLM_MODEL = "gpt-4o-mini"
+LLM_BASE_URL = os.environ.get("LLM_BASE_URL", "https://models.inference.ai.azure.com")
+EMBEDDING_MODEL = "text-embedding-3-large"
+LOCAL_LLM_LATENCY = float(os.environ.get("LOCAL_LLM_LATENCY", "0.5"))
+LOCAL_LLM_JITTER = float(os.environ.get("LOCAL_LLM_JITTER", "0.2"))
+LOCAL_LLM_TOKEN_DELAY = float(os.environ.get("LOCAL_LLM_TOKEN_DELAY", "0.01"))
+LOCAL_EMBEDDING_LATENCY = float(os.environ.get("LOCAL_EMBEDDING_LATENCY", "0.05"))
+LOCAL_EMBEDDING_SIZE = int(os.environ.get("LOCAL_EMBEDDING_SIZE", "256"))
+EMBEDDING_CACHE_PATH = os.environ.get("EMBEDDING_CACHE_PATH", "embedding_cache.db")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.environ.get("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+EXTRACTION_CACHE_PATH = os.environ.get("EXTRACTION_CACHE_PATH", "extraction_cache.db")
+EXTRACTION_CACHE_MAX_ENTRIES = int(os.environ.get("EXTRACTION_CACHE_MAX_ENTRIES", "50000"))
+EXTRACTION_SECTION_CHARS = int(os.environ.get("EXTRACTION_SECTION_CHARS", "6000"))
+EXTRACTION_BATCH_CHARS = int(os.environ.get("EXTRACTION_BATCH_CHARS", "18000"))
+EXTRACTION_BATCH_SECTIONS = int(os.environ.get("EXTRACTION_BATCH_SECTIONS", "4"))
+EXTRACTION_MAX_SECTIONS = int(os.environ.get("EXTRACTION_MAX_SECTIONS", "20"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+RESPONSE_CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", "3600"))
+RESPONSE_CACHE_SIMILARITY = float(os.environ.get("RESPONSE_CACHE_SIMILARITY", "0.92"))
+CHROMA_DIR = os.environ.get("CHROMA_DIR", "chroma")
+DOCSET_VERSION_PATH = os.environ.get("DOCSET_VERSION_PATH", os.path.join(CHROMA_DIR, ".docset_version"))
+BM25_INDEX_PATH = os.environ.get("BM25_INDEX_PATH", os.path.join(CHROMA_DIR, "bm25_index.json"))
+RETRIEVAL_K = int(os.environ.get("RETRIEVAL_K", "4"))
+RETRIEVAL_FETCH_K = int(os.environ.get("RETRIEVAL_FETCH_K", "10"))
+CATALOG_VERSION_PATH = os.environ.get("CATALOG_VERSION_PATH", os.path.join(CHROMA_DIR, ".catalog_version"))
+CATALOG_PAGE_SIZE = int(os.environ.get("CATALOG_PAGE_SIZE", "50"))
+CATALOG_MAX_PAGE_SIZE = int(os.environ.get("CATALOG_MAX_PAGE_SIZE", "200"))
+CATALOG_CACHE_MAX_ENTRIES = int(os.environ.get("CATALOG_CACHE_MAX_ENTRIES", "256"))
+SESSION_BACKEND = os.environ.get("SESSION_BACKEND", "memory")
+SESSION_DB_PATH = os.environ.get("SESSION_DB_PATH", "sessions.db")
+SESSION_TTL = float(os.environ.get("SESSION_TTL", "86400"))
+SESSION_MAX = int(os.environ.get("SESSION_MAX", "10000"))
+SESSION_MAX_MESSAGES = int(os.environ.get("SESSION_MAX_MESSAGES", "20"))
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", "1500"))
+HISTORY_TOKEN_BUDGET = int(os.environ.get("HISTORY_TOKEN_BUDGET", "500"))
+HISTORY_RECENT_MESSAGES = int(os.environ.get("HISTORY_RECENT_MESSAGES", "4"))
+HISTORY_SUMMARY_BATCH = int(os.environ.get("HISTORY_SUMMARY_BATCH", "4"))
+HEALTH_CHECK_INTERVAL = float(os.environ.get("HEALTH_CHECK_INTERVAL", "15"))
+HEALTH_CHECK_TIMEOUT = float(os.environ.get("HEALTH_CHECK_TIMEOUT", "5"))
+STARTUP_WAIT_TIMEOUT = float(os.environ.get("STARTUP_WAIT_TIMEOUT", "30"))
+INGEST_WORKERS = int(os.environ.get("INGEST_WORKERS", "2"))
+INGEST_PARSE_WORKERS = int(os.environ.get("INGEST_PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+INGEST_IO_WORKERS = int(os.environ.get("INGEST_IO_WORKERS", "8"))
+INGEST_LLM_CONCURRENCY = int(os.environ.get("INGEST_LLM_CONCURRENCY", "4"))
+INGEST_EMBED_CONCURRENCY = int(os.environ.get("INGEST_EMBED_CONCURRENCY", "4"))
+INGEST_DB_CONCURRENCY = int(os.environ.get("INGEST_DB_CONCURRENCY", "4"))
+INGEST_EMBED_BATCH_CHARS = int(os.environ.get("INGEST_EMBED_BATCH_CHARS", "8000"))
+CHUNK_MAX_CHARS = int(os.environ.get("CHUNK_MAX_CHARS", "1200"))
 
 TRAVEL_KEYWORDS = {
     # Serbian keywords
@@ -68,296 +140,579 @@ TRAVEL_KEYWORDS = {
     "mountain", "museum", "culture", "adventure", "cruise", "resort",
     "visa", "passport", "luggage", "transportation", "airport"
 }
+TRAVEL_KEYWORD_THRESHOLD = 3
+TRAVEL_MATCHER = KeywordMatcher(TRAVEL_KEYWORDS)
+
+# Intents recognized by the fallback response when no LLM is configured
+RESERVE_MATCHER = KeywordMatcher(["rezerviram", "hoću da idem", "bukiram", "rezervacija", "booking"])
+GREETING_MATCHER = KeywordMatcher(["zdravo", "pozdrav", "hello", "hi"])
+THANKS_MATCHER = KeywordMatcher(["hvala", "thanks", "thank you"])
+
+CHAT_ERROR_MESSAGE = "Došlo je do greške. Molim pokušajte ponovo."
+CHAT_SYSTEM_ERROR_MESSAGE = "Došlo je do greške u sistemu. Molim pokušajte ponovo."
+
+def error_response(content: str = CHAT_ERROR_MESSAGE) -> Dict[str, Any]:
+    """Chat answer for a turn that failed"""
+    return {"content": content, "reserve": False, "gmail": ""}
 
 # Global variables
 llm = None
 embeddings = None
+embedding_cache = None
+extractor = None
+rule_extractor = RuleExtractor()
 vector_store = None
-user_sessions = {}
+bm25_index = None
+response_cache = None
+docset_version = DocumentSetVersion(DOCSET_VERSION_PATH)
+catalog_version = DocumentSetVersion(CATALOG_VERSION_PATH)
+catalog_cache = CatalogCache(CATALOG_CACHE_MAX_ENTRIES)
+session_store = None
+history_summarizer = None
+intent_router = None
+retrieval_scope = None
+travel_bot = None
+startup = Startup()
+health_monitor = HealthMonitor(interval=HEALTH_CHECK_INTERVAL)
+chat_metrics = LLMMetricsCallback("chat")
+CHAT_RUN_CONFIG = {"callbacks": [chat_metrics]}
+extraction_metrics = LLMMetricsCallback("extraction")
+summary_metrics = LLMMetricsCallback("summary")
+context_builder = ContextBuilder(
+    TokenCounter(LLM_MODEL),
+    context_tokens=CONTEXT_TOKEN_BUDGET,
+    history_tokens=HISTORY_TOKEN_BUDGET
+)
+db_pool = None
+db_pool_pid = None
+db_pool_lock = threading.Lock()
+
+# Ingestion concurrency: PDF/DOCX parsing is CPU-bound and runs in processes,
+# the LLM, embedding and DB stages mostly wait on the network and run in threads
+parse_executor = None
+io_executor = None
+executor_pid = None
+executor_lock = threading.Lock()
+llm_slots = threading.BoundedSemaphore(INGEST_LLM_CONCURRENCY)
+embed_slots = threading.BoundedSemaphore(INGEST_EMBED_CONCURRENCY)
+db_slots = threading.BoundedSemaphore(INGEST_DB_CONCURRENCY)
+
+# Content hashes of documents currently being ingested in this process
+inflight_hashes = set()
+inflight_lock = threading.Lock()
 
+def get_db_pool() -> ConnectionPool:
+    """Get the per-process database connection pool, creating it on first use"""
+    global db_pool, db_pool_pid
+
+    # Connections must not be shared across forked gunicorn workers
+    if db_pool is not None and db_pool_pid == os.getpid():
+        return db_pool
+
+    with db_pool_lock:
+        if db_pool is None or db_pool_pid != os.getpid():
+            db_pool = pool_from_env(DATABASE_URL)
+            db_pool_pid = os.getpid()
+            logger.info(f"Database pool created (min={db_pool.min_size}, max={db_pool.max_size})")
+    return db_pool
+
+@contextmanager
 def get_db_connection():
-    """Get database connection with error handling"""
+    """Borrow a pooled database connection, yields None if unavailable"""
+    pool = get_db_pool()
+    start = time.perf_counter()
     try:
-        conn = psycopg2.connect(DATABASE_URL)
-        return conn
+        conn = pool.getconn()
     except Exception as e:
         logger.error(f"Database connection error: {e}")
-        return None
+        conn = None
+    DB_SECONDS.observe(time.perf_counter() - start, operation="checkout")
 
-def init_database():
-    """Initialize database tables"""
     try:
-        conn = get_db_connection()
-        if not conn:
-            return False
-            
-        with conn.cursor() as cursor:
-            # Create table for travel packages
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS travel_packages (
-                    id SERIAL PRIMARY KEY,
-                    filename VARCHAR(255) NOT NULL UNIQUE,
-                    title VARCHAR(500),
-                    description TEXT,
-                    destinations JSONB DEFAULT '[]',
-                    duration_days INTEGER,
-                    duration_nights INTEGER,
-                    transport_type VARCHAR(100),
-                    dates JSONB DEFAULT '[]',
-                    prices JSONB DEFAULT '{}',
-                    hotels JSONB DEFAULT '[]',
-                    includes JSONB DEFAULT '[]',
-                    excludes JSONB DEFAULT '[]',
-                    highlights JSONB DEFAULT '[]',
-                    contact_info JSONB DEFAULT '{}',
-                    raw_content TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            # Create indexes for faster searches
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_travel_packages_filename ON travel_packages(filename)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_travel_packages_destinations ON travel_packages USING GIN(destinations)")
-            
-            conn.commit()
-            logger.info("Database tables initialized successfully")
-            return True
-            
-    except Exception as e:
-        logger.error(f"Database initialization error: {e}")
-        return False
+        yield conn
+    except Exception:
+        if conn:
+            pool.putconn(conn, close=bool(conn.closed))
+            conn = None
+        raise
     finally:
         if conn:
-            conn.close()
+            pool.putconn(conn)
 
-def read_docx(file_path: str) -> str:
-    """Read DOCX file content"""
-    if not DOCX_AVAILABLE:
-        raise ImportError("python-docx not available")
-    
-    try:
-        doc = docx.Document(file_path)
-        return "\n".join([para.text for para in doc.paragraphs])
-    except Exception as e:
-        logger.error(f"Error reading DOCX file {file_path}: {e}")
-        return ""
+PACKAGE_COLUMNS = [
+    'filename', 'title', 'description', 'destinations', 'duration_days', 'duration_nights',
+    'transport_type', 'dates', 'prices', 'hotels', 'includes', 'excludes', 'highlights',
+    'raw_content', 'source_name', 'content_hash', 'price_min', 'price_max', 'departure_months'
+]
+DATE_COLUMNS = [
+    'position', 'departure_date', 'return_date', 'departure_month', 'departure_text',
+    'return_text', 'price_regular', 'price_discounted'
+]
 
-def read_file_content(file_path: str) -> str:
-    """Read content from various file types"""
+def init_database():
+    """Initialize database tables"""
     try:
-        file_ext = file_path.split('.')[-1].lower()
-        
-        if file_ext == 'txt':
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                return f.read()
-        elif file_ext == 'pdf' and LANGCHAIN_AVAILABLE:
-            loader = PyPDFLoader(file_path)
-            pages = loader.load()
-            return "\n".join([page.page_content for page in pages])
-        elif file_ext == 'docx':
-            return read_docx(file_path)
-        else:
-            logger.warning(f"Unsupported file type: {file_ext}")
-            return ""
+        with get_db_connection() as conn:
+            if not conn:
+                return False
+
+            with conn.cursor() as cursor:
+                # Create table for travel packages
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS travel_packages (
+                        id SERIAL PRIMARY KEY,
+                        filename VARCHAR(255) NOT NULL UNIQUE,
+                        title VARCHAR(500),
+                        description TEXT,
+                        destinations JSONB DEFAULT '[]',
+                        duration_days INTEGER,
+                        duration_nights INTEGER,
+                        transport_type VARCHAR(100),
+                        dates JSONB DEFAULT '[]',
+                        prices JSONB DEFAULT '{}',
+                        hotels JSONB DEFAULT '[]',
+                        includes JSONB DEFAULT '[]',
+                        excludes JSONB DEFAULT '[]',
+                        highlights JSONB DEFAULT '[]',
+                        contact_info JSONB DEFAULT '{}',
+                        raw_content TEXT,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+
+                # Create indexes for faster searches
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_travel_packages_filename ON travel_packages(filename)")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_travel_packages_destinations ON travel_packages USING GIN(destinations)")
+
+                # Content-hash keyed documents for deduplication and re-ingestion
+                cursor.execute("ALTER TABLE travel_packages ADD COLUMN IF NOT EXISTS source_name VARCHAR(255)")
+                cursor.execute("ALTER TABLE travel_packages ADD COLUMN IF NOT EXISTS content_hash CHAR(64)")
+                cursor.execute(r"""
+                    UPDATE travel_packages
+                    SET source_name = regexp_replace(filename, '^\d{8}_\d{6}_', '')
+                    WHERE source_name IS NULL
+                """)
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_travel_packages_content_hash ON travel_packages(content_hash)")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_travel_packages_source_name ON travel_packages(source_name)")
+
+                # Filter columns for /api/travel-packages, derived from dates on save
+                cursor.execute("ALTER TABLE travel_packages ADD COLUMN IF NOT EXISTS price_min DOUBLE PRECISION")
+                cursor.execute("ALTER TABLE travel_packages ADD COLUMN IF NOT EXISTS price_max DOUBLE PRECISION")
+                cursor.execute("ALTER TABLE travel_packages ADD COLUMN IF NOT EXISTS departure_months SMALLINT[]")
+                cursor.execute("SELECT id, dates FROM travel_packages WHERE departure_months IS NULL")
+                for package_id, dates in cursor.fetchall():
+                    columns = search_columns(dates)
+                    cursor.execute(
+                        "UPDATE travel_packages SET price_min = %s, price_max = %s, departure_months = %s WHERE id = %s",
+                        (columns['price_min'], columns['price_max'], columns['departure_months'], package_id)
+                    )
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_travel_packages_created_at ON travel_packages(created_at DESC, id DESC)")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_travel_packages_transport_type ON travel_packages(lower(transport_type))")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_travel_packages_duration_days ON travel_packages(duration_days)")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_travel_packages_price_min ON travel_packages(price_min)")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_travel_packages_price_max ON travel_packages(price_max)")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_travel_packages_departure_months ON travel_packages USING GIN(departure_months)")
+
+                # Normalized departures with their prices
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS travel_package_dates (
+                        package_id INTEGER NOT NULL REFERENCES travel_packages(id) ON DELETE CASCADE,
+                        position SMALLINT NOT NULL,
+                        departure_date DATE,
+                        return_date DATE,
+                        departure_month SMALLINT,
+                        departure_text TEXT,
+                        return_text TEXT,
+                        price_regular DOUBLE PRECISION,
+                        price_discounted DOUBLE PRECISION,
+                        PRIMARY KEY (package_id, position)
+                    )
+                """)
+                cursor.execute("""
+                    SELECT id, dates FROM travel_packages p
+                    WHERE jsonb_typeof(dates) = 'array' AND jsonb_array_length(dates) > 0
+                      AND NOT EXISTS (SELECT 1 FROM travel_package_dates d WHERE d.package_id = p.id)
+                """)
+                backfill = [
+                    (package_id,) + tuple(row[column] for column in DATE_COLUMNS)
+                    for package_id, dates in cursor.fetchall()
+                    for row in date_rows(dates)
+                ]
+                if backfill:
+                    execute_values(cursor, f"""
+                        INSERT INTO travel_package_dates (package_id, {", ".join(DATE_COLUMNS)})
+                        VALUES %s
+                    """, backfill)
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_travel_package_dates_departure_date ON travel_package_dates(departure_date)")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_travel_package_dates_departure_month ON travel_package_dates(departure_month)")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_travel_package_dates_price_regular ON travel_package_dates(price_regular)")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_travel_package_dates_price_discounted ON travel_package_dates(price_discounted)")
+
+                conn.commit()
+                logger.info("Database tables initialized successfully")
+                return True
+
     except Exception as e:
-        logger.error(f"Error reading file {file_path}: {e}")
-        return ""
+        logger.error(f"Database initialization error: {e}")
+        return False
 
 def extract_structured_data(content: str, filename: str) -> Dict:
     """Extract structured data from travel document using LLM"""
-    if not llm or not content.strip():
-        return {}
-    
-    try:
-        extraction_prompt = ChatPromptTemplate.from_template("""
-        Analiziraj sledeći turistički dokument i izdvoji strukturirane podatke u JSON formatu.
-        
-        VAŽNO: Izvlači SAMO podatke koji STVARNO postoje u dokumentu. Ne izmišljaj podatke!
-        
-        Dokument: {content}
-        
-        Vrati JSON sa sledećim poljima (ostavi prazno ili null ako podaci ne postoje):
-        {{
-            "title": "Naslov putovanja",
-            "description": "Kratak opis putovanja", 
-            "destinations": ["lista glavnih destinacija"],
-            "duration_days": broj_dana,
-            "duration_nights": broj_noćenja,
-            "transport_type": "tip prevoza",
-            "dates": [
-                {{
-                    "departure_date": "datum polaska",
-                    "return_date": "datum povratka", 
-                    "price_regular": cena_regularna,
-                    "price_discounted": cena_sa_popustom
-                }}
-            ],
-            "hotels": [
-                {{
-                    "name": "naziv hotela",
-                    "category": "kategorija",
-                    "location": "lokacija"
-                }}
-            ],
-            "includes": ["šta je uključeno u cenu"],
-            "excludes": ["šta NIJE uključeno u cenu"],
-            "highlights": ["glavne atrakcije/aktivnosti"],
-            "additional_costs": {{
-                "single_room_supplement": iznos,
-                "optional_tours": iznos,
-                "other": "ostali troškovi"
-            }}
-        }}
-        
-        Odgovori SAMO sa JSON-om, bez dodatnog teksta.
-        """)
-        
-        chain = extraction_prompt | llm
-        response = chain.invoke({"content": content[:4000]})  # Limit content length
-        
-        # Parse JSON response
-        json_str = response.content.strip()
-        
-        # Clean up response if it contains markdown formatting
-        if json_str.startswith("```json"):
-            json_str = json_str.replace("```json", "").replace("```", "").strip()
-        elif json_str.startswith("```"):
-            json_str = json_str.replace("```", "").strip()
-        
+    return extract_many_structured_data([(filename, content)]).get(filename, {})
+
+def extract_many_structured_data(documents: List[tuple]) -> Dict[str, Dict]:
+    """Structured data for (filename, content) pairs.
+
+    The price-list rules run first. Only documents they cannot resolve go to
+    the LLM (sections of all of them share requests), and every field the
+    rules found overrides the LLM's value.
+    """
+    documents = [(filename, content) for filename, content in documents if content and content.strip()]
+    rules = {filename: rule_extractor.extract(content) for filename, content in documents}
+    unresolved = [(filename, content) for filename, content in documents
+                  if not rule_extractor.is_confident(rules[filename])]
+
+    extracted = {}
+    if extractor and unresolved:
         try:
-            structured_data = json.loads(json_str)
-            return structured_data
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON parse error for {filename}: {e}")
-            logger.error(f"Response was: {json_str}")
-            return {}
-            
-    except Exception as e:
-        logger.error(f"Structured data extraction error for {filename}: {e}")
-        return {}
+            with llm_slots:
+                extracted = extractor.extract_many(unresolved)
+        except Exception as e:
+            logger.error(f"Structured data extraction error for {[filename for filename, _ in unresolved]}: {e}")
 
-def save_to_database(filename: str, structured_data: Dict, raw_content: str) -> bool:
-    """Save structured data to database"""
-    try:
-        conn = get_db_connection()
+    return {filename: combine_extraction(rules[filename], extracted.get(filename, {})) for filename, _ in documents}
+
+def compute_file_hash(file_path: str) -> str:
+    """SHA-256 of the file contents"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def compute_text_hash(text: str) -> str:
+    """SHA-256 of a text chunk"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def get_source_name(filename: str) -> str:
+    """Document key: stored filename without the upload timestamp prefix"""
+    return re.sub(r'^\d{8}_\d{6}_', '', filename)
+
+def find_existing_document(content_hash: str, source_name: str) -> tuple:
+    """Look up a stored document, returns (identical_filename, previous_version_filename)"""
+    with DB_SECONDS.time(operation="find_existing"), get_db_connection() as conn:
         if not conn:
-            return False
-            
+            return None, None
+
         with conn.cursor() as cursor:
-            # Check if record already exists
-            cursor.execute("SELECT id FROM travel_packages WHERE filename = %s", (filename,))
-            existing = cursor.fetchone()
-            
-            if existing:
-                # Update existing record
-                cursor.execute("""
-                    UPDATE travel_packages SET
-                        title = %s,
-                        description = %s,
-                        destinations = %s,
-                        duration_days = %s,
-                        duration_nights = %s,
-                        transport_type = %s,
-                        dates = %s,
-                        prices = %s,
-                        hotels = %s,
-                        includes = %s,
-                        excludes = %s,
-                        highlights = %s,
-                        raw_content = %s,
+            cursor.execute(
+                "SELECT filename FROM travel_packages WHERE content_hash = %s LIMIT 1",
+                (content_hash,)
+            )
+            identical = cursor.fetchone()
+            if identical:
+                return identical[0], None
+
+            cursor.execute(
+                "SELECT filename FROM travel_packages WHERE source_name = %s ORDER BY updated_at DESC LIMIT 1",
+                (source_name,)
+            )
+            previous = cursor.fetchone()
+            return None, previous[0] if previous else None
+
+def package_row(package: Dict[str, Any]) -> tuple:
+    """Column values of one travel_packages row, in PACKAGE_COLUMNS order"""
+    filename = package['filename']
+    data = package.get('structured_data') or {}
+    columns = search_columns(data.get('dates', []))
+    return (
+        filename,
+        data.get('title'),
+        data.get('description'),
+        json.dumps(data.get('destinations', []), ensure_ascii=False),
+        data.get('duration_days'),
+        data.get('duration_nights'),
+        data.get('transport_type'),
+        json.dumps(data.get('dates', []), ensure_ascii=False),
+        json.dumps(data.get('additional_costs', {}), ensure_ascii=False),
+        json.dumps(data.get('hotels', []), ensure_ascii=False),
+        json.dumps(data.get('includes', []), ensure_ascii=False),
+        json.dumps(data.get('excludes', []), ensure_ascii=False),
+        json.dumps(data.get('highlights', []), ensure_ascii=False),
+        package.get('raw_content'),
+        get_source_name(filename),
+        package.get('content_hash'),
+        columns['price_min'],
+        columns['price_max'],
+        columns['departure_months']
+    )
+
+def save_packages_to_database(packages: List[Dict[str, Any]]) -> List[str]:
+    """Upsert many packages in one transaction, returns the saved filenames.
+
+    Each package is a dict with filename, structured_data, raw_content and
+    optionally content_hash and replaces (filename of the older version of
+    the same document, whose row the new version takes over).
+    """
+    # A filename can only be written once per statement, the last one wins
+    packages = list({package['filename']: package for package in packages}.values())
+    if not packages:
+        return []
+
+    try:
+        with DB_SECONDS.time(operation="save_packages"), get_db_connection() as conn:
+            if not conn:
+                return []
+
+            with conn.cursor() as cursor:
+                renames = [
+                    (package['replaces'], package['filename']) for package in packages
+                    if package.get('replaces') and package['replaces'] != package['filename']
+                ]
+                if renames:
+                    # New versions of known documents take over their rows
+                    execute_values(cursor, """
+                        UPDATE travel_packages t SET filename = v.new_filename
+                        FROM (VALUES %s) AS v(old_filename, new_filename)
+                        WHERE t.filename = v.old_filename
+                          AND NOT EXISTS (SELECT 1 FROM travel_packages e WHERE e.filename = v.new_filename)
+                    """, renames)
+
+                updates = ", ".join(
+                    f"{column} = EXCLUDED.{column}" for column in PACKAGE_COLUMNS if column != 'filename'
+                )
+                saved = execute_values(cursor, f"""
+                    INSERT INTO travel_packages ({", ".join(PACKAGE_COLUMNS)})
+                    VALUES %s
+                    ON CONFLICT (filename) DO UPDATE SET
+                        {updates},
                         updated_at = CURRENT_TIMESTAMP
-                    WHERE filename = %s
-                """, (
-                    structured_data.get('title'),
-                    structured_data.get('description'),
-                    json.dumps(structured_data.get('destinations', []), ensure_ascii=False),
-                    structured_data.get('duration_days'),
-                    structured_data.get('duration_nights'),
-                    structured_data.get('transport_type'),
-                    json.dumps(structured_data.get('dates', []), ensure_ascii=False),
-                    json.dumps(structured_data.get('additional_costs', {}), ensure_ascii=False),
-                    json.dumps(structured_data.get('hotels', []), ensure_ascii=False),
-                    json.dumps(structured_data.get('includes', []), ensure_ascii=False),
-                    json.dumps(structured_data.get('excludes', []), ensure_ascii=False),
-                    json.dumps(structured_data.get('highlights', []), ensure_ascii=False),
-                    raw_content,
-                    filename
-                ))
-            else:
-                # Insert new record
-                cursor.execute("""
-                    INSERT INTO travel_packages (
-                        filename, title, description, destinations, duration_days,
-                        duration_nights, transport_type, dates, prices, hotels,
-                        includes, excludes, highlights, raw_content
-                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """, (
-                    filename,
-                    structured_data.get('title'),
-                    structured_data.get('description'),
-                    json.dumps(structured_data.get('destinations', []), ensure_ascii=False),
-                    structured_data.get('duration_days'),
-                    structured_data.get('duration_nights'),
-                    structured_data.get('transport_type'),
-                    json.dumps(structured_data.get('dates', []), ensure_ascii=False),
-                    json.dumps(structured_data.get('additional_costs', {}), ensure_ascii=False),
-                    json.dumps(structured_data.get('hotels', []), ensure_ascii=False),
-                    json.dumps(structured_data.get('includes', []), ensure_ascii=False),
-                    json.dumps(structured_data.get('excludes', []), ensure_ascii=False),
-                    json.dumps(structured_data.get('highlights', []), ensure_ascii=False),
-                    raw_content
-                ))
-            
-            conn.commit()
-            return True
-            
+                    RETURNING id, filename
+                """, [package_row(package) for package in packages], fetch=True)
+                package_ids = {filename: package_id for package_id, filename in saved}
+
+                # Departures and their prices, one row each
+                cursor.execute(
+                    "DELETE FROM travel_package_dates WHERE package_id = ANY(%s)",
+                    (list(package_ids.values()),)
+                )
+                date_values = [
+                    (package_ids[package['filename']],) + tuple(row[column] for column in DATE_COLUMNS)
+                    for package in packages
+                    for row in date_rows((package.get('structured_data') or {}).get('dates', []))
+                ]
+                if date_values:
+                    execute_values(cursor, f"""
+                        INSERT INTO travel_package_dates (package_id, {", ".join(DATE_COLUMNS)})
+                        VALUES %s
+                    """, date_values)
+
+                conn.commit()
+                catalog_version.bump()
+                return list(package_ids)
+
     except Exception as e:
-        logger.error(f"Database save error for {filename}: {e}")
-        return False
-    finally:
-        if conn:
-            conn.close()
+        logger.error(f"Database save error for {len(packages)} package(s): {e}")
+        return []
+
+def save_to_database(filename: str, structured_data: Dict, raw_content: str,
+                     content_hash: Optional[str] = None, replaces: Optional[str] = None) -> bool:
+    """Save structured data to database, optionally replacing an older version of the document"""
+    return filename in save_packages_to_database([{
+        'filename': filename,
+        'structured_data': structured_data,
+        'raw_content': raw_content,
+        'content_hash': content_hash,
+        'replaces': replaces
+    }])
 
-def validate_travel_content(text: str) -> bool:
-    """Validate if content is travel/tourism related"""
+def validate_travel_content(text: str, found: Optional[set] = None) -> bool:
+    """Validate if content is travel/tourism related (at least TRAVEL_KEYWORD_THRESHOLD travel keywords).
+
+    The scan stops as soon as enough keywords are found. ``found`` collects
+    the matched keywords across calls, so a document can be validated page
+    by page without rescanning earlier pages.
+    """
     if not text.strip():
-        return False
-    
-    text_lower = text.lower()
-    keyword_count = sum(1 for keyword in TRAVEL_KEYWORDS if keyword in text_lower)
-    return keyword_count >= 3  # Require at least 3 travel keywords
+        return bool(found) and len(found) >= TRAVEL_KEYWORD_THRESHOLD
+    return len(TRAVEL_MATCHER.matches(text, limit=TRAVEL_KEYWORD_THRESHOLD, found=found)) >= TRAVEL_KEYWORD_THRESHOLD
+
+class VectorStoreSync:
+    """Incrementally sync one document's chunks into the vector store.
+
+    Text is fed page by page and split along the page's structure (see
+    StructuredChunker); complete chunks are embedded in batches while the
+    rest of the document is still being parsed. Chunk ids are derived from
+    the document, the chunk's position on its page and its content, so
+    unchanged chunks of a re-uploaded document keep their embeddings and
+    ``finish`` removes chunks that disappeared. The BM25 keyword index is
+    updated in one step at ``finish``.
+    """
+
+    def __init__(self, filename: str, batch_chars: int = INGEST_EMBED_BATCH_CHARS):
+        self.filename = filename
+        self.source_name = get_source_name(filename)
+        self.upload_date = datetime.now().isoformat()
+        self.batch_chars = batch_chars
+        self.chunker = StructuredChunker(max_chars=CHUNK_MAX_CHARS)
+
+        existing = vector_store.get(where={"source_name": self.source_name}, include=[])
+        self.existing_ids = set(existing.get("ids", []))
+
+        self.pending_chunks = []
+        self.pending_chars = 0
+        self.position = 0
+        self.seen_ids = set()
+        self.seen_hashes = set()
+        self.keyword_chunks = []
+        self.added_ids = []
+        self.added = 0
+        self.kept = 0
+        self.removed = 0
+
+    def _metadata(self, chunk: Dict[str, Any], chunk_hash: str) -> Dict[str, Any]:
+        metadata = {
+            "source": self.filename,
+            "source_name": self.source_name,
+            "chunk_id": chunk['position'],
+            "chunk_hash": chunk_hash,
+            "page": chunk['page'],
+            "upload_date": self.upload_date
+        }
+        if chunk.get('section'):
+            metadata["section"] = chunk['section']
+        return metadata
+
+    def _store_chunks(self, chunks: List[Dict[str, Any]]) -> None:
+        new_ids, documents, kept_ids, kept_metadata = [], [], [], []
+        for chunk in chunks:
+            chunk_hash = compute_text_hash(chunk['text'])
+            # Repeated chunks (page headers and footers) are stored once
+            if chunk_hash in self.seen_hashes:
+                continue
+            self.seen_hashes.add(chunk_hash)
+
+            doc_id = chunk_id(self.source_name, chunk['page'], chunk['index'], chunk['text'])
+            self.seen_ids.add(doc_id)
+            metadata = self._metadata(chunk, chunk_hash)
+            self.keyword_chunks.append((doc_id, chunk['text'], metadata))
+            if doc_id in self.existing_ids:
+                kept_ids.append(doc_id)
+                kept_metadata.append(metadata)
+            else:
+                new_ids.append(doc_id)
+                documents.append(Document(page_content=chunk['text'], metadata=metadata))
+
+        # Unchanged chunks keep their embeddings, only the metadata follows the new file
+        if kept_ids:
+            vector_store._collection.update(ids=kept_ids, metadatas=kept_metadata)
+            self.kept += len(kept_ids)
+        if documents:
+            vector_store.add_documents(documents, ids=new_ids)
+            self.added_ids.extend(new_ids)
+            self.added += len(documents)
+
+    def feed(self, text: str, page: int = 1) -> None:
+        """Add a page; its chunks are embedded once enough text is buffered"""
+        for index, chunk in enumerate(self.chunker.split_page(text)):
+            chunk.update(page=page, index=index, position=self.position)
+            self.position += 1
+            self.pending_chunks.append(chunk)
+            self.pending_chars += len(chunk['text'])
+
+        if self.pending_chars >= self.batch_chars:
+            self._store_chunks(self.pending_chunks)
+            self.pending_chunks, self.pending_chars = [], 0
+
+    def finish(self) -> None:
+        """Embed the remaining chunks and delete chunks no longer in the document"""
+        if self.pending_chunks:
+            self._store_chunks(self.pending_chunks)
+        self.pending_chunks, self.pending_chars = [], 0
+
+        stale_ids = [doc_id for doc_id in self.existing_ids if doc_id not in self.seen_ids]
+        if stale_ids:
+            vector_store.delete(ids=stale_ids)
+        self.removed = len(stale_ids)
+
+        # Keep the keyword index in step with the vector store
+        if bm25_index is not None:
+            with bm25_index.transaction() as index:
+                index.remove(stale_ids)
+                for doc_id, chunk, metadata in self.keyword_chunks:
+                    # Chroma merges the update of an unchanged chunk, so it keeps its scope flags; so does BM25
+                    previous = index.get_document(doc_id) if doc_id in self.existing_ids else None
+                    if previous:
+                        metadata = {**{key: value for key, value in previous.metadata.items() if is_scope_key(key)},
+                                    **metadata}
+                    index.add(doc_id, chunk, metadata)
+
+        logger.info(
+            f"Vector store sync for {self.filename}: {self.added} added, "
+            f"{self.kept} unchanged, {self.removed} removed"
+        )
+
+    def abort(self) -> None:
+        """Remove the chunks added so far; the previous version of the document stays as it was"""
+        if self.added_ids:
+            vector_store.delete(ids=self.added_ids)
+        logger.info(f"Vector store sync for {self.filename} aborted, {len(self.added_ids)} added chunks removed")
+
+def tag_document_chunks(filename: str, package: Dict[str, Any]) -> None:
+    """Put the destination, month and transport flags of the extracted package on the document's chunks"""
+    if not vector_store:
+        return
+    try:
+        flags = scope_metadata(package or {})
+        existing = vector_store.get(where={"source_name": get_source_name(filename)}, include=["metadatas"])
+        ids, metadatas = [], []
+        for doc_id, metadata in zip(existing.get("ids", []), existing.get("metadatas", [])):
+            current = {key: value for key, value in (metadata or {}).items() if is_scope_key(key)}
+            if current == flags:
+                continue
+            # Chroma merges updated metadata, flags of the previous version are removed with None
+            ids.append(doc_id)
+            metadatas.append({**{key: None for key in current if key not in flags}, **flags})
+        if ids:
+            vector_store._collection.update(ids=ids, metadatas=metadatas)
+
+        # The keyword index is checked on its own, it can be out of step with Chroma
+        if bm25_index is not None:
+            outdated = [
+                document for document in map(bm25_index.get_document, existing.get("ids", []))
+                if document and {key: value for key, value in document.metadata.items() if is_scope_key(key)} != flags
+            ]
+            if outdated:
+                with bm25_index.transaction() as index:
+                    for document in outdated:
+                        index.update_metadata(document.id, {
+                            **{key: value for key, value in document.metadata.items() if not is_scope_key(key)},
+                            **flags
+                        })
+    except Exception as e:
+        logger.error(f"Error tagging chunks of {filename}: {e}")
+
+def tag_catalog_chunks() -> None:
+    """Tag chunks of documents stored before their chunks carried scope flags"""
+    with get_db_connection() as conn:
+        if conn is None:
+            return
+        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            cursor.execute("SELECT filename, destinations, dates, transport_type FROM travel_packages")
+            packages = cursor.fetchall()
+    for package in packages:
+        tag_document_chunks(package['filename'], package)
 
 def add_document_to_vector_store(content: str, filename: str) -> bool:
-    """Add document to vector store"""
+    """Add document to vector store, re-embedding only chunks that changed since the last version"""
     if not vector_store or not content.strip():
         return False
     
     try:
-        # Split text into chunks
-        text_splitter = CharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            separator="\n"
-        )
-        chunks = text_splitter.split_text(content)
-        
-        # Create documents
-        documents = [
-            Document(
-                page_content=chunk,
-                metadata={
-                    "source": filename, 
-                    "chunk_id": i,
-                    "upload_date": datetime.now().isoformat()
-                }
-            )
-            for i, chunk in enumerate(chunks)
-        ]
-        
-        # Add to vector store
-        vector_store.add_documents(documents)
-        logger.info(f"Added {len(documents)} chunks from {filename}")
+        sync = VectorStoreSync(filename)
+        sync.feed(content)
+        sync.finish()
         return True
         
     except Exception as e:
@@ -372,29 +727,109 @@ def generate_session_id() -> str:
     """Generate unique session ID"""
     return str(uuid.uuid4())
 
-def get_session_history(session_id: str, max_messages: int = 6) -> str:
-    """Get formatted conversation history"""
-    if session_id not in user_sessions:
+def create_session_store() -> SessionStore:
+    """Create the configured session store, falling back to memory"""
+    try:
+        if SESSION_BACKEND == 'sqlite':
+            return SQLiteSessionStore(SESSION_DB_PATH, ttl=SESSION_TTL, max_messages=SESSION_MAX_MESSAGES)
+        if SESSION_BACKEND == 'postgres':
+            return PostgresSessionStore(get_db_connection, ttl=SESSION_TTL, max_messages=SESSION_MAX_MESSAGES)
+    except Exception as e:
+        logger.error(f"Failed to initialize {SESSION_BACKEND} session store, using memory: {e}")
+
+    return MemorySessionStore(max_sessions=SESSION_MAX, ttl=SESSION_TTL, max_messages=SESSION_MAX_MESSAGES)
+
+def get_session_history(session_id: str, before_seq: Optional[int] = None) -> tuple:
+    """Get (history, user_messages) for a turn.
+
+    history is the prompt text: running summary plus recent messages within
+    the token budget. user_messages are the texts of the user's stored
+    messages, oldest first, for scoping retrieval.
+    """
+    with CHAT_STAGE_SECONDS.time(stage="history"):
+        summary, summary_upto = session_store.get_summary(session_id)
+        earlier = [
+            message for message in session_store.get_messages(session_id)
+            if before_seq is None or message.get('seq', 0) < before_seq
+        ]
+        messages = [message for message in earlier if message.get('seq', 0) > summary_upto]
+        user_messages = [message['content'] for message in earlier if message.get('role') == 'user']
+        return context_builder.build_history(summary, messages), user_messages
+
+HISTORY_SUMMARY_PROMPT = ChatPromptTemplate.from_template("""
+Sažmi razgovor između korisnika i turističkog asistenta TurBot u najviše 80 reči.
+Zadrži destinacije, datume, budžet, broj putnika, email i želje korisnika. Ne izmišljaj podatke.
+
+Dosadašnji sažetak:
+{summary}
+
+Novi deo razgovora:
+{transcript}
+
+Odgovori samo novim sažetkom.
+""")
+
+def summarize_history(summary: str, transcript: str) -> str:
+    """Fold newly aged messages into the running conversation summary using the LLM"""
+    if not llm:
         return ""
-    
-    messages = user_sessions[session_id]['messages'][-max_messages:]
-    history_parts = []
-    
-    for msg in messages:
-        role = "Korisnik" if msg['role'] == 'user' else "TurBot"
-        content = msg['content']
-        
-        # Extract content from JSON if it's bot response
-        if msg['role'] == 'assistant':
-            try:
-                data = json.loads(content)
-                content = data.get('content', content)
-            except:
-                pass
-        
-        history_parts.append(f"{role}: {content}")
-    
-    return "\n".join(history_parts)
+    response = (HISTORY_SUMMARY_PROMPT | llm).invoke({
+        "summary": summary or "(nema)",
+        "transcript": transcript
+    }, config={"callbacks": [summary_metrics]})
+    return response.content.strip()
+
+class ContentStreamDecoder:
+    """Incrementally decode the "content" string of a streamed JSON answer"""
+
+    ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = None  # index of the next undecoded character of the value
+        self.done = False
+
+    def feed(self, piece: str) -> str:
+        """Add raw model output, return newly decoded content text; ``buffer`` holds all output so far"""
+        self.buffer += piece
+        if self.done:
+            return ""
+
+        if self.pos is None:
+            match = re.search(r'"content"\s*:\s*"', self.buffer)
+            if not match:
+                return ""
+            self.pos = match.end()
+
+        out = []
+        i = self.pos
+        while i < len(self.buffer):
+            ch = self.buffer[i]
+            if ch == '"':
+                self.done = True
+                i += 1
+                break
+            if ch == '\\':
+                if i + 1 >= len(self.buffer):
+                    break
+                escape = self.buffer[i + 1]
+                if escape == 'u':
+                    if i + 6 > len(self.buffer):
+                        break
+                    try:
+                        out.append(chr(int(self.buffer[i + 2:i + 6], 16)))
+                    except ValueError:
+                        pass
+                    i += 6
+                else:
+                    out.append(self.ESCAPES.get(escape, escape))
+                    i += 2
+                continue
+            out.append(ch)
+            i += 1
+
+        self.pos = i
+        return "".join(out)
 
 class TravelBot:
     def __init__(self):
@@ -424,80 +859,165 @@ Istorija razgovora:
         
         if vector_store:
             try:
-                self.qa_chain = create_stuff_documents_chain(llm, self.system_prompt)
-                self.retrieval_chain = create_retrieval_chain(
-                    retriever=vector_store.as_retriever(search_kwargs={"k": 5}),
-                    combine_docs_chain=self.qa_chain
+                # Retrieved chunks are deduplicated and packed into the context token budget
+                self.qa_chain = (
+                    RunnablePassthrough.assign(context=lambda inputs: context_builder.pack_documents(inputs["context"]))
+                    | self.system_prompt
+                    | llm
+                    | StrOutputParser()
                 )
+                # Same shape as create_retrieval_chain, but the search sees the history to scope it
+                self.retriever = self._create_retriever()
+                self.retrieval_chain = RunnablePassthrough.assign(
+                    context=RunnableLambda(self._retrieve).with_config(run_name="retrieve_documents")
+                ).assign(answer=self.qa_chain)
             except Exception as e:
                 logger.error(f"Error creating retrieval chain: {e}")
                 self.retrieval_chain = None
         else:
             self.retrieval_chain = None
 
-    def process_message(self, message: str, session_history: str = "") -> Dict[str, Any]:
+    def _create_retriever(self):
+        """Hybrid vector + BM25 retriever, plain vector search if no keyword index"""
+        if bm25_index is None:
+            return vector_store.as_retriever(search_kwargs={"k": 5})
+        return HybridRetriever(
+            vector_store=vector_store,
+            bm25_index=bm25_index,
+            k=RETRIEVAL_K,
+            fetch_k=RETRIEVAL_FETCH_K
+        )
+
+    def _retrieve(self, inputs: Dict[str, Any], config) -> List[Document]:
+        """Chunks for the question, searched only among the trips it is about when it names any"""
+        if retrieval_scope is None:
+            return self.retriever.invoke(inputs["input"], config)
+        return retrieval_scope.retrieve(self.retriever, inputs["input"], inputs.get("user_messages", ()), config)
+
+    @staticmethod
+    def _chain_input(message: str, session_history: str, user_messages: List[str]) -> Dict[str, Any]:
+        return {"input": message, "history": session_history, "user_messages": user_messages or []}
+
+    def process_message(self, message: str, session_history: str = "",
+                        user_messages: Optional[List[str]] = None) -> Dict[str, Any]:
         """Process user message using RAG or fallback response"""
         if not self.retrieval_chain:
             return self._fallback_response(message)
 
         try:
             # Use RAG to get response with context
-            result = self.retrieval_chain.invoke({
-                "input": message,
-                "history": session_history
-            })
-            
-            response_text = result.get("answer", "")
-            # Try to parse JSON response
-            try:
-                # Extract JSON from response
-                start_idx = response_text.find('{')
-                end_idx = response_text.rfind('}') + 1
-                
-                if start_idx != -1 and end_idx > start_idx:
-                    json_str = response_text[start_idx:end_idx]
-                    response_data = json.loads(json_str)
-                else:
-                    raise ValueError("No JSON found")
-                    
-            except (json.JSONDecodeError, ValueError):
-                # Fallback if JSON parsing fails
-                response_data = {
-                    "content": response_text or "Izvinjavam se, nemam odgovor na vaše pitanje.",
-                    "reserve": False,
-                    "gmail": ""
-                }
-            
-            # Ensure all required fields exist
-            response_data.setdefault("content", "")
-            response_data.setdefault("reserve", False)
-            response_data.setdefault("gmail", "")
-            
-            return response_data
-            
+            result = self.retrieval_chain.invoke(self._chain_input(message, session_history, user_messages), config=CHAT_RUN_CONFIG)
+            return self._parse_response(result.get("answer", ""))
+        except Exception as e:
+            logger.error(f"Error processing message: {e}")
+            return error_response()
+
+    async def aprocess_message(self, message: str, session_history: str = "",
+                               user_messages: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Async variant of process_message, the LLM call does not hold a thread"""
+        if not self.retrieval_chain:
+            return self._fallback_response(message)
+
+        try:
+            result = await self.retrieval_chain.ainvoke(self._chain_input(message, session_history, user_messages), config=CHAT_RUN_CONFIG)
+            return self._parse_response(result.get("answer", ""))
         except Exception as e:
             logger.error(f"Error processing message: {e}")
-            return {
-                "content": "Došlo je do greške. Molim pokušajte ponovo.",
+            return error_response()
+
+    async def astream_message(self, message: str, session_history: str = "",
+                              user_messages: Optional[List[str]] = None):
+        """Async variant of stream_message.
+
+        Yields pieces of the ``content`` field as strings and finally the
+        response dict (same shape as ``process_message``).
+        """
+        if not self.retrieval_chain:
+            response_data = self._fallback_response(message)
+            yield response_data["content"]
+            yield response_data
+            return
+
+        try:
+            decoder = ContentStreamDecoder()
+            async for chunk in self.retrieval_chain.astream(self._chain_input(message, session_history, user_messages),
+                                                            config=CHAT_RUN_CONFIG):
+                text = decoder.feed(chunk.get("answer") or "")
+                if text:
+                    yield text
+            response_data = self._parse_response(decoder.buffer)
+        except Exception as e:
+            logger.error(f"Error streaming message: {e}")
+            response_data = error_response()
+        yield response_data
+
+    def stream_message(self, message: str, session_history: str = "",
+                       user_messages: Optional[List[str]] = None):
+        """Stream the answer content as it is generated.
+
+        Yields pieces of the ``content`` field, the generator's return value
+        is the final response dict (same shape as ``process_message``).
+        """
+        if not self.retrieval_chain:
+            response_data = self._fallback_response(message)
+            yield response_data["content"]
+            return response_data
+
+        try:
+            decoder = ContentStreamDecoder()
+            for chunk in self.retrieval_chain.stream(self._chain_input(message, session_history, user_messages), config=CHAT_RUN_CONFIG):
+                text = decoder.feed(chunk.get("answer") or "")
+                if text:
+                    yield text
+            return self._parse_response(decoder.buffer)
+        except Exception as e:
+            logger.error(f"Error streaming message: {e}")
+            return error_response()
+
+    def _parse_response(self, response_text: str) -> Dict[str, Any]:
+        """Parse the model's JSON answer into the response structure"""
+        start = time.perf_counter()
+        try:
+            # Extract JSON from response
+            start_idx = response_text.find('{')
+            end_idx = response_text.rfind('}') + 1
+            
+            if start_idx != -1 and end_idx > start_idx:
+                json_str = response_text[start_idx:end_idx]
+                response_data = json.loads(json_str)
+            else:
+                raise ValueError("No JSON found")
+                
+        except (json.JSONDecodeError, ValueError):
+            # Fallback if JSON parsing fails
+            response_data = {
+                "content": response_text or "Izvinjavam se, nemam odgovor na vaše pitanje.",
                 "reserve": False,
                 "gmail": ""
             }
+        
+        # Ensure all required fields exist
+        response_data.setdefault("content", "")
+        response_data.setdefault("reserve", False)
+        response_data.setdefault("gmail", "")
+
+        CHAT_STAGE_SECONDS.observe(time.perf_counter() - start, stage="parse")
+        CHAT_RESPONSES.inc(source="rag")
+        return response_data
     
     def _fallback_response(self, message: str) -> Dict[str, Any]:
         """Provide fallback response when LLM is not available"""
-        message_lower = message.lower()
-        
         # Check for reservation intent
-        reserve_keywords = ["rezerviram", "hoću da idem", "bukiram", "rezervacija", "booking"]
-        reserve_intent = any(keyword in message_lower for keyword in reserve_keywords)
+        reserve_intent = RESERVE_MATCHER.search(message) is not None
         
-        if any(keyword in message_lower for keyword in ["zdravo", "pozdrav", "hello", "hi"]):
+        if GREETING_MATCHER.search(message):
             content = "Zdravo! Ja sam TurBot, vaš turistički asistent. Mogu vam pomoći sa informacijama o putovanjima i turističkim aranžmanima."
-        elif any(keyword in message_lower for keyword in ["hvala", "thanks", "thank you"]):
+        elif THANKS_MATCHER.search(message):
             content = "Nema na čemu! Tu sam da pomognem sa vašim turističkim potrebama."
         else:
             content = "Trenutno nemam pristup bazi turističkih podataka. Molim vas otpremite turistička dokumenta ili kontaktirajte direktno turističku agenciju za detaljne informacije."
-        
+
+        CHAT_RESPONSES.inc(source="fallback")
         return {
             "content": content,
             "reserve": reserve_intent,
@@ -507,21 +1027,38 @@ Istorija razgovora:
 # Initialize components
 def init_components():
     """Initialize LLM, embeddings, and vector store"""
-    global llm, embeddings, vector_store
+    global llm, embeddings, embedding_cache, extractor, vector_store, bm25_index
     
     if not LANGCHAIN_AVAILABLE:
         logger.warning("LangChain not available - limited functionality")
         return
     
-    # Initialize LLM
+    embedding_model = EMBEDDING_MODEL
+    extraction_model = LLM_MODEL
     api_key = os.environ.get("OPENAI_API_KEY")
-    if api_key:
+
+    if LLM_PROVIDER == 'local':
+        from local_models import LocalTravelChatModel, HashEmbeddings
+        llm = LocalTravelChatModel(
+            latency=LOCAL_LLM_LATENCY,
+            jitter=LOCAL_LLM_JITTER,
+            token_delay=LOCAL_LLM_TOKEN_DELAY
+        )
+        embeddings = HashEmbeddings(size=LOCAL_EMBEDDING_SIZE, latency=LOCAL_EMBEDDING_LATENCY)
+        # Keep local vectors apart from real ones in the embedding cache
+        embedding_model = f"local-hash-{LOCAL_EMBEDDING_SIZE}"
+        extraction_model = "local-travel"
+        logger.info("✓ Local LLM and embeddings initialized (LLM_PROVIDER=local)")
+
+    # Initialize LLM
+    elif api_key:
         try:
+            from langchain_openai import ChatOpenAI
             llm = ChatOpenAI(
-                model_name="gpt-4o-mini",
+                model_name=LLM_MODEL,
                 temperature=0.3,
                 max_tokens=1500,
-                base_url="https://models.inference.ai.azure.com",
+                base_url=LLM_BASE_URL,
                 api_key=api_key
             )
             logger.info("✓ LLM initialized successfully")
@@ -531,51 +1068,503 @@ def init_components():
         logger.warning("OPENAI_API_KEY not set - LLM functionality disabled")
 
     # Initialize embeddings
-    if api_key:
+    if api_key and LLM_PROVIDER != 'local':
         try:
+            from langchain_openai import OpenAIEmbeddings
             embeddings = OpenAIEmbeddings(
-                base_url="https://models.inference.ai.azure.com",
+                base_url=LLM_BASE_URL,
                 api_key=api_key,
-                model="text-embedding-3-large"
+                model=EMBEDDING_MODEL
             )
             logger.info("✓ Embeddings initialized successfully")
         except Exception as e:
             logger.error(f"✗ Failed to initialize embeddings: {e}")
 
+    # Wrap embeddings with the persistent cache
+    if embeddings:
+        try:
+            embedding_cache = EmbeddingCache(EMBEDDING_CACHE_PATH, max_entries=EMBEDDING_CACHE_MAX_ENTRIES)
+            embeddings = CachedEmbeddings(embeddings, embedding_cache, embedding_model)
+            logger.info("✓ Embedding cache initialized successfully")
+        except Exception as e:
+            logger.error(f"✗ Failed to initialize embedding cache: {e}")
+
+    # Initialize structured extraction
+    if llm:
+        try:
+            extractor = StructuredExtractor(
+                llm,
+                model_name=extraction_model,
+                cache=ExtractionCache(EXTRACTION_CACHE_PATH, max_entries=EXTRACTION_CACHE_MAX_ENTRIES),
+                section_chars=EXTRACTION_SECTION_CHARS,
+                batch_chars=EXTRACTION_BATCH_CHARS,
+                batch_sections=EXTRACTION_BATCH_SECTIONS,
+                max_sections=EXTRACTION_MAX_SECTIONS,
+                concurrency=INGEST_LLM_CONCURRENCY,
+                callbacks=[extraction_metrics]
+            )
+            logger.info(f"✓ Structured extraction initialized (schema output: {extractor.structured_chain is not None})")
+        except Exception as e:
+            logger.error(f"✗ Failed to initialize structured extraction: {e}")
+
     # Initialize vector store
     if embeddings:
         try:
+            from langchain_chroma import Chroma
             vector_store = Chroma(
                 collection_name="travel_docs",
                 embedding_function=embeddings,
-                persist_directory="chroma"
+                persist_directory=CHROMA_DIR
             )
             logger.info("✓ Vector store initialized successfully")
-
-            # Fetch all stored documents (with metadata)
-            results = vector_store.similarity_search("test", k=5)
-
         except Exception as e:
             logger.error(f"✗ Failed to initialize vector store: {e}")
 
+    # Initialize keyword index
+    if vector_store:
+        try:
+            bm25_index = BM25Index(BM25_INDEX_PATH)
+            if not len(bm25_index):
+                backfill_keyword_index()
+            logger.info(f"✓ Keyword index initialized with {len(bm25_index)} chunks")
+        except Exception as e:
+            logger.error(f"✗ Failed to initialize keyword index: {e}")
+            bm25_index = None
+
+def backfill_keyword_index() -> None:
+    """Build the keyword index from chunks already in the vector store"""
+    stored = vector_store.get(include=["documents", "metadatas"])
+    if not stored.get("ids"):
+        return
+
+    with bm25_index.transaction() as index:
+        for chunk_id, text, metadata in zip(stored["ids"], stored["documents"], stored["metadatas"]):
+            index.add(chunk_id, text, metadata or {})
+    logger.info(f"Keyword index built from {len(stored['ids'])} stored chunks")
+
+def init_database_step() -> None:
+    """Background startup step: create or migrate tables, retried while a configured database is unreachable"""
+    if not init_database() and DATABASE_URL:
+        raise RuntimeError("Database unavailable")
+
+def init_sessions() -> None:
+    """Startup step: session store and the background history summarizer"""
+    global session_store, history_summarizer
+    session_store = create_session_store()
+    history_summarizer = HistorySummarizer(
+        session_store,
+        summarize_history,
+        recent_messages=HISTORY_RECENT_MESSAGES,
+        counter=context_builder.counter,
+        token_budget=HISTORY_TOKEN_BUDGET,
+        batch_messages=HISTORY_SUMMARY_BATCH
+    )
+
+def init_chat() -> None:
+    """Startup step: RAG chain and the response cache over the initialized components"""
+    global travel_bot, response_cache
+    travel_bot = TravelBot()
+    response_cache = ResponseCache(
+        max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+        ttl=RESPONSE_CACHE_TTL,
+        similarity_threshold=RESPONSE_CACHE_SIMILARITY,
+        embed_fn=embeddings.embed_query if embeddings else None
+    )
+
+def warm_up() -> None:
+    """Optional startup step: open the API connections and load indexes before the first chat"""
+    # Components are up now, don't wait for the next interval to report them
+    health_monitor.refresh()
+    context_builder.counter.count("TurBot")
+    if vector_store is not None:
+        vector_store.similarity_search("putovanje", k=1)
+        tag_catalog_chunks()
+    if llm is not None and LLM_PROVIDER != 'local':
+        llm.invoke("ping", max_tokens=1)
+
 # Routes
-@app.route('/health', methods=['GET'])
-def health_check():
-    """Health check endpoint"""
-    return jsonify({
-        'status': 'healthy',
+def check_database() -> None:
+    with get_db_connection() as conn:
+        if conn is None:
+            raise RuntimeError("No database connection")
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1")
+
+def check_vector_store() -> None:
+    if vector_store is None:
+        raise RuntimeError("Vector store not initialized")
+    vector_store._collection.count()
+
+def check_llm() -> None:
+    """The LLM endpoint answers HTTP at all; no tokens are spent"""
+    if llm is None:
+        raise RuntimeError("LLM not initialized")
+    if LLM_PROVIDER != 'local':
+        requests.head(LLM_BASE_URL, timeout=HEALTH_CHECK_TIMEOUT)
+
+def health_status() -> Dict[str, Any]:
+    """Component availability and runtime stats.
+
+    Dependency state comes from the background health monitor, so a probe
+    never opens a connection or calls an API.
+    """
+    checks = health_monitor.snapshot()
+    pool = db_pool if db_pool_pid == os.getpid() else None
+
+    return {
+        'status': 'healthy' if startup.ready else 'starting',
         'timestamp': datetime.now().isoformat(),
         'version': '1.0.0',
         'langchain_available': LANGCHAIN_AVAILABLE,
         'docx_available': DOCX_AVAILABLE,
         'llm_available': llm is not None,
         'vector_store_available': vector_store is not None,
-        'database_available': get_db_connection() is not None
-    })
+        'database_available': checks['database']['ok'] is True,
+        'checks': checks,
+        'database_pool': pool.stats() if pool else None,
+        'embedding_cache': embedding_cache.stats() if embedding_cache else None,
+        'extraction': extractor.stats() if extractor else None,
+        'rule_extraction': rule_extractor.stats(),
+        'response_cache': response_cache.stats() if response_cache else None,
+        'sessions': health_monitor.value('sessions'),
+        'routing': intent_router.stats() if intent_router else None,
+        'retrieval_scope': retrieval_scope.stats() if retrieval_scope else None,
+        'catalog_cache': catalog_cache.stats(),
+        'context': dict(context_builder.stats(), history_summaries=history_summarizer.stats() if history_summarizer else None),
+        'startup': startup.status()
+    }
+
+@app.before_request
+def start_request_trace():
+    """Trace id for the request's log lines, taken from X-Request-ID when the client sends one"""
+    new_trace_id(request.headers.get('X-Request-ID'))
+    request.environ['turbot.start_time'] = time.perf_counter()
+
+# Served while the app is still starting
+STARTUP_EXEMPT_ENDPOINTS = {'health_check', 'liveness', 'readiness', 'metrics_endpoint', 'get_job'}
+
+@app.before_request
+def wait_for_startup():
+    """Hold requests until initialization finishes, 503 if it takes longer than STARTUP_WAIT_TIMEOUT"""
+    if request.method == 'OPTIONS' or request.endpoint in STARTUP_EXEMPT_ENDPOINTS:
+        return None
+    if not startup.wait(STARTUP_WAIT_TIMEOUT):
+        response = jsonify({'error': 'Service is starting, try again shortly'})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    return None
+
+@app.after_request
+def finish_request_trace(response):
+    """Record request latency and return the trace id to the client"""
+    start = request.environ.get('turbot.start_time')
+    if start is not None:
+        HTTP_REQUESTS.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            endpoint=request.url_rule.rule if request.url_rule else 'unmatched',
+            status=response.status_code
+        )
+    response.headers['X-Request-ID'] = current_trace_id()
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus metrics of this worker process"""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/health', methods=['GET'])
+def health_check():
+    """Health check endpoint"""
+    return jsonify(health_status())
+
+@app.route('/health/live', methods=['GET'])
+def liveness():
+    """Liveness probe: the process is up and serving requests"""
+    return jsonify({'status': 'alive', 'timestamp': datetime.now().isoformat()})
+
+@app.route('/health/ready', methods=['GET'])
+def readiness():
+    """Readiness probe: 503 until sessions and chat components are initialized.
+
+    A database that is still unreachable does not hold readiness back, it
+    is listed under "degraded" while its startup step keeps retrying.
+    """
+    startup.start()
+    status = startup.status()
+    return jsonify(status), 200 if status['ready'] else 503
+
+def save_uploaded_file(file) -> tuple:
+    """Save an uploaded file with a timestamp prefix, returns (filename, file_path)"""
+    filename = secure_filename(file.filename)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f"{timestamp}_{filename}"
+    file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    file.save(file_path)
+    return filename, file_path
+
+def get_ingest_executors() -> tuple:
+    """Get the per-process (parse, io) executors, creating them on first use"""
+    global parse_executor, io_executor, executor_pid
+
+    if io_executor is not None and executor_pid == os.getpid():
+        return parse_executor, io_executor
+
+    with executor_lock:
+        if io_executor is None or executor_pid != os.getpid():
+            parse_executor = ProcessPoolExecutor(max_workers=INGEST_PARSE_WORKERS) if INGEST_PARSE_WORKERS > 0 else None
+            io_executor = ThreadPoolExecutor(max_workers=INGEST_IO_WORKERS, thread_name_prefix="ingest-io")
+            executor_pid = os.getpid()
+    return parse_executor, io_executor
+
+def stream_document_pages(file_path: str):
+    """Yield (page_number, text) for a saved upload, parsing PDF pages in the process pool"""
+    parse_pool, _ = get_ingest_executors()
+    return iter_document_pages(file_path, executor=parse_pool)
+
+def discard_upload(file_path: str) -> None:
+    """Remove an upload whose ingestion failed; it is not retried, the client uploads it again"""
+    try:
+        os.remove(file_path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.error(f"Could not remove upload {file_path}: {e}")
+
+def process_document(file_path: str, filename: str,
+                     pending: Optional[List[tuple]] = None) -> Dict[str, Any]:
+    """Run the ingestion pipeline for a saved upload.
+
+    With ``pending`` extraction and the database write are deferred:
+    (package, result) is appended to it and the caller extracts and saves
+    the whole batch with store_packages.
+    """
+    content_hash = compute_file_hash(file_path)
+    source_name = get_source_name(filename)
+
+    # Skip files that are already ingested or being ingested right now
+    with inflight_lock:
+        if content_hash in inflight_hashes:
+            os.remove(file_path)
+            return {'filename': filename, 'duplicate': True, 'message': 'Identical document is already being processed'}
+        inflight_hashes.add(content_hash)
+
+    deferred = False
+    try:
+        with db_slots:
+            identical, previous = find_existing_document(content_hash, source_name)
+        if identical:
+            os.remove(file_path)
+            return {'filename': identical, 'duplicate': True, 'message': 'Identical document already ingested'}
+
+        result, package = _run_pipeline(file_path, filename, content_hash, previous)
+        if package is None:
+            return result
+        if pending is not None:
+            pending.append((package, result))
+            deferred = True
+        else:
+            store_packages([(package, result)])
+        return result
+    except Exception:
+        discard_upload(file_path)
+        raise
+    finally:
+        # Deferred documents stay in flight until their batch is saved
+        if not deferred:
+            with inflight_lock:
+                inflight_hashes.discard(content_hash)
+
+def _run_pipeline(file_path: str, filename: str, content_hash: str, previous: Optional[str]) -> tuple:
+    """Parse, validate and embed a new or changed document.
+
+    Pages are embedded while later pages are still being parsed, as soon as
+    the text read so far passes travel-content validation. Returns (result,
+    package); package is the row to save, None if the document was rejected
+    or could not be read to the end.
+    """
+    pages = []
+    validated = False
+    travel_keywords = set()
+    sync = None
+    fed = 0
+    vector_success = False
+    read_error = None
+    # Parsing and embedding interleave, so embedding time is taken out of the parse stage
+    started = time.perf_counter()
+    embed_time = 0.0
+
+    try:
+        for page_number, text in stream_document_pages(file_path):
+            if not text:
+                continue
+            pages.append((page_number, text))
+
+            if not validated:
+                # Only the new page is scanned; the previous page's tail catches keywords split by the page break
+                tail = pages[-2][1][-32:] + "\n" if len(pages) > 1 else ""
+                if not validate_travel_content(tail + text, found=travel_keywords):
+                    continue
+                validated = True
+                if vector_store:
+                    sync = VectorStoreSync(filename)
+
+            if sync:
+                embed_start = time.perf_counter()
+                with embed_slots:
+                    # Pages read before the document validated are fed now
+                    for number, page_text in pages[fed:]:
+                        sync.feed(page_text, page=number)
+                fed = len(pages)
+                embed_time += time.perf_counter() - embed_start
+
+        if sync:
+            embed_start = time.perf_counter()
+            with embed_slots:
+                sync.finish()
+            embed_time += time.perf_counter() - embed_start
+            vector_success = True
+    except DocumentReadError as e:
+        read_error = e
+    except Exception as e:
+        logger.error(f"Error adding document to vector store: {e}")
+
+    INGEST_STAGE_SECONDS.observe(time.perf_counter() - started - embed_time, stage="parse")
+    if sync:
+        INGEST_STAGE_SECONDS.observe(embed_time, stage="embed")
+
+    # A truncated document must not replace the stored version, so nothing is finished or saved
+    if read_error is not None:
+        if sync:
+            try:
+                sync.abort()
+            except Exception as e:
+                logger.error(f"Error removing chunks of {filename}: {e}")
+        os.remove(file_path)
+        return {'filename': filename, 'error': 'Could not read file content'}, None
+
+    content = "\n".join(text for _, text in pages)
+    if not content:
+        os.remove(file_path)
+        return {'filename': filename, 'error': 'Could not read file content'}, None
+
+    # Validate travel content
+    if not validated:
+        os.remove(file_path)
+        logger.info(f"Rejected {filename}, travel keywords found: {sorted(travel_keywords)}")
+        return {
+            'filename': filename,
+            'error': 'Document does not appear to be travel/tourism related',
+            'matched_keywords': sorted(travel_keywords)
+        }, None
+
+    # Structured data is extracted by store_packages, together with the rest of the batch
+    package = {
+        'filename': filename,
+        'structured_data': {},
+        'raw_content': content,
+        'content_hash': content_hash,
+        'replaces': previous
+    }
+    return {
+        'filename': filename,
+        'content_length': len(content),
+        'structured_data': {},
+        'saved_to_database': False,
+        'added_to_vector_store': vector_success,
+        'replaced': previous,
+        'upload_date': datetime.now().isoformat()
+    }, package
+
+def store_packages(entries: List[tuple]) -> None:
+    """Extract structured data for (package, result) pairs from the pipeline, save them in one transaction and finish them"""
+    with INGEST_STAGE_SECONDS.time(stage="extract"):
+        extracted = extract_many_structured_data(
+            [(package['filename'], package['raw_content']) for package, _ in entries]
+        )
+    for package, result in entries:
+        package['structured_data'] = result['structured_data'] = extracted.get(package['filename'], {})
+        if result['added_to_vector_store']:
+            tag_document_chunks(package['filename'], package['structured_data'])
+
+    with db_slots, INGEST_STAGE_SECONDS.time(stage="db_save"):
+        saved = set(save_packages_to_database([package for package, _ in entries]))
+
+    # Cached chat answers were built from the old document set
+    if saved or any(result['added_to_vector_store'] for _, result in entries):
+        docset_version.bump()
+
+    for package, result in entries:
+        result['saved_to_database'] = package['filename'] in saved
+
+        # The previous version's file is superseded once the new one is stored
+        previous = package.get('replaces')
+        if result['saved_to_database'] and previous and previous != package['filename']:
+            previous_path = os.path.join(app.config['UPLOAD_FOLDER'], previous)
+            if os.path.exists(previous_path):
+                os.remove(previous_path)
+
+def process_documents(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Process several saved uploads concurrently and save them in one batch, results keep the input order"""
+    _, io_pool = get_ingest_executors()
+    pending = []
+
+    def _process(item):
+        if item.get('error'):
+            return {'filename': item['filename'], 'error': item['error']}
+        try:
+            return process_document(item['file_path'], item['filename'], pending=pending)
+        except Exception as e:
+            logger.error(f"Processing error for {item['filename']}: {e}")
+            return {'filename': item['filename'], 'error': 'Processing failed'}
+
+    # Each worker runs in a copy of this context, so its logs keep the trace id
+    futures = [io_pool.submit(contextvars.copy_context().run, _process, item) for item in items]
+    results = [future.result() for future in futures]
+
+    if pending:
+        try:
+            store_packages(pending)
+        except Exception:
+            paths = {item['filename']: item.get('file_path') for item in items}
+            for package, _ in pending:
+                if paths.get(package['filename']):
+                    discard_upload(paths[package['filename']])
+            raise
+        finally:
+            with inflight_lock:
+                for package, _ in pending:
+                    inflight_hashes.discard(package['content_hash'])
+    return results
+
+def run_ingest_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Job handler for a single uploaded document, logged under the upload request's trace id"""
+    with trace(payload.get('trace_id')):
+        startup.wait()
+        return process_document(payload['file_path'], payload['filename'])
+
+def run_ingest_batch_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Job handler for a batch of uploaded documents, logged under the upload request's trace id"""
+    with trace(payload.get('trace_id')):
+        startup.wait()
+        return {'results': process_documents(payload['files'])}
+
+def wants_sync_processing() -> bool:
+    """Whether the client asked to wait for processing (?wait=true)"""
+    return request.args.get('wait', '').lower() in ('1', 'true', 'yes')
+
+def job_accepted_response(job_id: str, **extra):
+    """202 response pointing the client to the job status endpoint"""
+    return jsonify({
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': f'/api/jobs/{job_id}',
+        **extra
+    }), 202
 
 @app.route('/api/upload', methods=['POST'])
 def upload_file():
-    """Upload and process travel documents"""
+    """Upload a travel document and queue it for processing"""
     try:
         if 'file' not in request.files:
             return jsonify({'error': 'No file provided'}), 400
@@ -588,46 +1577,20 @@ def upload_file():
             extensions_str = ', '.join(ALLOWED_EXTENSIONS)
             return jsonify({'error': f'File type not supported. Allowed: {extensions_str}'}), 400
         
-        # Save file with timestamp
-        filename = secure_filename(file.filename)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{timestamp}_{filename}"
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(file_path)
-        
-        # Read and process content
-        content = read_file_content(file_path)
-        if not content:
-            os.remove(file_path)
-            return jsonify({'error': 'Could not read file content'}), 400
-        
-        # Validate travel content
-        if not validate_travel_content(content):
-            os.remove(file_path)
-            return jsonify({'error': 'Document does not appear to be travel/tourism related'}), 400
-        
-        # Extract structured data if LLM is available
-        structured_data = {}
-        if llm:
-            structured_data = extract_structured_data(content, filename)
-        
-        # Save to database
-        db_saved = save_to_database(filename, structured_data, content)
-        
-        # Add to vector store
-        vector_success = False
-        if vector_store:
-            vector_success = add_document_to_vector_store(content, filename)
-        
-        return jsonify({
-            'message': f'File {filename} uploaded and processed successfully',
+        filename, file_path = save_uploaded_file(file)
+
+        if wants_sync_processing():
+            result = process_document(file_path, filename)
+            if result.get('error'):
+                return jsonify({key: result[key] for key in ('error', 'matched_keywords') if key in result}), 400
+            return jsonify({'message': f'File {filename} uploaded and processed successfully', **result})
+
+        job_id = job_queue.submit('ingest_document', {
+            'file_path': file_path,
             'filename': filename,
-            'content_length': len(content),
-            'structured_data': structured_data,
-            'saved_to_database': db_saved,
-            'added_to_vector_store': vector_success,
-            'upload_date': datetime.now().isoformat()
+            'trace_id': current_trace_id()
         })
+        return job_accepted_response(job_id, filename=filename)
             
     except Exception as e:
         logger.error(f"Upload error: {e}")
@@ -636,165 +1599,277 @@ def upload_file():
 
 @app.route('/api/upload-multiple', methods=['POST'])
 def upload_multiple_files():
-    """Upload and process multiple travel documents"""
+    """Upload multiple travel documents and queue them for processing"""
     try:
         files = request.files.getlist('files')
         if not files:
             return jsonify({'error': 'No files provided'}), 400
         
-        results = []
+        items = []
         for file in files:
             if file.filename == '':
-                results.append({'filename': '', 'error': 'No file selected'})
+                items.append({'filename': '', 'error': 'No file selected'})
                 continue
 
             if not allowed_file(file.filename):
                 extensions_str = ', '.join(ALLOWED_EXTENSIONS)
-                results.append({'filename': file.filename, 'error': f'File type not supported. Allowed: {extensions_str}'})
-                continue
-
-            # Save file with timestamp
-            filename = secure_filename(file.filename)
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            full_filename = f"{timestamp}_{filename}"
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], full_filename)
-            file.save(file_path)
-
-            # Read and process content
-            content = read_file_content(file_path)
-            if not content:
-                os.remove(file_path)
-                results.append({'filename': full_filename, 'error': 'Could not read file content'})
-                continue
-
-            # Validate travel content
-            if not validate_travel_content(content):
-                os.remove(file_path)
-                results.append({'filename': full_filename, 'error': 'Document not travel-related'})
+                items.append({'filename': file.filename, 'error': f'File type not supported. Allowed: {extensions_str}'})
                 continue
 
-            # Extract structured data
-            structured_data = extract_structured_data(content, full_filename) if llm else {}
-
-            # Save to DB and vector store
-            db_saved = save_to_database(full_filename, structured_data, content)
-            vector_success = add_document_to_vector_store(content, full_filename) if vector_store else False
+            full_filename, file_path = save_uploaded_file(file)
+            items.append({'filename': full_filename, 'file_path': file_path})
 
-            results.append({
-                'filename': full_filename,
-                'content_length': len(content),
-                'structured_data': structured_data,
-                'saved_to_database': db_saved,
-                'added_to_vector_store': vector_success,
-                'upload_date': datetime.now().isoformat()
-            })
+        if wants_sync_processing():
+            return jsonify(run_ingest_batch_job({'files': items}))
 
-        return jsonify({'results': results})
+        job_id = job_queue.submit('ingest_batch', {'files': items, 'trace_id': current_trace_id()})
+        return job_accepted_response(job_id, files=[item['filename'] for item in items])
     
     except Exception as e:
         logger.error(f"Multiple upload error: {e}")
         return jsonify({'error': 'Multiple file upload failed'}), 500
 
 
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get status and result of a background ingestion job"""
+    job = job_queue.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+
+SESSION_ID_PATTERN = re.compile(rf'^[A-Za-z0-9_-]{{1,{MAX_SESSION_ID_LENGTH}}}$')
+
+def begin_chat_turn(data: Optional[Dict]) -> tuple:
+    """Validate a chat request and record the user message.
+
+    Returns (session_id, message, message_count, error).
+    """
+    if not data or 'message' not in data:
+        return None, None, 0, 'Message is required'
+
+    user_message = data['message'].strip()
+    if not user_message:
+        return None, None, 0, 'Message cannot be empty'
+
+    # Client ids (uuid4 from the chat page) must fit the session tables
+    session_id = data.get('session_id') or generate_session_id()
+    if not isinstance(session_id, str) or not SESSION_ID_PATTERN.match(session_id):
+        return None, None, 0, f'session_id must be up to {MAX_SESSION_ID_LENGTH} letters, digits, "-" or "_"'
+
+    # Add user message to the (possibly new) session
+    message_count = session_store.append(session_id, {
+        'role': 'user',
+        'content': user_message,
+        'timestamp': datetime.now().isoformat()
+    })
+    return session_id, user_message, message_count, None
+
+def lookup_cached_response(user_message: str, message_count: int) -> Dict[str, Any]:
+    """Check the response cache, only first turns of a conversation are cacheable"""
+    state = {'cacheable': False, 'match': None, 'response': None, 'version': None, 'embedding': None}
+    if response_cache is None or message_count != 1:
+        return state
+
+    state['cacheable'] = True
+    state['version'] = docset_version.current()
+    state['response'], state['match'], state['embedding'] = response_cache.lookup(user_message, state['version'])
+    CACHE_REQUESTS.inc(cache="response", result=state['match'] or "miss")
+    if state['match']:
+        CHAT_RESPONSES.inc(source="cache")
+    return state
+
+def route_message(user_message: str) -> Optional[Dict[str, Any]]:
+    """Structured fast path over travel_packages, None means the message needs RAG"""
+    if not intent_router:
+        return None
+    with CHAT_STAGE_SECONDS.time(stage="routing"):
+        response_data = intent_router.route(user_message)
+    if response_data is not None:
+        CHAT_RESPONSES.inc(source="router")
+    return response_data
+
+def finish_chat_turn(session_id: str, user_message: str, response_data: Dict[str, Any],
+                     cache_state: Dict[str, Any]) -> None:
+    """Cache a fresh answer and add it to the session"""
+    if response_data.get('content') == CHAT_ERROR_MESSAGE:
+        CHAT_RESPONSES.inc(source="error")
+
+    if (cache_state['cacheable'] and not cache_state['match'] and travel_bot.retrieval_chain
+            and response_data.get('content') != CHAT_ERROR_MESSAGE):
+        response_cache.store(user_message, cache_state['version'], response_data, cache_state['embedding'])
+
+    # Add bot response to session
+    session_store.append(session_id, {
+        'role': 'assistant',
+        'content': json.dumps(response_data, ensure_ascii=False),
+        'timestamp': datetime.now().isoformat()
+    })
+
+    # Older turns are folded into the session summary in the background
+    if history_summarizer and llm:
+        history_summarizer.schedule(session_id)
+
 @app.route('/api/chat', methods=['POST'])
 def chat():
     """Main chat endpoint"""
     try:
-        data = request.get_json()
-        if not data or 'message' not in data:
-            return jsonify({'error': 'Message is required'}), 400
-
-        user_message = data['message'].strip()
-        if not user_message:
-            return jsonify({'error': 'Message cannot be empty'}), 400
-
-        # Get or create session
-        session_id = data.get('session_id') or generate_session_id()
-        if session_id not in user_sessions:
-            user_sessions[session_id] = {
-                'created_at': datetime.now(),
-                'messages': []
-            }
-
-        # Add user message to session
-        user_sessions[session_id]['messages'].append({
-            'role': 'user',
-            'content': user_message,
-            'timestamp': datetime.now().isoformat()
-        })
+        session_id, user_message, message_count, error = begin_chat_turn(request.get_json())
+        if error:
+            return jsonify({'error': error}), 400
 
         # Get conversation history
-        history = get_session_history(session_id)
+        history, user_messages = get_session_history(session_id, before_seq=message_count)
 
-        # Process message
+        # Process message, first turns of a conversation can be served from cache
         start_time = datetime.now()
-        response_data = travel_bot.process_message(user_message, history)
+        cache_state = lookup_cached_response(user_message, message_count)
+        if cache_state['match']:
+            response_data = dict(cache_state['response'])
+        else:
+            response_data = route_message(user_message) or travel_bot.process_message(user_message, history, user_messages)
         processing_time = (datetime.now() - start_time).total_seconds()
 
-        # Add bot response to session
-        user_sessions[session_id]['messages'].append({
-            'role': 'assistant',
-            'content': json.dumps(response_data, ensure_ascii=False),
-            'timestamp': datetime.now().isoformat()
-        })
+        finish_chat_turn(session_id, user_message, response_data, cache_state)
 
         return jsonify({
             'response': response_data,
             'session_id': session_id,
             'processing_time': processing_time,
+            'cache': cache_state['match'],
             'timestamp': datetime.now().isoformat()
         })
 
     except Exception as e:
         logger.error(f"Chat error: {e}")
         return jsonify({
-            'response': {
-                "content": "Došlo je do greške u sistemu. Molim pokušajte ponovo.",
-                "reserve": False,
-                "gmail": ""
-            },
+            'response': error_response(CHAT_SYSTEM_ERROR_MESSAGE),
             'error': str(e)
         }), 500
 
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format a Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """Streaming chat endpoint (Server-Sent Events).
+
+    Emits ``token`` events with pieces of the answer content and a final
+    ``done`` event carrying the same payload as /api/chat plus
+    ``time_to_first_token``.
+    """
+    session_id, user_message, message_count, error = begin_chat_turn(request.get_json(silent=True))
+    if error:
+        return jsonify({'error': error}), 400
+
+    history, user_messages = get_session_history(session_id, before_seq=message_count)
+
+    def generate():
+        start_time = time.monotonic()
+        time_to_first_token = None
+        try:
+            yield sse_event('start', {'session_id': session_id})
+
+            cache_state = lookup_cached_response(user_message, message_count)
+            if cache_state['match']:
+                response_data = dict(cache_state['response'])
+                time_to_first_token = time.monotonic() - start_time
+                yield sse_event('token', {'text': response_data.get('content', '')})
+            elif (routed_response := route_message(user_message)) is not None:
+                response_data = routed_response
+                time_to_first_token = time.monotonic() - start_time
+                yield sse_event('token', {'text': response_data['content']})
+            else:
+                stream = travel_bot.stream_message(user_message, history, user_messages)
+                while True:
+                    try:
+                        text = next(stream)
+                    except StopIteration as stop:
+                        response_data = stop.value
+                        break
+                    if time_to_first_token is None:
+                        time_to_first_token = time.monotonic() - start_time
+                    yield sse_event('token', {'text': text})
+
+            finish_chat_turn(session_id, user_message, response_data, cache_state)
+
+            yield sse_event('done', {
+                'response': response_data,
+                'session_id': session_id,
+                'processing_time': time.monotonic() - start_time,
+                'time_to_first_token': time_to_first_token,
+                'cache': cache_state['match'],
+                'timestamp': datetime.now().isoformat()
+            })
+
+        except Exception as e:
+            logger.error(f"Chat stream error: {e}")
+            yield sse_event('error', {
+                'response': error_response(CHAT_SYSTEM_ERROR_MESSAGE),
+                'error': str(e)
+            })
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/api/travel-packages', methods=['GET'])
 def get_travel_packages():
-    """Get all travel packages from database"""
+    """Get travel packages, optionally filtered and projected; a page of them when limit or cursor is given"""
     try:
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'error': 'Database connection failed'}), 500
+        query = CatalogQuery(request.args, default_limit=CATALOG_PAGE_SIZE, max_limit=CATALOG_MAX_PAGE_SIZE)
+    except CatalogQueryError as e:
+        return jsonify({'error': str(e)}), 400
 
-        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-            cursor.execute("""
-                SELECT id, filename, title, description, destinations, 
-                       duration_days, duration_nights, transport_type,
-                       dates, prices, hotels, includes, excludes, highlights,
-                       created_at, updated_at
-                FROM travel_packages 
-                ORDER BY created_at DESC
-            """)
-            packages = cursor.fetchall()
+    try:
+        version = catalog_version.current()
+        key = query.cache_key()
+        etag = CatalogCache.etag(version, key)
 
-            result = []
-            for package in packages:
-                package_dict = dict(package)
-                # Ensure JSON fields are properly handled
-                for field in ['destinations', 'dates', 'prices', 'hotels', 'includes', 'excludes', 'highlights']:
-                    if package_dict[field] is None:
-                        package_dict[field] = [] if field != 'prices' else {}
-                result.append(package_dict)
-
-            return jsonify({
-                'packages': result,
-                'total': len(result)
-            })
+        if etag in request.if_none_match:
+            catalog_cache.count_not_modified()
+            CACHE_REQUESTS.inc(cache="catalog", result="not_modified")
+            response = Response(status=304)
+        else:
+            body = catalog_cache.get(version, key)
+            CACHE_REQUESTS.inc(cache="catalog", result="miss" if body is None else "hit")
+            if body is None:
+                with DB_SECONDS.time(operation="catalog_page"), get_db_connection() as conn:
+                    if not conn:
+                        return jsonify({'error': 'Database connection failed'}), 500
+
+                    with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                        sql, params = query.page_sql()
+                        cursor.execute(sql, params)
+                        packages, next_cursor = query.page(cursor.fetchall())
+
+                        if query.paginated:
+                            sql, params = query.count_sql()
+                            cursor.execute(sql, params)
+                            total = cursor.fetchone()['count']
+                        else:
+                            total = len(packages)
+
+                body = app.json.dumps({
+                    'packages': packages,
+                    'total': total,
+                    'next_cursor': next_cursor
+                }).encode('utf-8')
+                catalog_cache.put(version, key, body)
+            response = Response(body, mimetype='application/json')
+
+        response.set_etag(etag)
+        # Clients may keep the page but must revalidate it with If-None-Match
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
 
     except Exception as e:
         logger.error(f"Get travel packages error: {e}")
         return jsonify({'error': 'Failed to retrieve travel packages'}), 500
-    finally:
-        if conn:
-            conn.close()
 
 # Error handlers
 @app.errorhandler(413)
@@ -810,12 +1885,44 @@ def internal_error(e):
     logger.error(f"Internal server error: {e}")
     return jsonify({'error': 'Internal server error'}), 500
 
-# Initialize everything
-init_database()
-init_components()
-travel_bot = TravelBot()
+# Initialize everything; network-bound steps run in the background, see /health/ready
+intent_router = IntentRouter(get_db_connection, version_fn=docset_version.current)
+retrieval_scope = RetrievalScope(intent_router.match_destinations)
+# Chat works from the vector store without the database, so an outage only degrades the app
+startup.add_step('database', init_database_step, background=True)
+startup.add_step('sessions', init_sessions)
+startup.add_step('components', init_components)
+startup.add_step('chat', init_chat)
+startup.add_step('warm_up', warm_up, required=False)
+health_monitor.add_check('database', check_database)
+health_monitor.add_check('vector_store', check_vector_store)
+health_monitor.add_check('llm', check_llm)
+# Counting SQL sessions is a query, so it is read with the checks rather than per probe or scrape
+health_monitor.add_gauge('sessions', lambda: session_store.stats() if session_store else None)
+
+# Component stats exported as gauges on /metrics
+REGISTRY.add_collector("turbot_db_pool", "Database pool", lambda: db_pool.stats() if db_pool else None)
+REGISTRY.add_collector("turbot_health", "Dependency health checks", health_monitor.stats)
+REGISTRY.add_collector("turbot_embedding_cache", "Embedding cache", lambda: embedding_cache.stats() if embedding_cache else None)
+REGISTRY.add_collector("turbot_extraction", "Structured extraction", lambda: extractor.stats() if extractor else None)
+REGISTRY.add_collector("turbot_rule_extraction", "Rule-based extraction", rule_extractor.stats)
+REGISTRY.add_collector("turbot_extraction_cache", "Extraction cache",
+                       lambda: extractor.cache.stats() if extractor and extractor.cache else None)
+REGISTRY.add_collector("turbot_response_cache", "Response cache", lambda: response_cache.stats() if response_cache else None)
+REGISTRY.add_collector("turbot_catalog_cache", "Catalog cache", catalog_cache.stats)
+REGISTRY.add_collector("turbot_routing", "Intent router", lambda: intent_router.stats() if intent_router else None)
+REGISTRY.add_collector("turbot_retrieval_scope", "Scoped retrieval", lambda: retrieval_scope.stats() if retrieval_scope else None)
+REGISTRY.add_collector("turbot_sessions", "Session store", lambda: health_monitor.value('sessions'))
+REGISTRY.add_collector("turbot_context", "Prompt context", context_builder.stats)
+
+job_queue = JobQueue(JOB_QUEUE_PATH, workers=INGEST_WORKERS, keep_finished=JOB_KEEP_FINISHED)
+job_queue.register('ingest_document', run_ingest_job)
+job_queue.register('ingest_batch', run_ingest_batch_job)
+job_queue.start()
+startup.start()
 
 if __name__ == '__main__':
+    startup.wait(STARTUP_WAIT_TIMEOUT)
     logger.info("Starting TurBot Flask API Server...")
     logger.info(f"Upload folder: {app.config['UPLOAD_FOLDER']}")
     
@@ -0,0 +1,320 @@
+import re
+import time
+import uuid
+import bisect
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, List, Tuple, Callable, Iterator
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+INF_LABEL = 'le="+Inf"'
+TRACE_ID_PATTERN = re.compile(r'^[\w.-]{1,64}$')
+
+trace_id_var: contextvars.ContextVar[str] = contextvars.ContextVar('trace_id', default='-')
+
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Monotonic counter per label set"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self._header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items
+        ]
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram per label set"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[Tuple[str, ...], list] = {}  # key -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """Observe the duration of the block, also when it raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return state[-1] if state else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(state)) for key, state in self._values.items())
+        lines = self._header()
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, INF_LABEL)} {state[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(state[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {state[-1]}")
+        return lines
+
+
+class Registry:
+    """Metrics of this process, rendered in the Prometheus text format.
+
+    Collectors are called at scrape time and return ``{name: value}`` dicts
+    (e.g. the ``stats()`` of a cache); their numeric values are exported as
+    gauges named ``<prefix>_<name>``.
+    """
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Tuple[str, str, Callable[[], Optional[Dict[str, Any]]]]] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, prefix: str, documentation: str,
+                      collect: Callable[[], Optional[Dict[str, Any]]]) -> None:
+        with self._lock:
+            self._collectors.append((prefix, documentation, collect))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics)
+            collectors = list(self._collectors)
+
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        for prefix, documentation, collect in collectors:
+            try:
+                stats = collect() or {}
+            except Exception as e:
+                logger.error(f"Metrics collector {prefix} failed: {e}")
+                continue
+            for key, value in stats.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f"{prefix}_{re.sub(r'[^a-zA-Z0-9_]', '_', key)}"
+                lines.append(f"# HELP {name} {documentation} ({key})")
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.histogram(
+    "turbot_http_request_seconds", "HTTP request latency", ("method", "endpoint", "status"))
+CHAT_STAGE_SECONDS = REGISTRY.histogram(
+    "turbot_chat_stage_seconds", "Chat stage latency (routing, history, retrieval, llm, parse)", ("stage",))
+INGEST_STAGE_SECONDS = REGISTRY.histogram(
+    "turbot_ingest_stage_seconds", "Ingestion stage latency (parse, embed, extract per document, db_save per batch)",
+    ("stage",), buckets=DEFAULT_BUCKETS + (120.0, 300.0))
+DB_SECONDS = REGISTRY.histogram(
+    "turbot_db_seconds", "Database operation latency", ("operation",))
+LLM_SECONDS = REGISTRY.histogram(
+    "turbot_llm_seconds", "LLM call latency", ("purpose",))
+LLM_TOKENS = REGISTRY.counter(
+    "turbot_llm_tokens_total", "LLM tokens used", ("purpose", "kind"))
+LLM_ERRORS = REGISTRY.counter(
+    "turbot_llm_errors_total", "Failed LLM calls", ("purpose",))
+CACHE_REQUESTS = REGISTRY.counter(
+    "turbot_cache_requests_total", "Cache lookups by result", ("cache", "result"))
+CHAT_RESPONSES = REGISTRY.counter(
+    "turbot_chat_responses_total", "Chat answers by source (cache, router, rag, fallback, error)", ("source",))
+
+
+def current_trace_id() -> str:
+    return trace_id_var.get()
+
+
+def new_trace_id(incoming: Optional[str] = None) -> str:
+    """Use a well-formed incoming id (e.g. X-Request-ID) or generate one, and make it current"""
+    trace_id = incoming if incoming and TRACE_ID_PATTERN.match(incoming) else uuid.uuid4().hex[:16]
+    trace_id_var.set(trace_id)
+    return trace_id
+
+
+@contextmanager
+def trace(trace_id: Optional[str] = None) -> Iterator[str]:
+    """Run the block under the given (or a new) trace id"""
+    token = trace_id_var.set(trace_id if trace_id and TRACE_ID_PATTERN.match(trace_id) else uuid.uuid4().hex[:16])
+    try:
+        yield trace_id_var.get()
+    finally:
+        trace_id_var.reset(token)
+
+
+class TraceIdFilter(logging.Filter):
+    """Adds ``trace_id`` to every log record"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = trace_id_var.get()
+        return True
+
+
+def install_trace_logging(log_format: str = "%(levelname)s:%(name)s:[%(trace_id)s] %(message)s") -> None:
+    """Put the current trace id in every line written by the root logger's handlers"""
+    for handler in logging.getLogger().handlers:
+        if not any(isinstance(f, TraceIdFilter) for f in handler.filters):
+            handler.addFilter(TraceIdFilter())
+        handler.setFormatter(logging.Formatter(log_format))
+
+
+class LLMMetricsCallback(BaseCallbackHandler):
+    """LangChain callback timing retriever and LLM runs and counting token usage.
+
+    One instance per purpose (chat, extraction, summary); run start times are
+    keyed by run id, so a single instance serves concurrent requests.
+    """
+
+    run_inline = True
+
+    def __init__(self, purpose: str):
+        self.purpose = purpose
+        self._starts: Dict[Any, float] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id) -> None:
+        with self._lock:
+            self._starts[run_id] = time.perf_counter()
+
+    def _elapsed(self, run_id) -> Optional[float]:
+        with self._lock:
+            start = self._starts.pop(run_id, None)
+        return time.perf_counter() - start if start is not None else None
+
+    def on_retriever_start(self, serialized, query, *, run_id, **kwargs) -> None:
+        self._start(run_id)
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs) -> None:
+        elapsed = self._elapsed(run_id)
+        if elapsed is not None:
+            CHAT_STAGE_SECONDS.observe(elapsed, stage="retrieval")
+
+    def on_retriever_error(self, error, *, run_id, **kwargs) -> None:
+        self._elapsed(run_id)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs) -> None:
+        self._start(run_id)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs) -> None:
+        self._start(run_id)
+
+    def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+        elapsed = self._elapsed(run_id)
+        if elapsed is not None:
+            LLM_SECONDS.observe(elapsed, purpose=self.purpose)
+            if self.purpose == "chat":
+                CHAT_STAGE_SECONDS.observe(elapsed, stage="llm")
+
+        prompt_tokens, completion_tokens = self._usage(response)
+        if prompt_tokens:
+            LLM_TOKENS.inc(prompt_tokens, purpose=self.purpose, kind="prompt")
+        if completion_tokens:
+            LLM_TOKENS.inc(completion_tokens, purpose=self.purpose, kind="completion")
+
+    def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+        self._elapsed(run_id)
+        LLM_ERRORS.inc(purpose=self.purpose)
+
+    @staticmethod
+    def _usage(response) -> Tuple[int, int]:
+        """(prompt, completion) tokens from the provider's usage report, streaming runs included"""
+        usage = (response.llm_output or {}).get('token_usage') or {}
+        if usage:
+            return usage.get('prompt_tokens', 0) or 0, usage.get('completion_tokens', 0) or 0
+
+        prompt_tokens = completion_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                metadata = getattr(getattr(generation, 'message', None), 'usage_metadata', None) or {}
+                prompt_tokens += metadata.get('input_tokens', 0) or 0
+                completion_tokens += metadata.get('output_tokens', 0) or 0
+        return prompt_tokens, completion_tokens
@@ -0,0 +1,377 @@
+import re
+import json
+import base64
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Dict, Any, Optional, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Columns clients may ask for with ?fields=, JSON columns never come back as null
+PACKAGE_FIELDS = {
+    'id': "id",
+    'filename': "filename",
+    'title': "title",
+    'description': "description",
+    'destinations': "COALESCE(destinations, '[]'::jsonb) AS destinations",
+    'duration_days': "duration_days",
+    'duration_nights': "duration_nights",
+    'transport_type': "transport_type",
+    'dates': "COALESCE(dates, '[]'::jsonb) AS dates",
+    'prices': "COALESCE(prices, '{}'::jsonb) AS prices",
+    'hotels': "COALESCE(hotels, '[]'::jsonb) AS hotels",
+    'includes': "COALESCE(includes, '[]'::jsonb) AS includes",
+    'excludes': "COALESCE(excludes, '[]'::jsonb) AS excludes",
+    'highlights': "COALESCE(highlights, '[]'::jsonb) AS highlights",
+    'price_min': "price_min",
+    'price_max': "price_max",
+    'created_at': "created_at",
+    'updated_at': "updated_at",
+}
+DEFAULT_FIELDS = [
+    'id', 'filename', 'title', 'description', 'destinations', 'duration_days', 'duration_nights',
+    'transport_type', 'dates', 'prices', 'hotels', 'includes', 'excludes', 'highlights',
+    'created_at', 'updated_at'
+]
+
+MONTH_NAMES = {
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'maj': 5, 'may': 5, 'jun': 6,
+    'jul': 7, 'avg': 8, 'aug': 8, 'sep': 9, 'okt': 10, 'oct': 10, 'nov': 11, 'dec': 12,
+}
+NUMERIC_DATE_PATTERN = re.compile(r'\b(\d{1,2})\s*[./]\s*(\d{1,2})\b(?:\s*[./]\s*(\d{4})\b)?')
+ISO_DATE_PATTERN = re.compile(r'\b(\d{4})-(\d{2})-(\d{2})\b')
+NAMED_DATE_PATTERN = re.compile(r'\b(\d{1,2})\.?\s*([a-z]{3,})\.?\s*(\d{4})?\b')
+MONTH_NAME_PATTERN = re.compile(r'[a-z]{3,}')
+PRICE_PATTERN = re.compile(r'\d[\d.,\s]*')
+THOUSANDS_PATTERN = re.compile(r'^\d{1,3}([.,\s]\d{3})+$')
+
+
+class CatalogQueryError(ValueError):
+    """Invalid filter, projection or cursor in a catalog request"""
+
+
+def parse_price(value: Any) -> Optional[float]:
+    """Numeric amount from a price like 999, "1.299 EUR" or "849,50€" """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value) if value > 0 else None
+    if not isinstance(value, str):
+        return None
+
+    match = PRICE_PATTERN.search(value)
+    if not match:
+        return None
+    number = match.group(0).strip().rstrip('.,')
+    if THOUSANDS_PATTERN.match(number):
+        number = re.sub(r'[.,\s]', '', number)
+    else:
+        number = number.replace(' ', '').replace(',', '.')
+    try:
+        amount = float(number)
+    except ValueError:
+        return None
+    return amount if amount > 0 else None
+
+
+def _date_parts(value: Any) -> Optional[Tuple[Optional[int], int, Optional[int]]]:
+    """(year, month, day) of "29.04.2025", "2025-04-29", "29. april 2025"; year may be missing"""
+    if not isinstance(value, str):
+        return None
+    text = value.lower()
+
+    match = ISO_DATE_PATTERN.search(text)
+    if match:
+        year, month, day = (int(part) for part in match.groups())
+        return (year, month, day) if 1 <= month <= 12 else None
+
+    match = NUMERIC_DATE_PATTERN.search(text)
+    if match:
+        day, month = int(match.group(1)), int(match.group(2))
+        year = int(match.group(3)) if match.group(3) else None
+        return (year, month, day) if 1 <= month <= 12 else None
+
+    match = NAMED_DATE_PATTERN.search(text)
+    if match and match.group(2)[:3] in MONTH_NAMES:
+        year = int(match.group(3)) if match.group(3) else None
+        return year, MONTH_NAMES[match.group(2)[:3]], int(match.group(1))
+
+    for word in MONTH_NAME_PATTERN.findall(text):
+        if word[:3] in MONTH_NAMES:
+            return None, MONTH_NAMES[word[:3]], None
+    return None
+
+
+def departure_month(value: Any) -> Optional[int]:
+    """Month (1-12) of a departure date"""
+    parts = _date_parts(value)
+    return parts[1] if parts else None
+
+
+def parse_date(value: Any) -> Optional[date]:
+    """Calendar date of a departure/return date, None if it has no year or is invalid"""
+    parts = _date_parts(value)
+    if not parts or not parts[0] or not parts[2]:
+        return None
+    try:
+        return date(*parts)
+    except ValueError:
+        return None
+
+
+def date_rows(dates: Any) -> List[Dict[str, Any]]:
+    """One normalized row per departure for the travel_package_dates table"""
+    rows = []
+    for position, item in enumerate(dates if isinstance(dates, list) else []):
+        if not isinstance(item, dict):
+            continue
+        departure, return_ = item.get('departure_date'), item.get('return_date')
+        rows.append({
+            'position': position,
+            'departure_date': parse_date(departure),
+            'return_date': parse_date(return_),
+            'departure_month': departure_month(departure),
+            'departure_text': str(departure) if departure is not None else None,
+            'return_text': str(return_) if return_ is not None else None,
+            'price_regular': parse_price(item.get('price_regular')),
+            'price_discounted': parse_price(item.get('price_discounted')),
+        })
+    return rows
+
+
+def search_columns(dates: Any) -> Dict[str, Any]:
+    """Indexed filter columns derived from a package's dates list"""
+    prices = []
+    months = set()
+    for item in dates if isinstance(dates, list) else []:
+        if not isinstance(item, dict):
+            continue
+        for key in ('price_regular', 'price_discounted'):
+            amount = parse_price(item.get(key))
+            if amount is not None:
+                prices.append(amount)
+        month = departure_month(item.get('departure_date'))
+        if month:
+            months.add(month)
+
+    return {
+        'price_min': min(prices) if prices else None,
+        'price_max': max(prices) if prices else None,
+        'departure_months': sorted(months),
+    }
+
+
+def encode_cursor(created_at: datetime, package_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), package_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, package_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(package_id)
+    except (ValueError, TypeError) as e:
+        raise CatalogQueryError(f"Invalid cursor: {cursor}") from e
+
+
+class CatalogQuery:
+    """Filters, projection and keyset pagination for /api/travel-packages.
+
+    Packages are ordered by (created_at, id) descending. Without ``limit``
+    or ``cursor`` every matching package is returned, as before pagination
+    existed; with either one the result is a page and ``cursor`` is the
+    position of the last package on the previous page.
+    """
+
+    def __init__(self, args, default_limit: int = 50, max_limit: int = 200):
+        self.destinations = [value for value in args.getlist('destination') if value]
+        self.transport_type = args.get('transport_type') or None
+        self.duration = self._int(args, 'duration')
+        self.duration_min = self._int(args, 'duration_min')
+        self.duration_max = self._int(args, 'duration_max')
+        self.price_min = self._float(args, 'price_min')
+        self.price_max = self._float(args, 'price_max')
+        self.months = self._months(args)
+        self.cursor = args.get('cursor') or None
+        self.after = decode_cursor(self.cursor) if self.cursor else None
+
+        limit = self._int(args, 'limit')
+        self.paginated = limit is not None or self.cursor is not None
+        if not self.paginated:
+            self.limit = None
+        else:
+            self.limit = min(limit, max_limit) if limit and limit > 0 else default_limit
+
+        fields = args.get('fields')
+        self.fields = [field.strip() for field in fields.split(',') if field.strip()] if fields else DEFAULT_FIELDS
+        unknown = [field for field in self.fields if field not in PACKAGE_FIELDS]
+        if unknown:
+            raise CatalogQueryError(f"Unknown field(s): {', '.join(unknown)}")
+
+    @staticmethod
+    def _int(args, name: str) -> Optional[int]:
+        value = args.get(name)
+        if value in (None, ''):
+            return None
+        try:
+            return int(value)
+        except ValueError:
+            raise CatalogQueryError(f"{name} must be an integer")
+
+    @staticmethod
+    def _float(args, name: str) -> Optional[float]:
+        value = args.get(name)
+        if value in (None, ''):
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            raise CatalogQueryError(f"{name} must be a number")
+
+    @staticmethod
+    def _months(args) -> List[int]:
+        months = []
+        for value in args.getlist('month'):
+            for part in value.split(','):
+                part = part.strip()
+                if not part:
+                    continue
+                month = int(part) if part.isdigit() else MONTH_NAMES.get(part.lower()[:3])
+                if not month or not 1 <= month <= 12:
+                    raise CatalogQueryError(f"Invalid month: {part}")
+                months.append(month)
+        return sorted(set(months))
+
+    def cache_key(self) -> str:
+        return json.dumps([
+            self.destinations, self.transport_type, self.duration, self.duration_min, self.duration_max,
+            self.price_min, self.price_max, self.months, self.cursor, self.limit, self.fields
+        ], ensure_ascii=False)
+
+    def _filters(self) -> Tuple[List[str], List[Any]]:
+        conditions, params = [], []
+        if self.destinations:
+            # Containment on destinations is served by its GIN index
+            conditions.append("(" + " OR ".join(["destinations @> %s::jsonb"] * len(self.destinations)) + ")")
+            params.extend(json.dumps([name], ensure_ascii=False) for name in self.destinations)
+        if self.transport_type:
+            conditions.append("lower(transport_type) = lower(%s)")
+            params.append(self.transport_type)
+        if self.duration is not None:
+            conditions.append("duration_days = %s")
+            params.append(self.duration)
+        if self.duration_min is not None:
+            conditions.append("duration_days >= %s")
+            params.append(self.duration_min)
+        if self.duration_max is not None:
+            conditions.append("duration_days <= %s")
+            params.append(self.duration_max)
+        # A package matches a price range if any of its prices falls inside it
+        if self.price_min is not None:
+            conditions.append("price_max >= %s")
+            params.append(self.price_min)
+        if self.price_max is not None:
+            conditions.append("price_min <= %s")
+            params.append(self.price_max)
+        if self.months:
+            conditions.append("departure_months && %s::smallint[]")
+            params.append(self.months)
+        return conditions, params
+
+    def count_sql(self) -> Tuple[str, List[Any]]:
+        conditions, params = self._filters()
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return f"SELECT COUNT(*) FROM travel_packages {where}", params
+
+    def page_sql(self) -> Tuple[str, List[Any]]:
+        conditions, params = self._filters()
+        if self.after:
+            conditions.append("(created_at, id) < (%s, %s)")
+            params.extend(self.after)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        # id and created_at are always read to build the next cursor
+        columns = list(dict.fromkeys(['id', 'created_at'] + self.fields))
+        select = ", ".join(PACKAGE_FIELDS[column] for column in columns)
+        sql = f"""
+            SELECT {select}
+            FROM travel_packages
+            {where}
+            ORDER BY created_at DESC, id DESC
+        """
+        if not self.paginated:
+            return sql, params
+        # One extra row tells whether there is a next page
+        return sql + "LIMIT %s", params + [self.limit + 1]
+
+    def page(self, rows: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Project fetched rows and build the cursor of the next page"""
+        if not self.paginated:
+            return [{field: row[field] for field in self.fields} for row in rows], None
+        has_more = len(rows) > self.limit
+        rows = rows[:self.limit]
+        next_cursor = encode_cursor(rows[-1]['created_at'], rows[-1]['id']) if has_more and rows else None
+        return [{field: row[field] for field in self.fields} for row in rows], next_cursor
+
+
+class CatalogCache:
+    """LRU cache of serialized catalog pages for one catalog version.
+
+    Entries are keyed by the normalized query; a version change (any write
+    to travel_packages) empties the cache.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._version = None
+        self._hits = 0
+        self._misses = 0
+        self._not_modified = 0
+
+    @staticmethod
+    def etag(version: str, key: str) -> str:
+        return hashlib.sha256(f"{version}\x00{key}".encode('utf-8')).hexdigest()[:32]
+
+    def _check_version(self, version: str) -> None:
+        """Caller holds the lock"""
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+
+    def get(self, version: str, key: str) -> Optional[bytes]:
+        with self._lock:
+            self._check_version(version)
+            body = self._entries.get(key)
+            if body is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return body
+
+    def put(self, version: str, key: str, body: bytes) -> None:
+        with self._lock:
+            self._check_version(version)
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def count_not_modified(self) -> None:
+        with self._lock:
+            self._not_modified += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self._hits,
+                'misses': self._misses,
+                'not_modified': self._not_modified,
+            }
@@ -0,0 +1,202 @@
+import os
+import re
+import time
+import uuid
+import threading
+import logging
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Callable, List, Tuple
+
+import numpy as np
+
+from keyword_matcher import fold
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_message(text: str) -> str:
+    """Lowercase, strip diacritics and punctuation, collapse whitespace"""
+    text = re.sub(r'[^\w\s]', ' ', fold(text))
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+class DocumentSetVersion:
+    """Version stamp of the ingested document set, shared between processes via a file.
+
+    Reading is a single ``stat`` call; the file is only re-read when its mtime
+    changes, so checking the version on every chat request is cheap.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._value = ""
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if not os.path.exists(path):
+            self.bump()
+
+    def current(self) -> str:
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return self._value
+
+        if mtime != self._mtime:
+            with self._lock:
+                try:
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        self._value = f.read().strip()
+                    self._mtime = mtime
+                except OSError:
+                    pass
+        return self._value
+
+    def bump(self) -> str:
+        """Mark the document set as changed"""
+        value = uuid.uuid4().hex
+        tmp_path = f"{self.path}.{value}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(value)
+        os.replace(tmp_path, self.path)
+        return value
+
+
+class ResponseCache:
+    """LRU + TTL cache of chat responses with exact and semantic matching.
+
+    Lookups first try the normalized message text, then the cosine similarity
+    of the message embedding against cached questions. Entries belong to a
+    document-set version and are dropped as soon as the version changes.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl: float = 3600.0,
+                 similarity_threshold: float = 0.92,
+                 embed_fn: Optional[Callable[[str], List[float]]] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.embed_fn = embed_fn
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._version = None
+        self._matrix = None
+        self._matrix_keys: List[str] = []
+
+        self._exact_hits = 0
+        self._semantic_hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def _embed(self, message: str) -> Optional[np.ndarray]:
+        if not self.embed_fn:
+            return None
+        try:
+            vector = np.asarray(self.embed_fn(message), dtype=np.float32)
+        except Exception as e:
+            logger.error(f"Response cache embedding error: {e}")
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def _check_version(self, version: str) -> None:
+        """Drop everything cached for an older document set; caller holds the lock"""
+        if version != self._version:
+            if self._entries:
+                self._invalidations += 1
+            self._entries.clear()
+            self._matrix = None
+            self._version = version
+
+    def _expire(self) -> None:
+        """Remove entries past their TTL; caller holds the lock"""
+        cutoff = time.time() - self.ttl
+        expired = [key for key, entry in self._entries.items() if entry['created_at'] < cutoff]
+        for key in expired:
+            del self._entries[key]
+        if expired:
+            self._matrix = None
+
+    def _semantic_match(self, vector: np.ndarray) -> Tuple[Optional[str], float]:
+        """Best cached question by cosine similarity; caller holds the lock"""
+        if self._matrix is None:
+            self._matrix_keys = [key for key, entry in self._entries.items() if entry['embedding'] is not None]
+            self._matrix = (
+                np.stack([self._entries[key]['embedding'] for key in self._matrix_keys])
+                if self._matrix_keys else np.empty((0, len(vector)), dtype=np.float32)
+            )
+        if not len(self._matrix_keys):
+            return None, 0.0
+
+        scores = self._matrix @ vector
+        best = int(np.argmax(scores))
+        return self._matrix_keys[best], float(scores[best])
+
+    def lookup(self, message: str, version: str) -> Tuple[Optional[Dict[str, Any]], Optional[str], Optional[np.ndarray]]:
+        """Find a cached response, returns (response, match_type, message_embedding)"""
+        key = normalize_message(message)
+
+        with self._lock:
+            self._check_version(version)
+            self._expire()
+            entry = self._entries.get(key)
+            if entry:
+                self._entries.move_to_end(key)
+                self._exact_hits += 1
+                return entry['response'], 'exact', None
+            has_candidates = bool(self._entries)
+
+        vector = self._embed(message)
+        if vector is not None and has_candidates:
+            with self._lock:
+                if version == self._version:
+                    match_key, score = self._semantic_match(vector)
+                    if match_key and score >= self.similarity_threshold and match_key in self._entries:
+                        self._entries.move_to_end(match_key)
+                        self._semantic_hits += 1
+                        return self._entries[match_key]['response'], 'semantic', vector
+
+        with self._lock:
+            self._misses += 1
+        return None, None, vector
+
+    def store(self, message: str, version: str, response: Dict[str, Any],
+              embedding: Optional[np.ndarray] = None) -> None:
+        """Cache a response for the given message and document-set version"""
+        key = normalize_message(message)
+        if not key:
+            return
+
+        with self._lock:
+            self._check_version(version)
+            self._entries[key] = {
+                'response': response,
+                'embedding': embedding,
+                'created_at': time.time()
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+            self._matrix = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit-rate metrics"""
+        with self._lock:
+            hits = self._exact_hits + self._semantic_hits
+            lookups = hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'exact_hits': self._exact_hits,
+                'semantic_hits': self._semantic_hits,
+                'misses': self._misses,
+                'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+                'evictions': self._evictions,
+                'invalidations': self._invalidations,
+            }
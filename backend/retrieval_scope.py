@@ -0,0 +1,169 @@
+import re
+import threading
+import logging
+from typing import Dict, Any, Optional, List, Callable, Iterable
+
+from keyword_matcher import fold
+from package_catalog import MONTH_NAMES, search_columns
+
+logger = logging.getLogger(__name__)
+
+# Chroma metadata holds scalars only, so each destination, month and transport is its own flag
+DESTINATION_PREFIX = 'dest_'
+MONTH_PREFIX = 'month_'
+TRANSPORT_PREFIX = 'transport_'
+SCOPE_PREFIXES = (DESTINATION_PREFIX, MONTH_PREFIX, TRANSPORT_PREFIX)
+# Dropped in this order when the full scope matches no chunk, the destination is kept longest
+RELAX_ORDER = (MONTH_PREFIX, TRANSPORT_PREFIX)
+
+# Same words in stored transport_type values ("avion i autobus") and in questions ("avionom")
+TRANSPORT_PATTERNS = {
+    'avion': re.compile(r'\bavio'),
+    'autobus': re.compile(r'\b(?:auto)?bus'),
+    'voz': re.compile(r'\bvoz(?:om|u)?\b'),
+    'brod': re.compile(r'\bbrod|\bkrstar'),
+}
+# "u julu", "15. septembra", "tokom avgusta"; "majka" or "junak" are not months
+MONTH_PATTERN = re.compile(
+    r'\b(januar|februar|mart|april|maj|jun|jul|avgust|august|'
+    r'septemb(?:ar|er|r)|oktob(?:ar|er|r)|octob(?:er)|novemb(?:ar|er|r)|decemb(?:ar|er|r))(?:a|u|om|i|e)?\b'
+)
+# "15.07." or "15.07.2025", not prices or room types ("1/1")
+MONTH_DATE_PATTERN = re.compile(r'\b\d{1,2}\.\s*(\d{1,2})\.')
+KEY_PATTERN = re.compile(r'\W+')
+
+
+def _key(value: Any) -> str:
+    return KEY_PATTERN.sub('_', fold(str(value)).strip()).strip('_')
+
+
+def transports(text: Optional[str]) -> List[str]:
+    """Transport kinds named in a transport_type value or a message"""
+    text = fold(text or '')
+    return [kind for kind, pattern in TRANSPORT_PATTERNS.items() if pattern.search(text)]
+
+
+def months(text: str) -> List[int]:
+    """Months named ("u julu") or written as dates ("15.07.") in a message"""
+    text = fold(text)
+    found = {MONTH_NAMES[match.group(1)[:3]] for match in MONTH_PATTERN.finditer(text)}
+    found.update(int(month) for month in MONTH_DATE_PATTERN.findall(text) if 1 <= int(month) <= 12)
+    return sorted(found)
+
+
+def scope_metadata(package: Dict[str, Any]) -> Dict[str, bool]:
+    """Flags for the chunks of one document from its extracted package data"""
+    flags = {}
+    for destination in package.get('destinations') or []:
+        if isinstance(destination, str) and _key(destination):
+            flags[f"{DESTINATION_PREFIX}{_key(destination)}"] = True
+    for month in search_columns(package.get('dates'))['departure_months']:
+        flags[f"{MONTH_PREFIX}{month}"] = True
+    transport = package.get('transport_type')
+    for kind in transports(transport if isinstance(transport, str) else None):
+        flags[f"{TRANSPORT_PREFIX}{kind}"] = True
+    return flags
+
+
+def is_scope_key(key: str) -> bool:
+    return key.startswith(SCOPE_PREFIXES)
+
+
+def _any_of(prefix: str, values: Iterable[Any]) -> Dict[str, Any]:
+    options = [{f"{prefix}{_key(value)}": True} for value in values]
+    return options[0] if len(options) == 1 else {'$or': options}
+
+
+def _where(scope: Dict[str, List[Any]]) -> Optional[Dict[str, Any]]:
+    clauses = [_any_of(prefix, values) for prefix, values in scope.items() if values]
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {'$and': clauses}
+
+
+class RetrievalScope:
+    """Narrows retrieval to the trips a question is about.
+
+    Destinations known to the catalog, departure months and the transport
+    named in the message become a Chroma ``where`` filter over the flags
+    that ``scope_metadata`` puts on each chunk. Whatever the message leaves
+    out is taken from the user's most recent earlier message that names it,
+    so "A u julu?" still searches Lisbon. When the filtered search finds
+    nothing, the month and then the transport are dropped from the filter;
+    if even the destination matches nothing (e.g. chunks of documents
+    without extracted data), the search runs unfiltered.
+    """
+
+    def __init__(self, destinations_fn: Callable[[str], List[str]]):
+        self._destinations_fn = destinations_fn
+        self._lock = threading.Lock()
+        self._counts = {'queries': 0, 'scoped': 0, 'from_history': 0, 'relaxed': 0, 'fallback': 0}
+
+    def _scope(self, text: str) -> Dict[str, List[Any]]:
+        return {
+            DESTINATION_PREFIX: self._destinations_fn(text),
+            MONTH_PREFIX: months(text),
+            TRANSPORT_PREFIX: transports(text),
+        }
+
+    def filters(self, message: str, earlier_messages: Iterable[str] = ()) -> List[Dict[str, Any]]:
+        """Chroma where clauses for the message from the strictest to the loosest, empty if it names nothing.
+
+        What the message leaves out is taken from the user's earlier messages,
+        newest first. Only the user's own words carry the scope: bot answers
+        list many trips and the history summary mixes both sides.
+        """
+        scope = self._scope(message)
+        from_history = False
+        if not all(scope.values()):
+            for line in reversed([text for text in earlier_messages if text and text.strip()]):
+                missing = [prefix for prefix, values in scope.items() if not values]
+                if not missing:
+                    break
+                found = self._scope(line)
+                for prefix in missing:
+                    if found[prefix]:
+                        scope[prefix] = found[prefix]
+                        from_history = True
+
+        filters = []
+        for prefix in (None,) + RELAX_ORDER:
+            if prefix:
+                scope[prefix] = []
+            where = _where(scope)
+            if where and where not in filters:
+                filters.append(where)
+
+        with self._lock:
+            self._counts['queries'] += 1
+            self._counts['scoped'] += bool(filters)
+            self._counts['from_history'] += from_history
+        return filters
+
+    def retrieve(self, retriever, message: str, earlier_messages: Iterable[str] = (),
+                 config: Optional[Dict[str, Any]] = None):
+        """Documents for the message from the strictest scope that finds any, unfiltered if none does"""
+        filters = []
+        try:
+            filters = self.filters(message, earlier_messages)
+        except Exception as e:
+            logger.error(f"Retrieval scope error: {e}")
+
+        for attempt, where in enumerate(filters):
+            documents = retriever.invoke(message, config, filter=where)
+            if documents:
+                if attempt:
+                    with self._lock:
+                        self._counts['relaxed'] += 1
+                return documents
+
+        if filters:
+            with self._lock:
+                self._counts['fallback'] += 1
+        return retriever.invoke(message, config)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._counts)
+        counts['scoped_rate'] = round(counts['scoped'] / counts['queries'], 4) if counts['queries'] else 0.0
+        return counts
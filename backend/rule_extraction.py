@@ -0,0 +1,290 @@
+import re
+import threading
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+
+from package_catalog import MONTH_NAMES, parse_price, parse_date
+
+logger = logging.getLogger(__name__)
+
+DASH = r'[-–—]'
+DURATION_PATTERN = re.compile(r'(\d{1,2})\s*dana?\s*/\s*(\d{1,2})\s*no[cćč]enja?\b(.*)', re.IGNORECASE)
+NUMERIC_RANGE_PATTERN = re.compile(
+    rf'(\d{{1,2}})\s*\.\s*(\d{{1,2}})\s*\.?\s*(\d{{4}})?\s*\.?\s*{DASH}\s*(\d{{1,2}})\s*\.\s*(\d{{1,2}})\s*\.\s*(\d{{4}})'
+)
+NAMED_RANGE_PATTERN = re.compile(
+    rf'(\d{{1,2}})\.?\s*([a-zčćšžđ]{{3,}})\s*(\d{{4}})?\s*\.?\s*{DASH}\s*(\d{{1,2}})\.?\s*([a-zčćšžđ]{{3,}})\s*(\d{{4}})',
+    re.IGNORECASE
+)
+AMOUNT = r'\d{2,5}(?:[.,]\d{3})?'
+# A price-list row: "499 479 eur" (regular and discounted) or "899€", nothing else on the line
+PRICE_ROW_PATTERN = re.compile(rf'^({AMOUNT})(?:\s+({AMOUNT}))?\s*(?:€|eur[ao]?)$', re.IGNORECASE)
+HOTEL_PATTERN = re.compile(rf'^hotel\s+(.+?)\s*([1-5])\s*\*\s*(?:{DASH}\s*(.+))?$', re.IGNORECASE)
+DAY_PATTERN = re.compile(
+    rf'^\d{{1,2}}\s*\.\s*dan\b.*?\)\s*{DASH}?\s*([A-ZČĆŠŽĐ][A-ZČĆŠŽĐ\s\-–—]+)$', re.IGNORECASE
+)
+PLACE_PATTERN = re.compile(r'^[A-ZČĆŠŽĐ][A-ZČĆŠŽĐ ]+$')
+SINGLE_ROOM_PATTERN = re.compile(r'doplata\s+za\s+1/1\s*sobu\s*(\d+)\s*(?:€|eur)', re.IGNORECASE)
+HEADING_PATTERN = re.compile(r'^[A-ZČĆŠŽĐ][A-ZČĆŠŽĐ ]{3,}:')
+INCLUDES_PATTERN = re.compile(r'^aran[zž]man\s+obuhvata\s*:', re.IGNORECASE)
+EXCLUDES_PATTERN = re.compile(r'^aran[zž]man\s+ne\s+obuhvata\s*:', re.IGNORECASE)
+HEADER_SKIP_PATTERN = re.compile(r'cenovnik|va[zž]i\s+od|www\.|@|\d', re.IGNORECASE)
+SPACES_PATTERN = re.compile(r'[ \t]+')
+
+# Day headers that name the departure city or an activity, not a destination
+NOT_DESTINATIONS = {'beograd', 'razgledanje', 'povratak', 'polazak', 'dolazak'}
+# The title is only taken from a header block this close to the top of the document
+HEADER_LINES = 8
+# A price without a hotel counts only this close below the duration line ("7 dana / 6 noćenja" / "899€")
+HEADLINE_PRICE_LINES = 3
+# The introduction must start within this many characters below the duration line
+DESCRIPTION_WITHIN = 2000
+
+
+def _lines(content: str) -> List[str]:
+    return [SPACES_PATTERN.sub(' ', line).strip() for line in content.splitlines()]
+
+
+def _date(day: str, month: int, year: Optional[int]) -> Optional[str]:
+    if not 1 <= month <= 12 or not 1 <= int(day) <= 31 or not year:
+        return None
+    return f"{int(day):02d}.{month:02d}.{year}"
+
+
+def _ranges(content: str) -> List[Tuple[str, str]]:
+    """(departure, return) dd.mm.yyyy pairs of the trip ranges, in document order"""
+    found = []
+    for match in NUMERIC_RANGE_PATTERN.finditer(content):
+        day, month, year, return_day, return_month, return_year = match.groups()
+        return_year = int(return_year)
+        year = int(year) if year else (return_year - 1 if int(month) > int(return_month) else return_year)
+        found.append((match.start(), _date(day, int(month), year), _date(return_day, int(return_month), return_year)))
+
+    for match in NAMED_RANGE_PATTERN.finditer(content):
+        day, month, year, return_day, return_month, return_year = match.groups()
+        month, return_month = MONTH_NAMES.get(month.lower()[:3]), MONTH_NAMES.get(return_month.lower()[:3])
+        if not month or not return_month:
+            continue
+        return_year = int(return_year)
+        year = int(year) if year else (return_year - 1 if month > return_month else return_year)
+        found.append((match.start(), _date(day, month, year), _date(return_day, return_month, return_year)))
+
+    ranges = []
+    for _, departure, return_ in sorted(found):
+        if departure and return_ and (departure, return_) not in ranges:
+            ranges.append((departure, return_))
+    return ranges
+
+
+def _trip_days(departure: str, return_: str) -> Optional[int]:
+    start, end = parse_date(departure), parse_date(return_)
+    return (end - start).days + 1 if start and end else None
+
+
+def _transport(header: str, content: str) -> Optional[str]:
+    """Transport from the header ("AUTOBUSOM", "BUS/AVIO") and flight tickets in the price"""
+    header = header.lower().replace(' ', '')
+    plane = 'avio' in header or bool(re.search(r'avionsk\w*\s+kart', content, re.IGNORECASE))
+    bus = 'bus' in header
+    if plane and bus:
+        return 'avion i autobus'
+    if plane:
+        return 'avion'
+    if bus:
+        return 'autobus'
+    if re.search(r'poletanj|let za', content, re.IGNORECASE):
+        return 'avion'
+    return None
+
+
+def _title(lines: List[str], duration_line: int) -> Optional[str]:
+    """Header lines above the duration ("MONAKO – BARSELONA – MILANO" / "SA POSETOM TRSTU")"""
+    if duration_line >= HEADER_LINES:
+        return None
+    header = [line for line in lines[:duration_line] if line and not HEADER_SKIP_PATTERN.search(line)]
+    return ' '.join(header) or None
+
+
+def _description(text: str) -> Optional[str]:
+    """The introduction: first prose paragraph of the text below the header, cut at a sentence end"""
+    for paragraph in re.split(r'\n\s*\n', text[:DESCRIPTION_WITHIN]):
+        text = ' '.join(paragraph.split())
+        if len(text) < 150 or HEADING_PATTERN.match(text) or DURATION_PATTERN.search(text) or '€' in text:
+            continue
+        if len(text) > 300:
+            end = text.rfind('. ', 0, 300)
+            text = text[:end + 1] if end > 100 else text[:300]
+        return text
+    return None
+
+
+def _section_items(lines: List[str], heading: re.Pattern) -> List[str]:
+    """Bullet items under a heading ("ARANŽMAN OBUHVATA:"), up to the next heading"""
+    items: List[str] = []
+    inside = False
+    for line in lines:
+        if heading.match(line):
+            inside = True
+            continue
+        if not inside:
+            continue
+        if HEADING_PATTERN.match(line):
+            break
+        if line.startswith('•'):
+            items.append(line.lstrip('• ').strip())
+        elif line and items:
+            items[-1] = f"{items[-1]} {line}"
+    return [item for item in items if item]
+
+
+def _destinations(lines: List[str]) -> List[str]:
+    """Places from the day-by-day program headers ("2.Dan (27.04.2025) MONACO")"""
+    destinations, seen = [], set()
+    for line in lines:
+        match = DAY_PATTERN.match(line)
+        if not match:
+            continue
+        for place in re.split(DASH, match.group(1)):
+            place = place.strip()
+            # PDF text can split a word ("P ADOVA"), such pieces are joined back
+            if any(len(word) == 1 for word in place.split()):
+                place = place.replace(' ', '')
+            key = place.replace(' ', '').lower()
+            if not PLACE_PATTERN.match(place) or key in NOT_DESTINATIONS or key in seen:
+                continue
+            seen.add(key)
+            destinations.append(place.title())
+    return destinations
+
+
+def _price_grid(lines: List[str], duration_line: Optional[int]
+                ) -> Tuple[List[Dict[str, Any]], List[Tuple[Optional[str], float, Optional[float]]]]:
+    """Hotels and (hotel, regular, discounted) prices.
+
+    A price row right under a hotel is that hotel's price. Without any, a
+    price row just below the duration line is the package price.
+    """
+    hotels, prices, headline, seen = [], [], [], set()
+    hotel = None
+    for index, line in enumerate(lines):
+        if not line:
+            continue
+        match = HOTEL_PATTERN.match(line)
+        if match:
+            name = match.group(1).strip()
+            hotel = name
+            if name.lower() not in seen:
+                seen.add(name.lower())
+                hotels.append({'name': name, 'category': f"{match.group(2)}*",
+                               'location': match.group(3).strip() if match.group(3) else None})
+            continue
+
+        match = PRICE_ROW_PATTERN.match(line)
+        if match:
+            regular, discounted = parse_price(match.group(1)), parse_price(match.group(2))
+            if regular and discounted and discounted > regular:
+                regular, discounted = discounted, regular
+            if hotel:
+                prices.append((hotel, regular, discounted))
+            elif duration_line is not None and 0 < index - duration_line <= HEADLINE_PRICE_LINES:
+                headline.append((None, regular, discounted))
+        hotel = None
+    return hotels, prices or headline[:1]
+
+
+class RuleExtractor:
+    """Deterministic extraction for the agency price-list layout.
+
+    Reads trip date ranges (26.04 – 04.05.2025., 29. april 2025 - 05. maj
+    2025), the "9 DANA/6 NOĆENJA AUTOBUSOM" line, the hotel/price grid,
+    bullet lists under ARANŽMAN (NE) OBUHVATA and the day-by-day places.
+    Only fields it finds are returned. A result with every field the
+    catalog filters and retrieval scope rely on (title, priced dates,
+    duration, destinations and transport) is confident and needs no LLM
+    call; otherwise the LLM fills only what the rules left out.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._documents = 0
+        self._confident = 0
+        self._fields = 0
+
+    def extract(self, content: str) -> Dict[str, Any]:
+        lines = _lines(content)
+        data: Dict[str, Any] = {}
+
+        duration_line = None
+        match = DURATION_PATTERN.search(content)
+        if match:
+            data['duration_days'], data['duration_nights'] = int(match.group(1)), int(match.group(2))
+            duration_line = content.count('\n', 0, match.start())
+            title = _title(lines, duration_line)
+            if title:
+                data['title'] = title
+            transport = _transport(f"{title or ''} {match.group(3)}", content)
+            if transport:
+                data['transport_type'] = transport
+            description = _description(content[match.end():])
+            if description:
+                data['description'] = description
+
+        # Several ranges can be stays within the trip (hotel in Lisbon, then Porto), the trip matches the duration
+        ranges = _ranges(content)
+        if data.get('duration_days'):
+            ranges = [(departure, return_) for departure, return_ in ranges
+                      if _trip_days(departure, return_) == data['duration_days']]
+
+        hotels, prices = _price_grid(lines, duration_line)
+        if ranges and prices:
+            data['dates'] = [
+                {'departure_date': departure, 'return_date': return_, 'price_regular': regular,
+                 'price_discounted': discounted, **({'hotel': hotel} if hotel else {})}
+                for departure, return_ in ranges
+                for hotel, regular, discounted in prices
+            ]
+        if hotels:
+            data['hotels'] = hotels
+
+        values = {
+            'destinations': _destinations(lines),
+            'includes': _section_items(lines, INCLUDES_PATTERN),
+            'excludes': _section_items(lines, EXCLUDES_PATTERN),
+        }
+        data.update({field: value for field, value in values.items() if value})
+
+        match = SINGLE_ROOM_PATTERN.search(content)
+        if match:
+            data['additional_costs'] = {'single_room_supplement': float(match.group(1))}
+
+        with self._lock:
+            self._documents += 1
+            self._confident += self.is_confident(data)
+            self._fields += len(data)
+        return data
+
+    @staticmethod
+    def is_confident(data: Dict[str, Any]) -> bool:
+        return bool(data.get('title') and data.get('dates') and
+                    (data.get('duration_days') or data.get('duration_nights')) and
+                    data.get('destinations') and data.get('transport_type'))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'documents': self._documents,
+                'confident': self._confident,
+                'llm_skip_rate': round(self._confident / self._documents, 4) if self._documents else 0.0,
+                'fields': self._fields,
+            }
+
+
+def combine(rules: Dict[str, Any], extracted: Dict[str, Any]) -> Dict[str, Any]:
+    """LLM result with every field the rules resolved taken from the rules"""
+    data = dict(extracted or {})
+    for field, value in rules.items():
+        if field == 'additional_costs':
+            data[field] = {**(data.get(field) or {}), **value}
+        else:
+            data[field] = value
+    return data
@@ -0,0 +1,373 @@
+import os
+import time
+import sqlite3
+import threading
+import logging
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Dict, Any, Optional, List, Callable, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Session ids are stored in VARCHAR(64) columns
+MAX_SESSION_ID_LENGTH = 64
+
+
+class SessionStore(ABC):
+    """Chat session storage.
+
+    A session keeps at most ``max_messages`` recent messages plus the total
+    number of messages ever added (``message_count``). Messages carry their
+    1-based position in the session as ``seq``. A session can also hold a
+    running summary of its older messages. Sessions not touched for ``ttl``
+    seconds expire.
+    """
+
+    def __init__(self, ttl: float = 86400.0, max_messages: int = 20):
+        self.ttl = ttl
+        self.max_messages = max_messages
+
+    @abstractmethod
+    def append(self, session_id: str, message: Dict[str, Any]) -> int:
+        """Add a message, creating the session if needed; returns the session's message count"""
+
+    @abstractmethod
+    def get_messages(self, session_id: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Most recent messages of a session, oldest first"""
+
+    @abstractmethod
+    def get_summary(self, session_id: str) -> Tuple[str, int]:
+        """Summary of older messages and the seq of the last message it covers"""
+
+    @abstractmethod
+    def set_summary(self, session_id: str, summary: str, upto: int) -> None:
+        """Replace the summary if it covers more messages than the stored one"""
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        """Counters for /health and /metrics"""
+
+
+class MemorySessionStore(SessionStore):
+    """In-process LRU + TTL session store (not shared between workers)"""
+
+    def __init__(self, max_sessions: int = 10000, ttl: float = 86400.0, max_messages: int = 20):
+        super().__init__(ttl, max_messages)
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._evictions = 0
+        self._expirations = 0
+
+    def _get_live(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Session if present and not expired; caller holds the lock"""
+        session = self._sessions.get(session_id)
+        if session and time.time() - session['updated_at'] > self.ttl:
+            del self._sessions[session_id]
+            self._expirations += 1
+            return None
+        return session
+
+    def append(self, session_id: str, message: Dict[str, Any]) -> int:
+        with self._lock:
+            session = self._get_live(session_id)
+            if session is None:
+                session = {
+                    'created_at': datetime.now(),
+                    'messages': deque(maxlen=self.max_messages),
+                    'message_count': 0,
+                    'summary': "",
+                    'summary_upto': 0
+                }
+                self._sessions[session_id] = session
+
+            session['message_count'] += 1
+            session['messages'].append(dict(message, seq=session['message_count']))
+            session['updated_at'] = time.time()
+            self._sessions.move_to_end(session_id)
+
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self._evictions += 1
+
+            return session['message_count']
+
+    def get_messages(self, session_id: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            session = self._get_live(session_id)
+            if session is None:
+                return []
+            self._sessions.move_to_end(session_id)
+            messages = list(session['messages'])
+        return messages[-limit:] if limit else messages
+
+    def get_summary(self, session_id: str) -> Tuple[str, int]:
+        with self._lock:
+            session = self._get_live(session_id)
+            if session is None:
+                return "", 0
+            return session['summary'], session['summary_upto']
+
+    def set_summary(self, session_id: str, summary: str, upto: int) -> None:
+        with self._lock:
+            session = self._get_live(session_id)
+            if session is not None and upto > session['summary_upto']:
+                session['summary'] = summary
+                session['summary_upto'] = upto
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'backend': 'memory',
+                'sessions': len(self._sessions),
+                'max_sessions': self.max_sessions,
+                'evictions': self._evictions,
+                'expirations': self._expirations,
+            }
+
+
+class SQLSessionStore(SessionStore):
+    """Session store shared between workers through a SQL database.
+
+    ``connection`` is a context manager factory yielding a DB-API connection;
+    ``placeholder`` is the driver's parameter marker.
+    """
+
+    backend = 'sql'
+    cleanup_every = 500  # appends between expired-session sweeps
+
+    def __init__(self, connection: Callable, placeholder: str, ttl: float = 86400.0,
+                 max_messages: int = 20):
+        super().__init__(ttl, max_messages)
+        self._connection = connection
+        self._p = placeholder
+        self._appends = 0
+        self._lock = threading.Lock()
+        self._init_tables()
+
+    @abstractmethod
+    def _init_tables(self) -> None:
+        """Create the session tables if missing"""
+
+    def _sql(self, query: str) -> str:
+        return query.replace('?', self._p)
+
+    def append(self, session_id: str, message: Dict[str, Any]) -> int:
+        now = time.time()
+        with self._connection() as conn:
+            if conn is None:
+                raise RuntimeError("Session store unavailable")
+            cursor = conn.cursor()
+            try:
+                cursor.execute(self._sql("""
+                    INSERT INTO chat_sessions (id, created_at, updated_at, message_count)
+                    VALUES (?, ?, ?, 1)
+                    ON CONFLICT (id) DO UPDATE SET
+                        message_count = CASE WHEN chat_sessions.updated_at < ? THEN 1
+                                             ELSE chat_sessions.message_count + 1 END,
+                        summary = CASE WHEN chat_sessions.updated_at < ? THEN ''
+                                       ELSE chat_sessions.summary END,
+                        summary_upto = CASE WHEN chat_sessions.updated_at < ? THEN 0
+                                            ELSE chat_sessions.summary_upto END,
+                        updated_at = excluded.updated_at
+                """), (session_id, now, now, now - self.ttl, now - self.ttl, now - self.ttl))
+                cursor.execute(self._sql(
+                    "SELECT message_count FROM chat_sessions WHERE id = ?"
+                ), (session_id,))
+                message_count = cursor.fetchone()[0]
+
+                if message_count == 1:
+                    # New or expired session starts from a clean history
+                    cursor.execute(self._sql("DELETE FROM chat_messages WHERE session_id = ?"), (session_id,))
+
+                cursor.execute(self._sql("""
+                    INSERT INTO chat_messages (session_id, seq, role, content, timestamp)
+                    VALUES (?, ?, ?, ?, ?)
+                """), (session_id, message_count, message['role'], message['content'], message.get('timestamp')))
+                cursor.execute(self._sql(
+                    "DELETE FROM chat_messages WHERE session_id = ? AND seq <= ?"
+                ), (session_id, message_count - self.max_messages))
+                conn.commit()
+            finally:
+                cursor.close()
+
+        with self._lock:
+            self._appends += 1
+            sweep = self._appends % self.cleanup_every == 0
+        if sweep:
+            self.cleanup()
+        return message_count
+
+    def get_messages(self, session_id: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        limit = min(limit or self.max_messages, self.max_messages)
+        with self._connection() as conn:
+            if conn is None:
+                return []
+            cursor = conn.cursor()
+            try:
+                cursor.execute(self._sql("""
+                    SELECT m.role, m.content, m.timestamp, m.seq
+                    FROM chat_messages m
+                    JOIN chat_sessions s ON s.id = m.session_id
+                    WHERE m.session_id = ? AND s.updated_at >= ?
+                    ORDER BY m.seq DESC
+                    LIMIT ?
+                """), (session_id, time.time() - self.ttl, limit))
+                rows = cursor.fetchall()
+            finally:
+                cursor.close()
+        return [{'role': row[0], 'content': row[1], 'timestamp': row[2], 'seq': row[3]} for row in reversed(rows)]
+
+    def get_summary(self, session_id: str) -> Tuple[str, int]:
+        with self._connection() as conn:
+            if conn is None:
+                return "", 0
+            cursor = conn.cursor()
+            try:
+                cursor.execute(self._sql(
+                    "SELECT summary, summary_upto FROM chat_sessions WHERE id = ? AND updated_at >= ?"
+                ), (session_id, time.time() - self.ttl))
+                row = cursor.fetchone()
+                conn.commit()
+            finally:
+                cursor.close()
+        return (row[0] or "", row[1] or 0) if row else ("", 0)
+
+    def set_summary(self, session_id: str, summary: str, upto: int) -> None:
+        with self._connection() as conn:
+            if conn is None:
+                return
+            cursor = conn.cursor()
+            try:
+                cursor.execute(self._sql(
+                    "UPDATE chat_sessions SET summary = ?, summary_upto = ? WHERE id = ? AND summary_upto < ?"
+                ), (summary, upto, session_id, upto))
+                conn.commit()
+            finally:
+                cursor.close()
+
+    def cleanup(self) -> int:
+        """Delete expired sessions and their messages"""
+        cutoff = time.time() - self.ttl
+        with self._connection() as conn:
+            if conn is None:
+                return 0
+            cursor = conn.cursor()
+            try:
+                cursor.execute(self._sql("""
+                    DELETE FROM chat_messages WHERE session_id IN
+                        (SELECT id FROM chat_sessions WHERE updated_at < ?)
+                """), (cutoff,))
+                cursor.execute(self._sql("DELETE FROM chat_sessions WHERE updated_at < ?"), (cutoff,))
+                removed = cursor.rowcount
+                conn.commit()
+            finally:
+                cursor.close()
+        if removed:
+            logger.info(f"Removed {removed} expired chat session(s)")
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._connection() as conn:
+            if conn is None:
+                return {'backend': self.backend, 'sessions': None}
+            cursor = conn.cursor()
+            try:
+                cursor.execute(self._sql("SELECT COUNT(*) FROM chat_sessions WHERE updated_at >= ?"),
+                               (time.time() - self.ttl,))
+                sessions = cursor.fetchone()[0]
+                conn.commit()
+            finally:
+                cursor.close()
+        return {'backend': self.backend, 'sessions': sessions}
+
+
+class SQLiteSessionStore(SQLSessionStore):
+    """Session store in a local SQLite file, shared by workers on one host"""
+
+    backend = 'sqlite'
+
+    def __init__(self, db_path: str, ttl: float = 86400.0, max_messages: int = 20):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        super().__init__(self._sqlite_connection, '?', ttl, max_messages)
+
+    @contextmanager
+    def _sqlite_connection(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _init_tables(self) -> None:
+        with self._connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS chat_sessions (
+                    id TEXT PRIMARY KEY,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    message_count INTEGER NOT NULL DEFAULT 0,
+                    summary TEXT NOT NULL DEFAULT '',
+                    summary_upto INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            # Tables created before summaries were added
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(chat_sessions)")}
+            if 'summary' not in columns:
+                conn.execute("ALTER TABLE chat_sessions ADD COLUMN summary TEXT NOT NULL DEFAULT ''")
+                conn.execute("ALTER TABLE chat_sessions ADD COLUMN summary_upto INTEGER NOT NULL DEFAULT 0")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS chat_messages (
+                    session_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    timestamp TEXT,
+                    PRIMARY KEY (session_id, seq)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_chat_sessions_updated_at ON chat_sessions(updated_at)")
+            conn.commit()
+
+
+class PostgresSessionStore(SQLSessionStore):
+    """Session store in PostgreSQL, shared by all workers and hosts"""
+
+    backend = 'postgres'
+
+    def __init__(self, connection: Callable, ttl: float = 86400.0, max_messages: int = 20):
+        super().__init__(connection, '%s', ttl, max_messages)
+
+    def _init_tables(self) -> None:
+        with self._connection() as conn:
+            if conn is None:
+                raise RuntimeError("Database unavailable for session store")
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS chat_sessions (
+                        id VARCHAR(64) PRIMARY KEY,
+                        created_at DOUBLE PRECISION NOT NULL,
+                        updated_at DOUBLE PRECISION NOT NULL,
+                        message_count INTEGER NOT NULL DEFAULT 0
+                    )
+                """)
+                cursor.execute("ALTER TABLE chat_sessions ADD COLUMN IF NOT EXISTS summary TEXT NOT NULL DEFAULT ''")
+                cursor.execute("ALTER TABLE chat_sessions ADD COLUMN IF NOT EXISTS summary_upto INTEGER NOT NULL DEFAULT 0")
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS chat_messages (
+                        session_id VARCHAR(64) NOT NULL,
+                        seq INTEGER NOT NULL,
+                        role VARCHAR(20) NOT NULL,
+                        content TEXT NOT NULL,
+                        timestamp VARCHAR(40),
+                        PRIMARY KEY (session_id, seq)
+                    )
+                """)
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_chat_sessions_updated_at ON chat_sessions(updated_at)")
+            conn.commit()
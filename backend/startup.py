@@ -0,0 +1,128 @@
+import os
+import time
+import threading
+import logging
+from datetime import datetime
+from typing import Dict, Any, Optional, List, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class Startup:
+    """Runs the app's initialization steps in a background thread.
+
+    Steps run in order and a step that raises is retried with exponential
+    backoff, so an API that is down at boot delays readiness instead of
+    failing the worker. The process is ready once every required step has
+    succeeded; optional steps (warm-up) run afterwards, do not gate
+    readiness and are given up after ``optional_attempts``. Background steps (the database) are retried in their own
+    thread from the start; until they succeed the process is ready but
+    reported as degraded. The threads belong to one process: after a fork
+    the child starts its own run on first use.
+    """
+
+    def __init__(self, retry_delay: float = 1.0, max_retry_delay: float = 60.0, optional_attempts: int = 3):
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.optional_attempts = optional_attempts
+
+        self._steps: List[tuple] = []  # (name, fn, required, background)
+        self._lock = threading.Lock()
+        self._state: Dict[str, Dict[str, Any]] = {}
+        self._ready = threading.Event()
+        self._pid = None
+        self._started_at = None
+        self._ready_after = None
+
+    def add_step(self, name: str, fn: Callable[[], Any], required: bool = True, background: bool = False) -> None:
+        if background:
+            required = False
+        elif required and any(not step_required and not step_background
+                               for _, _, step_required, step_background in self._steps):
+            raise ValueError("Required steps must come before optional ones")
+        self._steps.append((name, fn, required, background))
+
+    def start(self) -> None:
+        """Start initialization in this process unless it is already running"""
+        if self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._ready = threading.Event()
+            self._started_at = time.monotonic()
+            self._ready_after = None
+            self._state = {name: {'status': 'pending', 'required': required, 'background': background, 'attempts': 0}
+                           for name, _, required, background in self._steps}
+            threading.Thread(target=self._run, name="startup", daemon=True).start()
+
+    def _run(self) -> None:
+        for name, fn, _, background in self._steps:
+            if background:
+                threading.Thread(target=self._run_step, args=(name, fn), name=f"startup-{name}", daemon=True).start()
+
+        for name, fn, required, background in self._steps:
+            if background:
+                continue
+            if not required:
+                self._mark_ready()
+            self._run_step(name, fn, max_attempts=None if required else self.optional_attempts)
+        self._mark_ready()
+
+    def _run_step(self, name: str, fn: Callable[[], Any], max_attempts: Optional[int] = None) -> None:
+        """Run one step, retrying with backoff until it succeeds or max_attempts is used up"""
+        delay = self.retry_delay
+        while True:
+            attempts = self._state[name]['attempts'] + 1
+            self._update(name, status='running', attempts=attempts)
+            start = time.monotonic()
+            try:
+                fn()
+            except Exception as e:
+                if max_attempts is not None and attempts >= max_attempts:
+                    logger.error(f"Startup step {name} failed after {attempts} attempts, giving up: {e}")
+                    self._update(name, status='failed', error=str(e), duration=round(time.monotonic() - start, 3))
+                    return
+                logger.error(f"Startup step {name} failed, retrying in {delay:.0f}s: {e}")
+                self._update(name, status='retrying', error=str(e), duration=round(time.monotonic() - start, 3))
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_retry_delay)
+                continue
+            duration = time.monotonic() - start
+            self._update(name, status='done', error=None, duration=round(duration, 3),
+                         finished_at=datetime.now().isoformat())
+            logger.info(f"Startup step {name} done in {duration:.2f}s")
+            return
+
+    def _update(self, name: str, **values) -> None:
+        with self._lock:
+            self._state[name].update(values)
+
+    def _mark_ready(self) -> None:
+        if not self._ready.is_set():
+            self._ready_after = time.monotonic() - self._started_at
+            self._ready.set()
+            logger.info(f"Ready after {self._ready_after:.2f}s")
+
+    @property
+    def ready(self) -> bool:
+        return self._pid == os.getpid() and self._ready.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until ready (starting initialization if needed), False on timeout"""
+        self.start()
+        return self._ready.wait(timeout)
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            running = self._pid == os.getpid()
+            return {
+                'ready': running and self._ready.is_set(),
+                'ready_after': round(self._ready_after, 3) if running and self._ready_after is not None else None,
+                # Background steps still failing: the process serves requests without them
+                'degraded': [name for name, state in self._state.items()
+                             if state['background'] and state['status'] != 'done'] if running else [],
+                'steps': {name: dict(state) for name, state in self._state.items()} if running else {},
+            }
@@ -0,0 +1,183 @@
+import os
+import sys
+import uuid
+import importlib
+from contextlib import contextmanager
+
+import pytest
+from psycopg2 import extensions
+
+# Backend modules are imported as top-level modules, like main.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        if self.conn.fail_queries:
+            raise RuntimeError("server closed the connection")
+        self.conn.queries.append(sql)
+        self.rows = list(self.conn.respond(sql, params) or [])
+
+    def fetchall(self):
+        return self.rows
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+
+class FakeConnection:
+    """psycopg2 connection stand-in: statements are recorded and answered by ``respond(sql, params)``"""
+
+    def __init__(self, respond=None):
+        self.respond = respond or (lambda sql, params: [])
+        self.queries = []
+        self.closed = 0
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+        self.rollbacks = 0
+        self.fail_queries = False
+
+    def cursor(self, cursor_factory=None):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+    def get_transaction_status(self):
+        return self.status
+
+    def close(self):
+        self.closed = 1
+
+    @contextmanager
+    def connection(self):
+        """Stand-in for get_db_connection()"""
+        yield self
+
+
+@pytest.fixture
+def fake_connection():
+    """The FakeConnection class, for tests that script what the database answers"""
+    return FakeConnection
+
+
+@pytest.fixture(scope='session')
+def main_module(tmp_path_factory):
+    """main.py imported against temporary files, without its background threads.
+
+    Importing main starts the job queue workers and the startup steps; both
+    are held back so tests set up only the components they need. The
+    database URL points at a closed port, so nothing reaches a real server.
+    """
+    root = tmp_path_factory.mktemp("app")
+    settings = {
+        'LLM_PROVIDER': 'local',
+        'DATABASE_URL': 'postgresql://turbot@127.0.0.1:1/turbot',
+        'DB_POOL_MIN': '0',
+        'DB_CONNECT_TIMEOUT': '1',
+        'JOB_QUEUE_PATH': str(root / 'jobs.db'),
+        'CHROMA_DIR': str(root / 'chroma'),
+        'EMBEDDING_CACHE_PATH': str(root / 'embedding_cache.db'),
+        'EXTRACTION_CACHE_PATH': str(root / 'extraction_cache.db'),
+        'SESSION_DB_PATH': str(root / 'sessions.db'),
+        'INGEST_PARSE_WORKERS': '0',
+        'LOCAL_LLM_LATENCY': '0',
+        'LOCAL_LLM_JITTER': '0',
+        'LOCAL_LLM_TOKEN_DELAY': '0',
+        'LOCAL_EMBEDDING_LATENCY': '0',
+    }
+    with pytest.MonkeyPatch.context() as patch:
+        for name, value in settings.items():
+            patch.setenv(name, value)
+        patch.chdir(root)
+        patch.setattr('startup.Startup.start', lambda self: None)
+        patch.setattr('job_queue.JobQueue.start', lambda self: None)
+        main = importlib.import_module('main')
+
+    main.app.config['UPLOAD_FOLDER'] = str(root / 'uploads')
+    main.app.config['TESTING'] = True
+    return main
+
+
+@pytest.fixture
+def vector_store(main_module, tmp_path, monkeypatch):
+    """In-memory Chroma collection with hash embeddings and a BM25 index, installed in main"""
+    import chromadb
+    from langchain_chroma import Chroma
+    from local_models import HashEmbeddings
+    from bm25_index import BM25Index
+
+    store = Chroma(
+        collection_name=f"test_{uuid.uuid4().hex}",
+        embedding_function=HashEmbeddings(size=64),
+        client=chromadb.EphemeralClient()
+    )
+    monkeypatch.setattr(main_module, 'vector_store', store)
+    monkeypatch.setattr(main_module, 'bm25_index', BM25Index(str(tmp_path / "bm25_index.json")))
+    yield store
+    store.delete_collection()
+
+
+@pytest.fixture
+def chat_app(main_module, vector_store, monkeypatch):
+    """main wired for chat: local LLM over the test vector store, in-memory sessions, no router or cache"""
+    from local_models import LocalTravelChatModel
+    from session_store import MemorySessionStore
+    from startup import Startup
+
+    ready = Startup()
+    ready.start()
+    assert ready.wait(5)
+    monkeypatch.setattr(main_module, 'startup', ready)
+    monkeypatch.setattr(main_module, 'llm', LocalTravelChatModel(latency=0, jitter=0, token_delay=0))
+    monkeypatch.setattr(main_module, 'session_store', MemorySessionStore())
+    monkeypatch.setattr(main_module, 'intent_router', None)
+    monkeypatch.setattr(main_module, 'response_cache', None)
+    monkeypatch.setattr(main_module, 'history_summarizer', None)
+    monkeypatch.setattr(main_module, 'retrieval_scope', None)
+    vector_store.add_texts(
+        ["Leto u Barseloni, polazak autobusom 15.07.2025. Cena 499 eur. Kontakt: info@agencija.rs"],
+        metadatas=[{"source": "barselona.pdf", "source_name": "barselona.pdf"}],
+        ids=["barselona-1"]
+    )
+    monkeypatch.setattr(main_module, 'travel_bot', main_module.TravelBot())
+    return main_module
+
+
+@pytest.fixture
+def postgres(main_module, monkeypatch):
+    """main's pool pointed at a throwaway schema of TEST_DATABASE_URL, tables created by init_database"""
+    url = os.environ.get("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL not set")
+    import psycopg2
+    from db_pool import ConnectionPool
+
+    schema = f"test_{uuid.uuid4().hex[:12]}"
+    admin = psycopg2.connect(url)
+    admin.autocommit = True
+    with admin.cursor() as cursor:
+        cursor.execute(f"CREATE SCHEMA {schema}")
+    separator = '&' if '?' in url else '?'
+    pool = ConnectionPool(f"{url}{separator}options=-csearch_path%3D{schema}", min_size=0, max_size=4)
+    monkeypatch.setattr(main_module, 'db_pool', pool)
+    monkeypatch.setattr(main_module, 'db_pool_pid', os.getpid())
+    assert main_module.init_database()
+    yield pool
+    pool.closeall()
+    with admin.cursor() as cursor:
+        cursor.execute(f"DROP SCHEMA {schema} CASCADE")
+    admin.close()
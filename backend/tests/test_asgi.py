@@ -0,0 +1,112 @@
+import json
+import asyncio
+
+import httpx
+import pytest
+
+
+@pytest.fixture
+def asgi(chat_app):
+    import asgi
+    return asgi
+
+
+def post(asgi, path, payload, headers=None):
+    async def request():
+        transport = httpx.ASGITransport(app=asgi.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(path, json=payload, headers=headers)
+    return asyncio.run(request())
+
+
+def get(asgi, path):
+    async def request():
+        transport = httpx.ASGITransport(app=asgi.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get(path)
+    return asyncio.run(request())
+
+
+def test_limiter_queues_chats_beyond_the_limit():
+    from asgi import ConcurrencyLimiter
+
+    limiter = ConcurrencyLimiter(2, queue_timeout=5)
+    running = []
+
+    async def chat(n):
+        async with limiter.slot():
+            running.append(limiter.stats()['active'])
+            await asyncio.sleep(0.01)
+        return n
+
+    async def run():
+        return await asyncio.gather(*(chat(n) for n in range(6)))
+
+    assert asyncio.run(run()) == list(range(6))
+    assert max(running) == 2
+    assert limiter.stats() == {'limit': 2, 'active': 0, 'waiting': 0, 'peak': 2, 'rejected': 0}
+
+
+def test_limiter_rejects_chats_that_wait_too_long():
+    from asgi import ConcurrencyLimiter, ChatBusy
+
+    limiter = ConcurrencyLimiter(1, queue_timeout=0.05)
+
+    async def run():
+        async with limiter.slot():
+            with pytest.raises(ChatBusy):
+                async with limiter.slot():
+                    pass
+        # The slot is free again once the first chat is done
+        async with limiter.slot():
+            pass
+
+    asyncio.run(run())
+    assert limiter.stats()['rejected'] == 1 and limiter.stats()['active'] == 0
+
+
+def test_chat_answers_like_the_flask_endpoint(asgi):
+    response = post(asgi, '/api/chat', {'message': 'Koliko košta Barselona?', 'session_id': 'asgi-1'},
+                    headers={'X-Request-ID': 'trace-asgi'})
+
+    assert response.status_code == 200
+    assert response.headers['x-request-id'] == 'trace-asgi'
+    data = response.json()
+    assert data['session_id'] == 'asgi-1' and data['cache'] is None
+    assert '499 eur' in data['response']['content']
+    assert [message['role'] for message in asgi.main.session_store.get_messages('asgi-1')] == ['user', 'assistant']
+
+
+def test_chat_rejects_missing_messages(asgi):
+    response = post(asgi, '/api/chat', {'session_id': 'asgi-2'})
+
+    assert response.status_code == 400
+    assert response.json() == {'error': 'Message is required'}
+
+
+def test_chat_stream_sends_sse_events(asgi):
+    response = post(asgi, '/api/chat/stream', {'message': 'Koliko košta Barselona?', 'session_id': 'asgi-3'})
+
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/event-stream')
+    events = []
+    for block in response.text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines['event'], json.loads(lines['data'])))
+    assert events[0][0] == 'start' and events[-1][0] == 'done'
+    streamed = "".join(data['text'] for name, data in events if name == 'token')
+    assert streamed == events[-1][1]['response']['content']
+
+
+def test_health_reports_the_async_limiter(asgi):
+    response = get(asgi, '/health')
+
+    assert response.status_code == 200
+    assert response.json()['async_chat']['limit'] == asgi.CHAT_ASYNC_CONCURRENCY
+
+
+def test_other_routes_go_to_flask(asgi):
+    response = get(asgi, '/health/live')
+
+    assert response.status_code == 200
+    assert response.headers['access-control-allow-origin'] == '*'
@@ -0,0 +1,75 @@
+import json
+
+import pytest
+
+import bench
+
+
+def test_summary_uses_nearest_rank_percentiles():
+    summary = bench.summarize([n / 1000 for n in range(1, 101)])
+
+    assert summary == {'count': 100, 'mean_ms': 50.5, 'p50_ms': 50.0, 'p95_ms': 95.0, 'p99_ms': 99.0, 'max_ms': 100.0}
+    assert bench.summarize([]) == {'count': 0}
+
+
+def test_perturbed_copies_differ_only_in_numbers():
+    text = "Polazak 15.07.2025. Cena 499 eur"
+
+    copy = bench.perturb(text, 3)
+
+    assert copy == bench.perturb(text, 3) != bench.perturb(text, 4)
+    assert copy.startswith("Varijanta 3\nPolazak ") and copy.endswith(" eur")
+    assert copy != f"Varijanta 3\n{text}"
+
+
+def test_flatten_labels_list_items_by_their_parameter():
+    results = {'chat': {'levels': [{'concurrency': 8, 'latency': {'p95_ms': 12.5}, 'ok': True}]},
+               'retrieval': {'sizes': [{'collection_size': 100, 'hybrid': {'count': 5}}]},
+               'runs': [3, 4]}
+
+    assert bench.flatten(results) == {
+        'chat.levels[concurrency=8].concurrency': 8,
+        'chat.levels[concurrency=8].latency.p95_ms': 12.5,
+        'retrieval.sizes[collection_size=100].collection_size': 100,
+        'retrieval.sizes[collection_size=100].hybrid.count': 5,
+        'runs[0]': 3,
+        'runs[1]': 4,
+    }
+
+
+def test_compare_prints_changes_of_shared_metrics(tmp_path, capsys):
+    baseline, current = tmp_path / "baseline.json", tmp_path / "current.json"
+    baseline.write_text(json.dumps({'results': {'chat': {'p95_ms': 200, 'errors': 0, 'old': 1}}}))
+    current.write_text(json.dumps({'results': {'chat': {'p95_ms': 150, 'errors': 2}}}))
+
+    assert bench.main_cli(['--compare', str(baseline), str(current)]) == 0
+
+    lines = capsys.readouterr().out.splitlines()
+    assert [line.split() for line in lines] == [['chat.errors', '0', '2', 'n/a'],
+                                                ['chat.p95_ms', '200', '150', '-25.0%']]
+
+
+def test_url_defaults_to_the_server_port():
+    assert bench.DEFAULT_SERVER_URL == "http://localhost:8000"
+
+
+def test_retrieval_benchmark_leaves_the_app_stores_alone(main_module, vector_store, monkeypatch):
+    from local_models import HashEmbeddings
+
+    monkeypatch.setattr(main_module, 'embeddings', HashEmbeddings(size=64))
+    bm25_index = main_module.bm25_index
+
+    results = bench.bench_retrieval(main_module, ["Leto u Barseloni.\n\nCena 499 eur."], [5, 10], rounds=1)
+
+    assert [size['collection_size'] for size in results['sizes']] == [5, 10]
+    assert results['sizes'][1]['hybrid']['count'] == len(bench.RETRIEVAL_QUERIES)
+    assert main_module.vector_store is vector_store and main_module.bm25_index is bm25_index
+    assert vector_store.get()['ids'] == []
+
+
+def test_in_process_chat_benchmark_counts_requests(chat_app):
+    results = bench.bench_chat(chat_app, [1, 2], requests=4, url=None, use_cache=False)
+
+    assert results['target'] == 'in-process'
+    assert [(level['concurrency'], level['requests'], level['errors']) for level in results['levels']] == [(1, 4, 0), (2, 4, 0)]
+    assert results['levels'][0]['latency']['count'] == 4
@@ -0,0 +1,109 @@
+import pytest
+from langchain_core.documents import Document
+
+from bm25_index import tokenize, BM25Index, HybridRetriever
+
+
+class FakeVectorStore:
+    def __init__(self, documents):
+        self.documents = documents
+        self.calls = []
+
+    def similarity_search(self, query, k=4, **kwargs):
+        self.calls.append(kwargs)
+        return self.documents[:k]
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = BM25Index(str(tmp_path / "index" / "bm25_index.json"))
+    with index.transaction() as writer:
+        writer.add("rim", "Polazak za Rim 29.04.2025, cena 399 eur", {"source_name": "rim.pdf"})
+        writer.add("pariz", "Pariz autobusom, polazak 12.05.2025, hotel u centru", {"source_name": "pariz.pdf"})
+        writer.add("grcka", "Letovanje u Grčkoj, hotel na plaži, polazak iz Beograda, hotel sa doručkom",
+                   {"source_name": "grcka.pdf"})
+    return index
+
+
+def test_tokenize_folds_diacritics_and_splits_dates():
+    assert tokenize("Grčka, Đerdap: polazak 29.04.2025!") == ["grcka", "djerdap", "polazak", "29.04.2025", "29.04"]
+    assert tokenize("cena 1.299,00 eur") == ["cena", "1.299,00", "eur"]
+
+
+def test_rare_terms_rank_above_common_ones(index):
+    results = index.search("hotel rim")
+
+    assert results[0][0] == "rim"
+    assert {doc_id for doc_id, _ in results} == {"rim", "pariz", "grcka"}
+    assert all(score > 0 for _, score in results)
+
+
+def test_more_occurrences_score_higher(index):
+    ranked = [doc_id for doc_id, _ in index.search("hotel")]
+
+    assert ranked == ["grcka", "pariz"]
+
+
+def test_date_prefix_finds_full_dates(index):
+    assert index.search("29.04.")[0][0] == "rim"
+    assert index.search("Grčkoj")[0][0] == "grcka"
+
+
+def test_search_respects_where(index):
+    results = index.search("polazak", where={"source_name": {"$in": ["pariz.pdf", "rim.pdf"]}})
+
+    assert {doc_id for doc_id, _ in results} == {"pariz", "rim"}
+
+
+def test_index_is_shared_through_its_file(index):
+    other = BM25Index(index.path)
+    assert len(other) == 3
+
+    with index.transaction() as writer:
+        writer.remove(["rim"])
+        writer.add("rim", "Rim avionom", {"source_name": "rim.pdf"})
+
+    assert other.search("avionom")[0][0] == "rim"
+    assert other.search("399") == []
+
+
+def test_failed_transaction_is_rolled_back(index):
+    with pytest.raises(RuntimeError):
+        with index.transaction() as writer:
+            writer.remove(["rim", "pariz"])
+            raise RuntimeError("embedding failed")
+
+    assert len(index) == 3
+    assert index.get_document("rim").metadata == {"source_name": "rim.pdf"}
+
+
+def test_update_metadata_keeps_the_text_searchable(index):
+    with index.transaction() as writer:
+        writer.update_metadata("rim", {"source_name": "rim.pdf", "dest_rim": True})
+
+    assert index.search("rim", where={"dest_rim": True})[0][0] == "rim"
+
+
+def test_hybrid_retriever_fuses_both_rankings(index):
+    vector_docs = [
+        Document(page_content="Samo u vektorima", metadata={}, id="other"),
+        Document(page_content="Grčka", metadata={}, id="grcka"),
+        Document(page_content="Pariz autobusom", metadata={}, id="pariz"),
+    ]
+    retriever = HybridRetriever(vector_store=FakeVectorStore(vector_docs), bm25_index=index, k=3, fetch_k=3)
+
+    results = retriever.invoke("hotel")
+
+    # Chunks found by both searches rank above the top vector hit found by only one
+    assert [doc.id for doc in results] == ["grcka", "pariz", "other"]
+
+
+def test_hybrid_retriever_passes_the_filter_to_both_searches(index):
+    store = FakeVectorStore([])
+    retriever = HybridRetriever(vector_store=store, bm25_index=index, k=2)
+
+    results = retriever.invoke("polazak", filter={"source_name": "rim.pdf"})
+
+    assert store.calls == [{'filter': {"source_name": "rim.pdf"}}]
+    assert [doc.id for doc in results] == ["rim"]
+    assert results[0].page_content.startswith("Polazak za Rim")
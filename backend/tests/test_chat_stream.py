@@ -0,0 +1,90 @@
+import json
+
+import pytest
+
+
+def parse_events(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+
+@pytest.mark.parametrize("pieces", [
+    ['{"content": "Cena je 499 eur", "reserve": false}'],
+    ['{"con', 'tent": "Cena', ' je 499', ' eur"', ', "reserve": false}'],
+    list('{"content": "Cena je 499 eur", "reserve": false}'),
+])
+def test_decoder_yields_content_however_output_is_split(main_module, pieces):
+    decoder = main_module.ContentStreamDecoder()
+
+    text = "".join(decoder.feed(piece) for piece in pieces)
+
+    assert text == "Cena je 499 eur"
+    assert decoder.done and json.loads(decoder.buffer)['reserve'] is False
+
+
+def test_decoder_handles_escapes_split_across_pieces(main_module):
+    decoder = main_module.ContentStreamDecoder()
+    pieces = ['{"content": "<p>Polazak\\', 'n15.07.</p> \\"Leto\\" \\u01', '61ampion', '"}']
+
+    assert "".join(decoder.feed(piece) for piece in pieces) == '<p>Polazak\n15.07.</p> "Leto" šampion'
+
+
+def test_sse_event_format(main_module):
+    assert main_module.sse_event('token', {'text': 'Ćao'}) == 'event: token\ndata: {"text": "Ćao"}\n\n'
+
+
+def test_stream_endpoint_sends_tokens_then_the_full_answer(chat_app):
+    client = chat_app.app.test_client()
+
+    response = client.post('/api/chat/stream', json={'message': 'Koliko košta Barselona?', 'session_id': 'stream-1'})
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    events = parse_events(response.get_data(as_text=True))
+    names = [name for name, _ in events]
+    assert names[0] == 'start' and names[-1] == 'done' and names.count('token') > 1
+    done = events[-1][1]
+    streamed = "".join(data['text'] for name, data in events if name == 'token')
+    assert streamed == done['response']['content']
+    assert '499 eur' in streamed and done['response']['gmail'] == 'info@agencija.rs'
+    assert done['session_id'] == 'stream-1' and done['time_to_first_token'] is not None
+    # Both turns are in the session, like with /api/chat
+    assert [message['role'] for message in chat_app.session_store.get_messages('stream-1')] == ['user', 'assistant']
+
+
+def test_stream_endpoint_rejects_empty_messages(chat_app):
+    response = chat_app.app.test_client().post('/api/chat/stream', json={'message': '  '})
+
+    assert response.status_code == 400 and response.get_json() == {'error': 'Message cannot be empty'}
+
+
+def test_stream_failure_ends_with_an_error_event(chat_app, monkeypatch):
+    def broken(message, history):
+        raise RuntimeError("llm down")
+        yield
+
+    monkeypatch.setattr(chat_app.travel_bot, 'stream_message', broken)
+
+    response = chat_app.app.test_client().post('/api/chat/stream', json={'message': 'Barselona?'})
+
+    name, data = parse_events(response.get_data(as_text=True))[-1]
+    assert name == 'error'
+    assert data['response'] == chat_app.error_response(chat_app.CHAT_SYSTEM_ERROR_MESSAGE)
+
+
+def test_stream_message_returns_the_same_answer_as_process_message(chat_app):
+    bot = chat_app.travel_bot
+    stream = bot.stream_message('Koliko košta Barselona?')
+    pieces = []
+    while True:
+        try:
+            pieces.append(next(stream))
+        except StopIteration as stop:
+            streamed = stop.value
+            break
+
+    assert streamed == bot.process_message('Koliko košta Barselona?')
+    assert "".join(pieces) == streamed['content']
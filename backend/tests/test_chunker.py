@@ -0,0 +1,93 @@
+import pytest
+
+from chunker import StructuredChunker, chunk_id, _blocks, _split_long
+
+PROGRAM = """PROGRAM PUTOVANJA:
+1. Dan (26.04.2025) TRST
+Polazak iz Beograda u 05:30h. Dolazak u Trst u popodnevnim časovima.
+2.Dan (27.04.2025) MONACO
+Doručak. Obilazak kneževine i Monte Karla."""
+
+PRICES = """CENE PO OSOBI:
+Hotel H Top Olympic 3* - Calella
+399 369 eur
+
+Hotel H Top Planamar 3* - Malgrat de Mar
+409 379 eur
+Cena važi uz uplatu do 01.03."""
+
+
+@pytest.mark.parametrize("line, heading", [
+    ("PROGRAM PUTOVANJA:", True), ("ARANŽMAN NE OBUHVATA:", True), ("3. Dan (28.04.2025) COSTA BRAVA", True),
+    ("2.Dan (27.04.2025) Monaco", True), ("Polazak iz Beograda", False), ("Napomena:", False), ("OK", False),
+])
+def test_headings(line, heading):
+    assert (_blocks(line)[0][0] == 'heading') is heading
+
+
+def test_table_rows_stay_together_across_blank_lines():
+    kinds = [(kind, text.count("\n") + 1) for kind, text in _blocks(PRICES)]
+
+    assert kinds == [('heading', 1), ('table', 4), ('text', 1)]
+
+
+def test_small_sections_are_packed_into_one_chunk():
+    chunks = StructuredChunker(max_chars=1000).split_page(PROGRAM + "\n\n" + PRICES)
+
+    assert len(chunks) == 1
+    assert chunks[0]['section'] == "PROGRAM PUTOVANJA:"
+    assert chunks[0]['text'].startswith("PROGRAM PUTOVANJA:") and chunks[0]['text'].endswith("01.03.")
+
+
+def test_chunks_break_at_section_headings():
+    chunks = StructuredChunker(max_chars=len(PROGRAM) + 20).split_page(PROGRAM + "\n\n" + PRICES)
+
+    assert [chunk['section'] for chunk in chunks] == ["PROGRAM PUTOVANJA:", "CENE PO OSOBI:"]
+    assert chunks[1]['text'] == PRICES.replace("\n\n", "\n")
+
+
+def test_long_section_splits_between_paragraphs_and_table_runs():
+    intro = " ".join(f"Hotel je udaljen {n} minuta od plaže." for n in range(1, 5))
+    table = "Hotel H Top Olympic 3* - Calella\n399 369 eur\nHotel H Top Planamar 3* - Malgrat de Mar\n409 379 eur"
+
+    chunks = StructuredChunker(max_chars=160).split_page(f"SMEŠTAJ:\n{intro}\n\n{table}")
+
+    assert [chunk['text'] for chunk in chunks] == [f"SMEŠTAJ:\n{intro}", f"SMEŠTAJ:\n{table}"]
+    assert all(chunk['section'] == "SMEŠTAJ:" for chunk in chunks)
+
+
+def test_long_paragraph_splits_at_sentences_under_a_repeated_heading():
+    paragraph = " ".join(f"Rečenica broj {n} o razgledanju grada." for n in range(20))
+
+    chunks = StructuredChunker(max_chars=200).split_page(f"OPIS PUTOVANJA:\n{paragraph}")
+
+    assert len(chunks) > 1 and all(len(chunk['text']) <= 200 for chunk in chunks)
+    assert all(chunk['text'].startswith("OPIS PUTOVANJA:\nRečenica broj") for chunk in chunks)
+    assert all(chunk['text'].endswith("grada.") for chunk in chunks)
+
+
+def test_split_long_prefers_lines_then_sentences_then_hard_cuts():
+    assert _split_long("prva linija\ndruga linija", 15) == ["prva linija", "druga linija"]
+    assert _split_long("Prva rečenica. Druga rečenica.", 20) == ["Prva rečenica.", "Druga rečenica."]
+    assert _split_long("x" * 25, 10) == ["x" * 10, "x" * 10, "x" * 5]
+
+
+def test_chunks_never_span_pages():
+    chunks = StructuredChunker(max_chars=1000).split_pages([(1, PROGRAM), (2, PRICES), (3, "")])
+
+    assert [(chunk['page'], chunk['position'], chunk['section']) for chunk in chunks] == [
+        (1, 0, "PROGRAM PUTOVANJA:"), (2, 1, "CENE PO OSOBI:")]
+
+
+def test_page_without_heading_has_no_section():
+    assert StructuredChunker().split_page("Samo tekst bez naslova.") == [
+        {'text': "Samo tekst bez naslova.", 'section': None}]
+
+
+def test_chunk_ids_depend_on_page_position_and_text():
+    first = chunk_id("lisabon.pdf", 2, 0, "Cena 899€")
+
+    assert first == chunk_id("lisabon.pdf", 2, 0, "Cena 899€")
+    assert first.startswith("lisabon.pdf:p2:0:")
+    assert len({first, chunk_id("lisabon.pdf", 3, 0, "Cena 899€"), chunk_id("lisabon.pdf", 2, 1, "Cena 899€"),
+                chunk_id("lisabon.pdf", 2, 0, "Cena 999€")}) == 4
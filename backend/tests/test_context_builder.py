@@ -0,0 +1,141 @@
+import json
+
+import pytest
+from langchain_core.documents import Document
+
+from context_builder import TokenCounter, ContextBuilder, HistorySummarizer, message_text
+from session_store import MemorySessionStore
+
+
+def estimating_counter():
+    """Counter on the four-characters-per-token estimate, independent of tiktoken downloads"""
+    counter = TokenCounter("gpt-4o-mini")
+    counter._loaded = True
+    return counter
+
+
+@pytest.fixture
+def builder():
+    return ContextBuilder(estimating_counter(), context_tokens=100, history_tokens=40, min_overlap=10)
+
+
+def test_estimated_counts_and_truncation():
+    counter = estimating_counter()
+
+    assert counter.count("") == 0 and counter.count("abcde") == 2
+    assert counter.truncate("abcdefghij", 2) == "abcdefgh"
+    assert counter.truncate("abc", 0) == ""
+
+
+def test_duplicate_and_contained_chunks_are_dropped(builder):
+    docs = [Document(page_content="Polazak iz Beograda 15.07. autobusom."),
+            Document(page_content="Polazak iz Beograda 15.07. autobusom."),
+            Document(page_content="iz Beograda 15.07."),
+            Document(page_content="Cena 499 eur.")]
+
+    assert builder.pack_documents(docs) == "Polazak iz Beograda 15.07. autobusom.\n\nCena 499 eur."
+    assert builder.stats()['chunks_deduplicated'] == 2
+
+
+def test_splitter_overlap_is_cut_off(builder):
+    first = "Dan 1: Beograd - Budimpesta. Dan 2: Bec i razgledanje grada"
+    second = "Dan 2: Bec i razgledanje grada. Dan 3: Salcburg"
+
+    assert builder.pack_documents([first, second]) == f"{first}\n\n. Dan 3: Salcburg"
+
+
+def test_chunks_beyond_the_budget_are_truncated_or_dropped():
+    builder = ContextBuilder(estimating_counter(), context_tokens=60, min_overlap=10)
+    builder.min_truncated_tokens = 20
+    docs = ["a" * 160, "b" * 200, "c" * 40]
+
+    context = builder.pack_documents(docs)
+
+    assert context == "a" * 160 + "\n\n" + "b" * 80
+    assert builder.stats()['chunks_dropped'] == 1
+
+
+def test_history_keeps_summary_and_the_latest_messages():
+    builder = ContextBuilder(estimating_counter(), context_tokens=100, history_tokens=24)
+    messages = [
+        {'role': 'user', 'content': "Prva poruka o Grckoj", 'seq': 1},
+        {'role': 'assistant', 'content': json.dumps({'content': "<p>Grcka &amp; ostrva</p>"}), 'seq': 2},
+        {'role': 'user', 'content': "A  cena?", 'seq': 3},
+    ]
+
+    history = builder.build_history("Korisnik trazi letovanje", messages)
+
+    assert history.split("\n") == [
+        "Sažetak ranijeg razgovora: Korisnik trazi letovanje",
+        "TurBot: Grcka & ostrva",
+        "Korisnik: A cena?",
+    ]
+    assert builder.stats()['history_messages_dropped'] == 1
+
+
+def test_message_text_keeps_plain_assistant_text():
+    assert message_text({'role': 'assistant', 'content': "nije json"}) == "TurBot: nije json"
+
+
+def test_summarizer_folds_only_aged_messages():
+    store = MemorySessionStore()
+    for n in range(1, 7):
+        store.append('s1', {'role': 'user' if n % 2 else 'assistant', 'content': f"poruka {n}"})
+    calls = []
+
+    def summarize(summary, transcript):
+        calls.append((summary, transcript))
+        return f"sazetak do {transcript.count('poruka')}"
+
+    summarizer = HistorySummarizer(store, summarize, recent_messages=4)
+
+    assert summarizer.summarize('s1')
+    assert calls == [("", "Korisnik: poruka 1\nTurBot: poruka 2")]
+    assert store.get_summary('s1') == ("sazetak do 2", 2)
+    assert not summarizer.summarize('s1')
+
+
+def test_summarizer_waits_for_the_history_budget_and_folds_a_batch():
+    store = MemorySessionStore()
+    calls = []
+    summarizer = HistorySummarizer(store, lambda summary, transcript: calls.append(transcript) or "sazetak",
+                                   recent_messages=2, counter=estimating_counter(), token_budget=60,
+                                   batch_messages=4)
+
+    for n in range(1, 7):
+        store.append('s1', {'role': 'user', 'content': f"poruka {n} " + "x" * 20})
+        assert not summarizer.summarize('s1')
+    assert calls == [] and summarizer.stats()['skipped'] == 4
+
+    store.append('s1', {'role': 'user', 'content': "poruka 7 " + "x" * 20})
+    assert summarizer.summarize('s1')
+    assert len(calls) == 1 and calls[0].count("poruka") == 5
+    assert store.get_summary('s1') == ("sazetak", 5)
+
+
+def test_scheduled_summary_runs_in_the_background():
+    store = MemorySessionStore()
+    for n in range(1, 4):
+        store.append('s1', {'role': 'user', 'content': f"poruka {n}"})
+    summarizer = HistorySummarizer(store, lambda summary, transcript: "kratko", recent_messages=1)
+
+    summarizer.schedule('s1')
+    summarizer._get_executor().submit(lambda: None).result(timeout=5)
+
+    assert store.get_summary('s1') == ("kratko", 2)
+    assert summarizer.stats() == {'summaries': 1, 'skipped': 0, 'errors': 0}
+
+
+def test_session_history_leaves_out_summarized_and_current_messages(main_module, monkeypatch):
+    store = MemorySessionStore()
+    for n in range(1, 6):
+        store.append('s1', {'role': 'user' if n % 2 else 'assistant', 'content': f"poruka {n}"})
+    store.set_summary('s1', "ranije", 2)
+    monkeypatch.setattr(main_module, 'session_store', store)
+
+    history, user_messages = main_module.get_session_history('s1', before_seq=5)
+
+    assert "ranije" in history and "poruka 3" in history and "poruka 4" in history
+    assert "poruka 2" not in history and "poruka 5" not in history
+    # Retrieval is scoped by the user's own words only, never the summary or bot answers
+    assert user_messages == ["poruka 1", "poruka 3"]
@@ -0,0 +1,137 @@
+import threading
+import time
+
+import pytest
+from psycopg2 import extensions
+
+import db_pool
+from db_pool import ConnectionPool, PoolTimeout, pool_from_env
+
+
+@pytest.fixture
+def connections(monkeypatch, fake_connection):
+    opened = []
+
+    def connect(dsn, connect_timeout=None):
+        conn = fake_connection()
+        conn.connect_timeout = connect_timeout
+        opened.append(conn)
+        return conn
+
+    monkeypatch.setattr(db_pool.psycopg2, 'connect', connect)
+    return opened
+
+
+def test_prefills_min_size_and_passes_connect_timeout(connections):
+    pool = ConnectionPool("dsn", min_size=2, max_size=4, connect_timeout=3)
+
+    assert len(connections) == 2
+    assert all(conn.connect_timeout == 3 for conn in connections)
+    assert pool.stats()['idle'] == 2
+
+
+def test_invalid_sizes_are_rejected(connections):
+    with pytest.raises(ValueError):
+        ConnectionPool("dsn", min_size=3, max_size=2)
+
+
+def test_checkout_reuses_the_most_recently_returned_connection(connections):
+    pool = ConnectionPool("dsn", min_size=0, max_size=2)
+
+    first = pool.getconn()
+    second = pool.getconn()
+    pool.putconn(first)
+    pool.putconn(second)
+
+    assert pool.getconn() is second
+    assert pool.stats()['connections_opened'] == 2
+
+
+def test_checkout_times_out_when_pool_is_exhausted(connections):
+    pool = ConnectionPool("dsn", min_size=0, max_size=1)
+    pool.getconn()
+
+    started = time.monotonic()
+    with pytest.raises(PoolTimeout):
+        pool.getconn(timeout=0.05)
+
+    assert time.monotonic() - started >= 0.05
+    assert pool.stats()['timeouts'] == 1
+
+
+def test_waiting_checkout_gets_the_returned_connection(connections):
+    pool = ConnectionPool("dsn", min_size=0, max_size=1)
+    conn = pool.getconn()
+    threading.Timer(0.05, pool.putconn, args=(conn,)).start()
+
+    assert pool.getconn(timeout=2) is conn
+    assert pool.stats()['max_wait_time'] > 0
+
+
+def test_putconn_rolls_back_open_transactions_and_closes_broken_ones(connections):
+    pool = ConnectionPool("dsn", min_size=0, max_size=2)
+    in_transaction, broken = pool.getconn(), pool.getconn()
+    in_transaction.status = extensions.TRANSACTION_STATUS_INERROR
+    broken.status = extensions.TRANSACTION_STATUS_UNKNOWN
+
+    pool.putconn(in_transaction)
+    pool.putconn(broken)
+
+    assert in_transaction.rollbacks == 1 and not in_transaction.closed
+    assert broken.closed
+    assert pool.stats()['idle'] == 1
+
+
+def test_idle_connections_above_min_size_are_reaped(connections):
+    pool = ConnectionPool("dsn", min_size=1, max_size=3, idle_timeout=0.01)
+    held = [pool.getconn(), pool.getconn(), pool.getconn()]
+    for conn in held:
+        pool.putconn(conn)
+    time.sleep(0.02)
+
+    pool.putconn(pool.getconn())
+
+    stats = pool.stats()
+    assert stats['idle'] == 1
+    assert stats['connections_closed'] == 2
+
+
+def test_stale_connection_failing_health_check_is_replaced(connections):
+    pool = ConnectionPool("dsn", min_size=1, max_size=1, health_check_after=0)
+    stale = connections[0]
+    stale.fail_queries = True
+
+    conn = pool.getconn()
+
+    assert conn is not stale and stale.closed
+    assert pool.stats()['failed_health_checks'] == 1
+
+
+def test_connection_context_discards_closed_connection_on_error(connections):
+    pool = ConnectionPool("dsn", min_size=0, max_size=1)
+
+    with pytest.raises(RuntimeError):
+        with pool.connection() as conn:
+            conn.closed = 2
+            raise RuntimeError("connection lost")
+
+    assert pool.stats()['in_use'] == 0 and pool.stats()['idle'] == 0
+
+
+def test_closeall_refuses_checkouts(connections):
+    pool = ConnectionPool("dsn", min_size=1, max_size=1)
+    pool.closeall()
+
+    assert connections[0].closed
+    with pytest.raises(PoolTimeout):
+        pool.getconn()
+
+
+def test_pool_from_env_reads_settings(connections, monkeypatch):
+    monkeypatch.setenv("DB_POOL_MIN", "0")
+    monkeypatch.setenv("DB_POOL_MAX", "7")
+    monkeypatch.setenv("DB_CONNECT_TIMEOUT", "2")
+
+    pool = pool_from_env("dsn")
+
+    assert (pool.min_size, pool.max_size, pool.connect_timeout) == (0, 7, 2)
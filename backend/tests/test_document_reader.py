@@ -0,0 +1,111 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from document_reader import iter_document_pages, read_file_content, DocumentReadError
+
+
+def write_pdf(path, pages):
+    """Minimal PDF with one line of Helvetica text per page"""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    body, offsets = b"%PDF-1.4\n", []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(body))
+        body += f"{number} 0 obj\n{obj}\nendobj\n".encode('latin-1')
+    xref = len(body)
+    body += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode('latin-1')
+    body += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode('latin-1')
+    body += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode('latin-1')
+    path.write_bytes(body)
+    return str(path)
+
+
+PAGES = [f"Strana {n} putovanje hotel" for n in range(1, 8)]
+
+
+def test_pdf_pages_are_yielded_lazily_in_order(tmp_path):
+    path = write_pdf(tmp_path / "katalog.pdf", PAGES)
+
+    pages = iter_document_pages(path)
+    first = next(pages)
+
+    assert first[0] == 1 and "Strana 1" in first[1]
+    assert [number for number, _ in pages] == list(range(2, 8))
+
+
+def test_parallel_parsing_keeps_page_order(tmp_path):
+    path = write_pdf(tmp_path / "katalog.pdf", PAGES)
+
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        pages = list(iter_document_pages(path, executor=executor, pages_per_task=2))
+
+    assert [number for number, _ in pages] == list(range(1, 8))
+    assert [text.strip() for _, text in pages] == PAGES
+    assert read_file_content(path).split("\n") == [text for _, text in pages]
+
+
+def test_text_file_is_one_page(tmp_path):
+    path = tmp_path / "ponuda.txt"
+    path.write_text("Leto u Grčkoj\nPolazak 15.07.", encoding='utf-8')
+
+    assert list(iter_document_pages(str(path))) == [(1, "Leto u Grčkoj\nPolazak 15.07.")]
+
+
+def test_unreadable_pdf_raises(tmp_path):
+    path = tmp_path / "broken.pdf"
+    path.write_bytes(b"not a pdf")
+
+    with pytest.raises(DocumentReadError):
+        list(iter_document_pages(str(path)))
+    assert read_file_content(str(path)) == ""
+
+
+def test_travel_validation_accumulates_keywords_across_pages(main_module):
+    found = set()
+
+    assert not main_module.validate_travel_content("Dobrodošli na putovanje", found=found)
+    assert not main_module.validate_travel_content("Hotel na obali", found=found)
+    assert main_module.validate_travel_content("Polazak iz Beograda", found=found)
+    assert {"putovanje", "hotel", "polazak"} <= found
+
+
+def test_pages_read_before_validation_are_embedded_too(main_module, vector_store, tmp_path):
+    path = write_pdf(tmp_path / "20250601_101500_leto.pdf", ["Uvod", "Putovanje u Grcku", "Hotel uz more, polazak avionom"])
+
+    result, package = main_module._run_pipeline(path, "20250601_101500_leto.pdf", "hash", None)
+
+    assert result['added_to_vector_store'] and package['raw_content'].startswith("Uvod")
+    pages = sorted(metadata['page'] for metadata in vector_store.get(where={"source_name": "leto.pdf"})["metadatas"])
+    assert pages == [1, 2, 3]
+
+
+def test_document_failing_part_way_keeps_the_stored_version(main_module, vector_store, tmp_path, monkeypatch):
+    filename = "20250601_101500_leto.pdf"
+    stored = write_pdf(tmp_path / "20250101_080000_leto.pdf", ["Putovanje u Grcku", "Hotel uz more, polazak avionom"])
+    main_module._run_pipeline(stored, "20250101_080000_leto.pdf", "old", None)
+    before = set(vector_store.get(where={"source_name": "leto.pdf"}, include=[])["ids"])
+
+    def truncated(file_path):
+        # Long enough for a batch of chunks to be embedded before the failure
+        yield 1, "Putovanje u Spaniju, hotel na plazi, polazak autobusom.\n" * 200
+        raise DocumentReadError("page 2 is damaged")
+
+    monkeypatch.setattr(main_module, 'stream_document_pages', truncated)
+    path = tmp_path / filename
+    path.write_bytes(b"%PDF-1.4")
+
+    result, package = main_module._run_pipeline(str(path), filename, "new", "20250101_080000_leto.pdf")
+
+    assert package is None and result['error'] == 'Could not read file content'
+    assert set(vector_store.get(where={"source_name": "leto.pdf"}, include=[])["ids"]) == before
+    assert not path.exists()
@@ -0,0 +1,79 @@
+import time
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from embedding_cache import EmbeddingCache, CachedEmbeddings
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(text)), 0.5] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return EmbeddingCache(str(tmp_path / "cache" / "embeddings.db"))
+
+
+def test_vectors_round_trip_per_model(cache):
+    cache.put_many("model-a", ["leto u grckoj"], [[0.25, -1.5]])
+
+    assert cache.get_many("model-a", ["leto u grckoj", "zima"]) == [[0.25, -1.5], None]
+    assert cache.get_many("model-b", ["leto u grckoj"]) == [None]
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 2
+
+
+def test_entries_survive_reopening(tmp_path):
+    path = str(tmp_path / "embeddings.db")
+    EmbeddingCache(path).put_many("model", ["a", "b"], [[1.0], [2.0]])
+
+    reopened = EmbeddingCache(path)
+
+    assert reopened.stats()['entries'] == 2
+    assert reopened.get_many("model", ["b"]) == [[2.0]]
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "embeddings.db"), max_entries=4, evict_to=0.5)
+    cache.put_many("model", ["a", "b", "c", "d"], [[1.0]] * 4)
+    time.sleep(0.01)
+    cache.get_many("model", ["a"])
+
+    cache.put_many("model", ["e"], [[5.0]])
+
+    assert cache.stats()['entries'] == 2
+    assert cache.stats()['evictions'] == 3
+    assert cache.get_many("model", ["a", "e", "b"]) == [[1.0], [5.0], None]
+
+
+def test_only_distinct_misses_reach_the_model(cache):
+    model = CountingEmbeddings()
+    embeddings = CachedEmbeddings(model, cache, "local")
+
+    first = embeddings.embed_documents(["a", "bb", "a"])
+    second = embeddings.embed_documents(["bb", "ccc"])
+
+    assert model.calls == [["a", "bb"], ["ccc"]]
+    assert first == [[1.0, 0.5], [2.0, 0.5], [1.0, 0.5]]
+    assert second == [[2.0, 0.5], [3.0, 0.5]]
+    assert embeddings.embed_query("a") == [1.0, 0.5] and len(model.calls) == 2
+
+
+def test_cache_errors_fall_back_to_the_model(cache, monkeypatch):
+    model = CountingEmbeddings()
+    embeddings = CachedEmbeddings(model, cache, "local")
+
+    def broken(*args):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(cache, 'get_many', broken)
+
+    assert embeddings.embed_documents(["a"]) == [[1.0, 0.5]]
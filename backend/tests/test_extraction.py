@@ -0,0 +1,177 @@
+import json
+
+import pytest
+from langchain_core.runnables import RunnableLambda
+
+from extraction import (ExtractionCache, StructuredExtractor, split_sections, parse_json_answer,
+                        is_transient, merge_packages)
+from local_models import LocalTravelChatModel
+
+LOCAL_MODEL = LocalTravelChatModel(latency=0, jitter=0, token_delay=0)
+
+
+class APITimeoutError(Exception):
+    pass
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class ScriptedModel:
+    """Chat model stand-in: answers like the local model after raising the queued errors"""
+
+    def __init__(self, errors=(), structured_errors=None):
+        self.errors = list(errors)
+        self.structured_errors = None if structured_errors is None else list(structured_errors)
+        self.requests = []
+
+    def _answer(self, errors, prompt_value):
+        self.requests.append(prompt_value.to_messages()[-1].content)
+        if errors:
+            raise errors.pop(0)
+        return LOCAL_MODEL.invoke(prompt_value).content
+
+    def as_runnable(self):
+        plain = RunnableLambda(lambda value: self._answer(self.errors, value))
+        if self.structured_errors is not None:
+            plain.with_structured_output = lambda *args, **kwargs: RunnableLambda(
+                lambda value: json.loads(self._answer(self.structured_errors, value)))
+        return plain
+
+
+def document(name, departures):
+    return f"Putovanje {name}\n" + "\n".join(f"Polazak {day}.07.2025. cena {100 + day} eur" for day in departures)
+
+
+def test_short_documents_stay_one_section():
+    assert split_sections("  Kratak tekst  ", 100) == ["Kratak tekst"]
+    assert split_sections("   ", 100) == []
+
+
+def test_sections_split_on_paragraphs_then_lines():
+    paragraphs = "\n\n".join(f"Paragraf {n} " + "x" * 30 for n in range(4))
+    lines = "\n".join("y" * 30 for _ in range(4))
+
+    sections = split_sections(paragraphs + "\n\n" + lines, 90)
+
+    assert all(len(section) <= 90 for section in sections)
+    assert sections[0].startswith("Paragraf 0") and "Paragraf 1" in sections[0]
+    # The long paragraph is cut after a line, not inside one
+    assert sections[-2:] == ["y" * 30 + "\n" + "y" * 30] * 2
+    assert split_sections("z" * 250, 100) == ["z" * 100, "z" * 100, "z" * 50]
+
+
+def test_json_answers_are_read_from_fences_and_prose():
+    assert parse_json_answer('Evo:\n```json\n{"sections": []}\n```') == {"sections": []}
+    with pytest.raises(ValueError):
+        parse_json_answer("Nema podataka")
+
+
+@pytest.mark.parametrize("error, transient", [
+    (StatusError(429), True), (StatusError(503), True), (StatusError(400), False),
+    (TimeoutError(), True), (ConnectionError(), True), (APITimeoutError(), True), (ValueError("schema"), False),
+])
+def test_transient_errors(error, transient):
+    assert is_transient(error) is transient
+
+
+def test_section_results_merge_into_one_package():
+    merged = merge_packages([
+        {"title": "Grčka", "destinations": ["Krf"], "hotels": [{"name": "Hotel Sol"}],
+         "dates": [{"departure_date": "10.06.", "return_date": "20.06.", "price_regular": None}]},
+        {"title": "Druga strana", "duration_days": 10, "destinations": ["krf ", "Lefkada"],
+         "hotels": [{"name": "hotel  sol"}, {"name": None}],
+         "dates": [{"departure_date": "10.06.", "return_date": "20.06.", "price_regular": 450},
+                   {"departure_date": None, "return_date": None, "price_regular": 1}],
+         "additional_costs": {"single_room_supplement": 120}},
+    ])
+
+    assert merged["title"] == "Grčka" and merged["duration_days"] == 10
+    assert merged["destinations"] == ["Krf", "Lefkada"]
+    assert merged["hotels"] == [{"name": "Hotel Sol"}]
+    assert merged["dates"] == [{"departure_date": "10.06.", "return_date": "20.06.", "price_regular": 450}]
+    assert merged["additional_costs"] == {"single_room_supplement": 120}
+
+
+def test_cache_is_keyed_by_model_and_text(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "cache.db"))
+    cache.put_many("gpt-4o-mini", ["tekst"], [{"title": "Krf"}])
+
+    assert cache.get_many("gpt-4o-mini", ["tekst", "drugi tekst"]) == [{"title": "Krf"}, None]
+    assert cache.get_many("gpt-4o", ["tekst"]) == [None]
+    # Entries survive a restart
+    assert ExtractionCache(str(tmp_path / "cache.db")).get_many("gpt-4o-mini", ["tekst"]) == [{"title": "Krf"}]
+    assert cache.stats() == {'entries': 1, 'hits': 1, 'misses': 2, 'hit_rate': 0.3333}
+
+
+def test_cache_evicts_least_recently_used_entries(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "cache.db"), max_entries=4, evict_to=0.5)
+    cache.put_many("m", ["a", "b", "c", "d"], [{"n": n} for n in range(4)])
+    cache.get_many("m", ["a"])
+
+    cache.put_many("m", ["e"], [{"n": 4}])
+
+    assert cache.get_many("m", ["a", "b", "c", "d", "e"]) == [{"n": 0}, None, None, None, {"n": 4}]
+    assert cache.stats()['entries'] == 2
+
+
+def test_sections_of_many_documents_share_requests():
+    model = ScriptedModel()
+    extractor = StructuredExtractor(model.as_runnable(), "local", section_chars=60, batch_sections=4, retry_delay=0)
+    documents = [(f"doc{n}", document(f"broj {n}", [n + 1])) for n in range(6)]
+
+    extracted = extractor.extract_many(documents)
+
+    assert len(model.requests) == 2
+    assert extracted["doc2"]["title"] == "Putovanje broj 2"
+    assert extracted["doc2"]["dates"][0]["price_regular"] == 103.0
+    assert extractor.stats()['structured_output'] is False
+
+
+def test_cached_sections_are_not_requested_again(tmp_path):
+    model = ScriptedModel()
+    cache = ExtractionCache(str(tmp_path / "cache.db"))
+    extractor = StructuredExtractor(model.as_runnable(), "local", cache=cache, retry_delay=0)
+    content = document("Krf", [1, 2])
+
+    first = extractor.extract(content)
+    second = extractor.extract(content)
+
+    assert first == second and len(model.requests) == 1
+    assert extractor.stats()['cache']['hits'] == 1
+
+
+def test_transient_errors_are_retried():
+    model = ScriptedModel(errors=[APITimeoutError("timeout")])
+    extractor = StructuredExtractor(model.as_runnable(), "local", retries=2, retry_delay=0)
+
+    assert extractor.extract(document("Krf", [1]))["title"] == "Putovanje Krf"
+    assert len(model.requests) == 2 and extractor.stats()['retries'] == 1
+
+
+def test_document_is_empty_when_retries_run_out():
+    model = ScriptedModel(errors=[StatusError(503)] * 3)
+    extractor = StructuredExtractor(model.as_runnable(), "local", retries=2, retry_delay=0)
+
+    assert extractor.extract(document("Krf", [1])) == {}
+    assert extractor.stats()['failed_requests'] == 1 and len(model.requests) == 3
+
+
+def test_rejected_schema_falls_back_to_the_plain_prompt():
+    model = ScriptedModel(structured_errors=[ValueError("schema not supported")])
+    extractor = StructuredExtractor(model.as_runnable(), "local", retry_delay=0)
+
+    assert extractor.extract(document("Krf", [1]))["title"] == "Putovanje Krf"
+    stats = extractor.stats()
+    assert stats['structured_output'] is True and stats['structured_fallbacks'] == 1
+
+
+def test_structured_answers_are_used_directly():
+    model = ScriptedModel(structured_errors=[])
+    extractor = StructuredExtractor(model.as_runnable(), "local", retry_delay=0)
+
+    assert extractor.extract(document("Krf", [1]))["dates"][0]["departure_date"] == "1.07.2025."
+    assert extractor.stats()['structured_fallbacks'] == 0
@@ -0,0 +1,143 @@
+import time
+
+import pytest
+
+from health import HealthMonitor
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not met in time"
+        time.sleep(0.01)
+
+
+class FlakyCheck:
+    def __init__(self):
+        self.calls = 0
+        self.healthy = True
+
+    def __call__(self):
+        self.calls += 1
+        if not self.healthy:
+            raise ConnectionError("connection refused")
+
+
+@pytest.fixture
+def monitor():
+    check = FlakyCheck()
+    monitor = HealthMonitor(interval=60)
+    monitor.add_check("database", check)
+    monitor.add_check("llm", lambda: None)
+    monitor.start()
+    wait_until(lambda: check.calls == 1 and monitor.snapshot()['llm']['ok'] is not None)
+    return monitor, check
+
+
+def test_first_round_runs_when_the_monitor_starts(monitor):
+    monitor, check = monitor
+
+    database = monitor.snapshot()['database']
+
+    assert database['ok'] is True and database['error'] is None
+    assert database['latency_ms'] is not None and database['checked_at'] is not None
+
+
+def test_failures_are_counted_until_the_check_recovers(monitor):
+    monitor, check = monitor
+    check.healthy = False
+
+    monitor.run_checks()
+    monitor.run_checks()
+    failed = monitor.snapshot()['database']
+    check.healthy = True
+    monitor.run_checks()
+
+    assert failed['ok'] is False and failed['error'] == "connection refused"
+    assert failed['consecutive_failures'] == 2
+    assert monitor.snapshot()['database']['consecutive_failures'] == 0
+
+
+def test_reading_results_does_not_run_checks(monitor):
+    monitor, check = monitor
+
+    for _ in range(10):
+        monitor.snapshot()
+
+    assert check.calls == 1
+
+
+def test_refresh_runs_a_round_now(monitor):
+    monitor, check = monitor
+
+    monitor.refresh()
+
+    wait_until(lambda: check.calls == 2)
+
+
+def test_gauges_are_read_with_the_checks(monitor):
+    monitor, check = monitor
+    reads = []
+    monitor.add_gauge("sessions", lambda: reads.append(1) or {'sessions': len(reads)})
+
+    assert monitor.value("sessions") is None
+    monitor.run_checks()
+    for _ in range(5):
+        assert monitor.value("sessions") == {'sessions': 1}
+
+    assert len(reads) == 1
+
+
+def test_failing_gauge_reads_as_none(monitor):
+    monitor, check = monitor
+    monitor.add_gauge("sessions", lambda: 1 / 0)
+
+    monitor.run_checks()
+
+    assert monitor.value("sessions") is None
+
+
+def test_stats_are_flat_numbers(monitor):
+    monitor, check = monitor
+    check.healthy = False
+    monitor.run_checks()
+
+    stats = monitor.stats()
+
+    assert stats['database_up'] == 0 and stats['llm_up'] == 1
+    assert set(stats) == {'database_up', 'database_latency_ms', 'llm_up', 'llm_latency_ms'}
+
+
+def test_health_endpoint_serves_the_last_results(main_module, monitor, monkeypatch):
+    monitor, check = monitor
+    monkeypatch.setattr(main_module, 'health_monitor', monitor)
+    client = main_module.app.test_client()
+
+    for _ in range(5):
+        status = client.get('/health').get_json()
+
+    assert check.calls == 1
+    assert status['database_available'] is True and status['checks']['database']['ok'] is True
+
+
+def test_sessions_are_counted_by_the_monitor(main_module, monitor, monkeypatch):
+    monitor, check = monitor
+    counts = []
+
+    class CountingStore:
+        def stats(self):
+            counts.append(1)
+            return {'backend': 'sqlite', 'sessions': 3}
+
+    monkeypatch.setattr(main_module, 'session_store', CountingStore())
+    monkeypatch.setattr(main_module, 'health_monitor', monitor)
+    monitor.add_gauge('sessions', lambda: main_module.session_store.stats())
+    monitor.run_checks()
+    client = main_module.app.test_client()
+
+    for _ in range(3):
+        status = client.get('/health').get_json()
+        client.get('/metrics')
+
+    assert status['sessions'] == {'backend': 'sqlite', 'sessions': 3}
+    assert len(counts) == 1
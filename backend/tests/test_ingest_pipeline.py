@@ -0,0 +1,118 @@
+import threading
+import time
+
+import pytest
+
+TRAVEL_TEXT = "Putovanje u Grčku: hotel uz plažu, polazak autobusom iz Beograda. Cena {n} eur."
+
+
+@pytest.fixture
+def ingest(main_module, tmp_path, monkeypatch):
+    """Pipeline without a database or LLM: extraction and the batch save are recorded"""
+    calls = {'saved': [], 'extracted': []}
+    monkeypatch.setattr(main_module, 'vector_store', None)
+    monkeypatch.setattr(main_module, 'bm25_index', None)
+    monkeypatch.setattr(main_module, 'find_existing_document', lambda content_hash, source_name: (None, None))
+
+    def extract(documents):
+        calls['extracted'].append([filename for filename, _ in documents])
+        return {filename: {'title': filename} for filename, _ in documents}
+
+    def save(packages):
+        calls['saved'].append([package['filename'] for package in packages])
+        return [package['filename'] for package in packages]
+
+    monkeypatch.setattr(main_module, 'extract_many_structured_data', extract)
+    monkeypatch.setattr(main_module, 'save_packages_to_database', save)
+    return calls
+
+
+def upload(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text, encoding='utf-8')
+    return {'filename': name, 'file_path': str(path)}
+
+
+def test_batch_results_keep_input_order_and_are_saved_together(main_module, ingest, tmp_path):
+    items = [upload(tmp_path, f"{n}.txt", TRAVEL_TEXT.format(n=n)) for n in range(5)]
+    items.insert(2, {'filename': 'bad.exe', 'error': 'File type not allowed'})
+
+    results = main_module.process_documents(items)
+
+    assert [result['filename'] for result in results] == [item['filename'] for item in items]
+    assert results[2] == {'filename': 'bad.exe', 'error': 'File type not allowed'}
+    assert all(result['saved_to_database'] for result in results if 'error' not in result)
+    # One extraction batch and one transaction for the whole upload
+    assert len(ingest['extracted']) == 1 and len(ingest['saved']) == 1
+    assert sorted(ingest['saved'][0]) == [f"{n}.txt" for n in range(5)]
+    assert results[0]['structured_data'] == {'title': '0.txt'}
+
+
+def test_non_travel_document_is_rejected_and_removed(main_module, ingest, tmp_path):
+    item = upload(tmp_path, "invoice.txt", "Racun za struju, mesec oktobar.")
+
+    result, = main_module.process_documents([item])
+
+    assert result['error'] == 'Document does not appear to be travel/tourism related'
+    assert not (tmp_path / "invoice.txt").exists()
+    assert ingest['saved'] == []
+
+
+def test_failed_ingestion_removes_the_upload(main_module, ingest, tmp_path, monkeypatch):
+    def unavailable(content_hash, source_name):
+        raise ConnectionError("database is down")
+
+    monkeypatch.setattr(main_module, 'find_existing_document', unavailable)
+    item = upload(tmp_path, "leto.txt", TRAVEL_TEXT.format(n=1))
+
+    with pytest.raises(ConnectionError):
+        main_module.process_document(item['file_path'], item['filename'])
+    result, = main_module.process_documents([upload(tmp_path, "zima.txt", TRAVEL_TEXT.format(n=2))])
+
+    assert result == {'filename': "zima.txt", 'error': 'Processing failed'}
+    assert not (tmp_path / "leto.txt").exists() and not (tmp_path / "zima.txt").exists()
+
+
+def test_failed_batch_save_removes_the_uploads(main_module, ingest, tmp_path, monkeypatch):
+    def save(packages):
+        raise ConnectionError("database is down")
+
+    monkeypatch.setattr(main_module, 'save_packages_to_database', save)
+    items = [upload(tmp_path, f"{n}.txt", TRAVEL_TEXT.format(n=n)) for n in range(2)]
+
+    with pytest.raises(ConnectionError):
+        main_module.process_documents(items)
+
+    assert not any((tmp_path / f"{n}.txt").exists() for n in range(2))
+    assert not main_module.inflight_hashes
+
+
+def test_identical_files_in_one_batch_are_ingested_once(main_module, ingest, tmp_path):
+    items = [upload(tmp_path, f"copy{n}.txt", TRAVEL_TEXT.format(n=1)) for n in range(3)]
+
+    results = main_module.process_documents(items)
+
+    assert sum(bool(result.get('duplicate')) for result in results) == 2
+    assert len(ingest['saved'][0]) == 1
+    assert not main_module.inflight_hashes
+
+
+def test_database_stage_is_bounded_by_its_concurrency_limit(main_module, ingest, tmp_path, monkeypatch):
+    lock = threading.Lock()
+    active = {'now': 0, 'peak': 0}
+
+    def slow_lookup(content_hash, source_name):
+        with lock:
+            active['now'] += 1
+            active['peak'] = max(active['peak'], active['now'])
+        time.sleep(0.05)
+        with lock:
+            active['now'] -= 1
+        return None, None
+
+    monkeypatch.setattr(main_module, 'find_existing_document', slow_lookup)
+    items = [upload(tmp_path, f"{n}.txt", TRAVEL_TEXT.format(n=n)) for n in range(main_module.INGEST_DB_CONCURRENCY + 3)]
+
+    main_module.process_documents(items)
+
+    assert 1 < active['peak'] <= main_module.INGEST_DB_CONCURRENCY
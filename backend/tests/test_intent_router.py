@@ -0,0 +1,135 @@
+from contextlib import contextmanager
+
+import pytest
+
+from intent_router import IntentRouter
+
+PACKAGES = [{
+    'title': "Lisabon & Portugalija",
+    'destinations': ["Lisabon", "Portugalija"],
+    'duration_days': 8,
+    'duration_nights': 7,
+    'transport_type': "avion",
+    'dates': [
+        {'departure_date': "10.05.2025", 'return_date': "17.05.2025", 'price_regular': 899, 'price_discounted': 849},
+        {'departure_date': "14.06.2025", 'return_date': "21.06.2025", 'price_regular': 949, 'price_discounted': None},
+    ],
+    'prices': {'single_room_supplement': 250},
+    'hotels': [{'name': "Hotel Roma", 'category': "4*", 'location': "Lisabon"}],
+}]
+
+
+@pytest.fixture
+def database(fake_connection):
+    def respond(sql, params):
+        if "jsonb_array_elements_text" in sql:
+            return [(name,) for name in database.destinations]
+        return database.packages
+
+    database = fake_connection(respond)
+    database.destinations = ["Lisabon", "Portugalija", "Sveta Gora", "Rim"]
+    database.packages = PACKAGES
+    return database
+
+
+@pytest.fixture
+def router(database):
+    return IntentRouter(database.connection, version_fn=lambda: "v1")
+
+
+@pytest.mark.parametrize("message, intents, destinations", [
+    ("Koliko košta Lisabon?", ['price'], ["Lisabon"]),
+    ("Kada su polasci za Portugaliju i koliko traje?", ['dates', 'duration'], ["Portugalija"]),
+    ("Koji hotel je u Lisabonu?", ['hotel'], ["Lisabon"]),
+    ("cena sveta gora", ['price'], ["Sveta Gora"]),
+])
+def test_detect(router, message, intents, destinations):
+    detected = router.detect(message)
+
+    if destinations:
+        assert detected == {'intents': intents, 'destinations': destinations}
+    else:
+        assert detected is None
+
+
+@pytest.mark.parametrize("message, destinations", [
+    ("Šta ima u Rimu?", ["Rim"]),
+    ("Letovanje u Riminiju", []),
+    ("Putovanje u Portugaliju", ["Portugalija"]),
+])
+def test_destinations_match_whole_inflected_words(router, message, destinations):
+    assert router.match_destinations(message) == destinations
+
+
+@pytest.mark.parametrize("message", [
+    "Želim da rezervišem Lisabon",
+    "Preporuči mi nešto za Lisabon",
+    "Pričaj mi o Lisabonu",
+    "Koliko košta Pariz?",
+])
+def test_messages_for_the_assistant_are_not_routed(router, message):
+    assert router.route(message) is None
+
+
+def test_price_question_is_answered_from_the_catalog(router):
+    response = router.route("Koliko košta Lisabon?")
+
+    assert response['reserve'] is False and response['gmail'] == ""
+    content = response['content']
+    assert "<h3>Lisabon &amp; Portugalija</h3>" in content
+    assert "10.05.2025 – 17.05.2025 – cena: 899 EUR, sa popustom: 849 EUR" in content
+    assert "Doplata za jednokrevetnu sobu: 250 EUR" in content
+    assert "Hotel Roma" not in content
+    assert router.stats() == {'structured': 1, 'rag': 0, 'no_data': 0}
+
+
+def test_duration_and_hotel_questions(router):
+    content = router.route("Koliko traje put u Lisabon i koji je hotel?")['content']
+
+    assert "Trajanje: 8 dana, 7 noćenja (avion)" in content
+    assert "<li>Hotel Roma 4* Lisabon</li>" in content
+    assert "cena" not in content
+
+
+def test_missing_fields_fall_back_to_rag(database, router):
+    database.packages = [{'title': "Lisabon", 'destinations': ["Lisabon"], 'hotels': []}]
+
+    assert router.route("Koji hotel je u Lisabonu?") is None
+    assert router.stats() == {'structured': 0, 'rag': 0, 'no_data': 1}
+
+
+def test_destinations_are_loaded_once_per_catalog_version(database):
+    version = ["v1"]
+    router = IntentRouter(database.connection, version_fn=lambda: version[0])
+
+    router.match_destinations("Lisabon")
+    router.match_destinations("Rim")
+    assert sum("jsonb_array_elements_text" in query for query in database.queries) == 1
+
+    database.destinations.append("Pariz")
+    version[0] = "v2"
+    assert router.match_destinations("Pariz u maju") == ["Pariz"]
+
+
+def test_database_outage_is_retried_after_the_interval(database, monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr('intent_router.time.monotonic', lambda: now[0])
+    down, attempts = [True], []
+
+    @contextmanager
+    def connection():
+        if down[0]:
+            attempts.append(now[0])
+            yield None
+            return
+        yield database
+
+    router = IntentRouter(connection, retry_interval=30)
+
+    for _ in range(5):
+        assert router.route("Koliko košta Lisabon?") is None
+    assert attempts == [100.0]
+
+    down[0] = False
+    now[0] += 31
+    assert router.match_destinations("Lisabon") == ["Lisabon"]
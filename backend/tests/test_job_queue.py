@@ -0,0 +1,125 @@
+import threading
+import time
+
+import pytest
+
+from job_queue import JobQueue, JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED, JOB_FAILED
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs" / "jobs.db"), workers=2, poll_interval=0.01)
+    yield queue
+    queue.stop()
+
+
+def test_submit_requires_a_registered_handler(queue):
+    with pytest.raises(ValueError):
+        queue.submit("ingest", {})
+
+
+def test_run_next_claims_jobs_in_submission_order(queue):
+    seen = []
+    queue.register("ingest", lambda payload: seen.append(payload['n']) or {'n': payload['n']})
+    first = queue.submit("ingest", {'n': 1})
+    second = queue.submit("ingest", {'n': 2})
+
+    assert queue.get(first)['status'] == JOB_QUEUED
+    assert queue.run_next() and queue.run_next()
+    assert not queue.run_next()
+
+    assert seen == [1, 2]
+    job = queue.get(second)
+    assert job['status'] == JOB_SUCCEEDED
+    assert job['result'] == {'n': 2}
+    assert job['attempts'] == 1
+    assert job['started_at'] and job['finished_at']
+
+
+def test_failing_handler_marks_job_failed(queue):
+    def handler(payload):
+        raise RuntimeError("unreadable pdf")
+
+    queue.register("ingest", handler)
+    job_id = queue.submit("ingest", {})
+    queue.run_next()
+
+    job = queue.get(job_id)
+    assert job['status'] == JOB_FAILED
+    assert job['error'] == "unreadable pdf"
+    assert queue.counts() == {JOB_FAILED: 1}
+
+
+def test_unknown_job_id_returns_none(queue):
+    assert queue.get("missing") is None
+
+
+def test_job_is_claimed_only_once_across_queues(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    queues = [JobQueue(path) for _ in range(4)]
+    lock = threading.Lock()
+    runs = []
+
+    for queue in queues:
+        def handler(payload, queue=queue):
+            with lock:
+                runs.append(payload['n'])
+        queue.register("ingest", handler)
+    for n in range(20):
+        queues[0].submit("ingest", {'n': n})
+
+    def drain(queue):
+        while queue.run_next():
+            pass
+
+    threads = [threading.Thread(target=drain, args=(queue,)) for queue in queues]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(runs) == list(range(20))
+
+
+def test_requeue_stale_puts_back_only_old_running_jobs(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"), stale_after=60)
+    queue.register("ingest", lambda payload: None)
+    stale, fresh = queue.submit("ingest", {}), queue.submit("ingest", {})
+    queue._claim()
+    queue._claim()
+
+    conn = queue._connect()
+    conn.execute("UPDATE jobs SET started_at = ? WHERE id = ?", (time.time() - 120, stale))
+    conn.close()
+
+    assert queue.requeue_stale() == 1
+    assert queue.get(stale)['status'] == JOB_QUEUED
+    assert queue.get(fresh)['status'] == JOB_RUNNING
+
+    queue.run_next()
+    assert queue.get(stale)['attempts'] == 2
+
+
+def test_prune_deletes_only_old_finished_jobs(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"), keep_finished=60)
+    queue.register("ingest", lambda payload: None)
+    old, recent, waiting = (queue.submit("ingest", {}) for _ in range(3))
+    queue.run_next()
+    queue.run_next()
+
+    conn = queue._connect()
+    conn.execute("UPDATE jobs SET finished_at = ? WHERE id = ?", (time.time() - 120, old))
+    conn.close()
+
+    assert queue.prune() == 1
+    assert queue.get(old) is None
+    assert queue.get(recent)['status'] == JOB_SUCCEEDED and queue.get(waiting)['status'] == JOB_QUEUED
+
+
+def test_started_workers_run_submitted_jobs(queue):
+    done = threading.Event()
+    queue.register("ingest", lambda payload: done.set())
+    queue.start()
+    queue.submit("ingest", {})
+
+    assert done.wait(2)
@@ -0,0 +1,76 @@
+import unicodedata
+
+import pytest
+
+from keyword_matcher import KeywordMatcher, fold, SCAN_CHUNK_CHARS
+
+
+def nfkd_fold(text):
+    """The decomposition every caller used before fold() was shared"""
+    text = unicodedata.normalize('NFKD', text.lower().replace('đ', 'dj').replace('Đ', 'dj'))
+    return ''.join(char for char in text if not unicodedata.combining(char))
+
+
+@pytest.mark.parametrize("text", [
+    "Smeštaj u hotelu", "ČAČAK", "Đurđevdan", "Ćevapi i ŽELJA", "café in Nürnberg", "Šibenik – Côte d'Azur",
+    "Směštaj", "plain ascii 123", "",
+])
+def test_fold_matches_the_nfkd_fold(text):
+    assert fold(text) == nfkd_fold(text)
+
+
+def test_fold_spells_dj_out():
+    assert fold("Đerdap") == "djerdap"
+
+
+def test_matching_ignores_case_and_diacritics():
+    matcher = KeywordMatcher(["Smeštaj", "cena", "rani booking"])
+
+    assert matcher.matches("SMESTAJ u hotelu, Cena na upit, rani\n booking") == {"Smeštaj", "cena", "rani booking"}
+
+
+def test_keywords_are_found_inside_longer_words():
+    matcher = KeywordMatcher(["tura", "avantura"])
+
+    assert matcher.matches("Avantura na moru") == {"tura", "avantura"}
+    assert matcher.search("Avantura na moru") == "avantura"
+    assert matcher.matches("Kultura i istorija") == {"tura"}
+
+
+def test_longest_keyword_wins_at_a_position():
+    matcher = KeywordMatcher(["hotel", "hotel 4*"])
+
+    assert matcher.search("Hotel 4* pored plaže") == "hotel 4*"
+
+
+def test_search_returns_none_without_keywords():
+    assert KeywordMatcher(["cena"]).search("Nema ničega") is None
+
+
+def test_limit_stops_after_enough_keywords():
+    matcher = KeywordMatcher(["polazak", "cena", "hotel"])
+
+    assert len(matcher.matches("polazak, cena i hotel", limit=2)) == 2
+
+
+def test_found_carries_keywords_across_pages():
+    matcher = KeywordMatcher(["polazak", "cena", "hotel"])
+    found = matcher.matches("Polazak iz Beograda")
+
+    result = matcher.matches("Cena 499 eur", limit=2, found=found)
+
+    assert result is found and found == {"polazak", "cena"}
+    assert matcher.matches("hotel", limit=2, found=found) == {"polazak", "cena"}
+
+
+def test_keyword_on_a_slice_border_is_found():
+    matcher = KeywordMatcher(["doručak"])
+    text = "x" * (SCAN_CHUNK_CHARS - 3) + "DORUČAK" + "y" * 100
+
+    assert matcher.matches(text) == {"doručak"}
+
+
+def test_duplicate_spellings_count_once():
+    matcher = KeywordMatcher(["smeštaj", "smestaj", "Smeštaj"])
+
+    assert len(matcher) == 1 and matcher.matches("smestaj") == {"smeštaj"}
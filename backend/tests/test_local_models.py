@@ -0,0 +1,77 @@
+import json
+import asyncio
+
+import numpy as np
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from local_models import HashEmbeddings, LocalTravelChatModel
+
+
+def test_hash_embeddings_are_deterministic_and_normalized():
+    embeddings = HashEmbeddings(size=64)
+
+    first, second = embeddings.embed_documents(["Letovanje u Grčkoj", "Letovanje u Grčkoj"])
+
+    assert first == second == embeddings.embed_query("Letovanje u Grčkoj")
+    assert len(first) == 64 and abs(np.linalg.norm(first) - 1) < 1e-6
+    assert asyncio.run(embeddings.aembed_query("Letovanje u Grčkoj")) == first
+
+
+def test_hash_embeddings_bring_shared_words_closer():
+    embeddings = HashEmbeddings(size=256)
+    query, related, unrelated = embeddings.embed_documents(
+        ["hotel na Krfu", "hotel na Krfu sa bazenom", "skijanje na Kopaoniku u januaru"])
+
+    assert np.dot(query, related) > np.dot(query, unrelated)
+
+
+def test_text_without_tokens_still_has_a_unit_vector():
+    vector = HashEmbeddings(size=8).embed_query("!!!")
+
+    assert vector == [1.0] + [0.0] * 7
+
+
+def test_chat_answer_quotes_the_context():
+    model = LocalTravelChatModel(latency=0, jitter=0, token_delay=0)
+    prompt = ("Dostupni kontekst:\nLeto u Barseloni. Cena 499 eur. Kontakt: info@agencija.rs\n"
+              "Istorija razgovora:\n")
+
+    answer = json.loads(model.invoke([SystemMessage(content=prompt), HumanMessage(content="Želim rezervaciju")]).content)
+
+    assert answer['reserve'] is True and answer['gmail'] == 'info@agencija.rs'
+    assert "Odgovor na: Želim rezervaciju" in answer['content'] and "499 eur" in answer['content']
+
+
+def test_streamed_answer_matches_the_full_answer():
+    model = LocalTravelChatModel(latency=0, jitter=0, token_delay=0, chunk_chars=5)
+    messages = [HumanMessage(content="Gde putujemo?")]
+
+    chunks = [chunk.content for chunk in model.stream(messages)]
+
+    assert len(chunks) > 1 and all(len(chunk) <= 5 for chunk in chunks)
+    assert "".join(chunks) == model.invoke(messages).content
+
+
+def test_extraction_answer_has_a_package_per_section():
+    model = LocalTravelChatModel(latency=0, jitter=0, token_delay=0)
+    request = ("### Deo 1\nLetovanje Krf\nPolasci 10.06.2025. i 20.06.2025.\nCena 1.250 eur\n"
+               "### Deo 2\nZimovanje Bansko\n")
+
+    answer = json.loads(model.invoke([
+        SystemMessage(content="Analiziraj sledeće delove turističkih dokumenata"),
+        HumanMessage(content=request),
+    ]).content)
+
+    first, second = answer['sections']
+    assert first['id'] == '1' and first['package']['title'] == 'Letovanje Krf'
+    assert [date['departure_date'] for date in first['package']['dates']] == ['10.06.2025.', '20.06.2025.']
+    assert first['package']['dates'][0]['price_regular'] == 1250.0
+    assert first['package']['dates'][1]['price_regular'] is None
+    assert second['id'] == '2' and second['package']['dates'] == []
+
+
+def test_latency_is_repeatable_per_prompt():
+    model = LocalTravelChatModel(latency=0.5, jitter=0.2)
+
+    assert model._delay("isti upit") == model._delay("isti upit")
+    assert 0.3 <= model._delay("drugi upit") <= 0.7
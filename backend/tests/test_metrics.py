@@ -0,0 +1,134 @@
+import uuid
+import logging
+import threading
+
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+
+from metrics import (Registry, Counter, Histogram, LLMMetricsCallback, LLM_SECONDS, LLM_TOKENS, LLM_ERRORS,
+                     TraceIdFilter, current_trace_id, new_trace_id, trace)
+
+
+def test_counter_values_per_label_set():
+    counter = Counter("requests_total", "Requests", ("result",))
+
+    counter.inc(result="hit")
+    counter.inc(2, result="hit")
+    counter.inc(result="miss")
+
+    assert counter.value(result="hit") == 3 and counter.value(result="other") == 0
+    with pytest.raises(ValueError):
+        counter.inc(kind="hit")
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("latency_seconds", "Latency", ("stage",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, stage="llm")
+
+    assert histogram.render() == [
+        "# HELP latency_seconds Latency",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{stage="llm",le="0.1"} 2',
+        'latency_seconds_bucket{stage="llm",le="1"} 3',
+        'latency_seconds_bucket{stage="llm",le="+Inf"} 4',
+        'latency_seconds_sum{stage="llm"} 3.65',
+        'latency_seconds_count{stage="llm"} 4',
+    ]
+
+
+def test_histogram_times_failing_blocks_too():
+    histogram = Histogram("block_seconds", "Blocks")
+
+    with pytest.raises(RuntimeError):
+        with histogram.time():
+            raise RuntimeError("boom")
+
+    assert histogram.count() == 1
+
+
+def test_concurrent_increments_are_not_lost():
+    counter = Counter("hits_total", "Hits")
+
+    def work():
+        for _ in range(1000):
+            counter.inc()
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert counter.value() == 8000
+
+
+def test_registry_exports_numeric_collector_values_as_gauges():
+    registry = Registry()
+    registry.counter("turbot_test_total", "Test", ("label",)).inc(label='a"b')
+    registry.add_collector("turbot_cache", "Cache stats", lambda: {'hit-rate': 0.5, 'size': 3, 'enabled': True, 'name': 'x'})
+    registry.add_collector("turbot_broken", "Broken", lambda: 1 / 0)
+
+    text = registry.render()
+
+    assert 'turbot_test_total{label="a\\"b"} 1\n' in text
+    assert "# TYPE turbot_cache_hit_rate gauge\nturbot_cache_hit_rate 0.5\n" in text
+    assert "turbot_cache_size 3\n" in text
+    assert "enabled" not in text and "turbot_cache_name" not in text and "turbot_broken" not in text
+
+
+def test_trace_ids_accept_only_well_formed_incoming_ids():
+    assert new_trace_id("req-42.a_b") == "req-42.a_b" == current_trace_id()
+    generated = new_trace_id("bad id\nwith newline")
+    assert len(generated) == 16 and generated != "bad id\nwith newline"
+
+
+def test_trace_block_restores_the_previous_id():
+    new_trace_id("outer")
+
+    with trace("inner") as trace_id:
+        assert trace_id == current_trace_id() == "inner"
+
+    assert current_trace_id() == "outer"
+
+
+def test_log_records_carry_the_trace_id():
+    record = logging.LogRecord("test", logging.INFO, __file__, 1, "message", None, None)
+
+    with trace("log-trace"):
+        TraceIdFilter().filter(record)
+
+    assert record.trace_id == "log-trace"
+
+
+def test_llm_callback_records_latency_tokens_and_errors():
+    purpose = f"test_{uuid.uuid4().hex[:8]}"
+    callback = LLMMetricsCallback(purpose)
+    message = AIMessage(content="ok", usage_metadata={'input_tokens': 7, 'output_tokens': 3, 'total_tokens': 10})
+
+    run_id = uuid.uuid4()
+    callback.on_chat_model_start({}, [], run_id=run_id)
+    callback.on_llm_end(LLMResult(generations=[[ChatGeneration(message=message)]]), run_id=run_id)
+    failed = uuid.uuid4()
+    callback.on_llm_start({}, [], run_id=failed)
+    callback.on_llm_error(RuntimeError("timeout"), run_id=failed)
+
+    assert LLM_SECONDS.count(purpose=purpose) == 1
+    assert LLM_TOKENS.value(purpose=purpose, kind="prompt") == 7
+    assert LLM_TOKENS.value(purpose=purpose, kind="completion") == 3
+    assert LLM_ERRORS.value(purpose=purpose) == 1
+
+
+def test_provider_token_usage_takes_precedence():
+    response = LLMResult(generations=[[]], llm_output={'token_usage': {'prompt_tokens': 11, 'completion_tokens': 4}})
+
+    assert LLMMetricsCallback._usage(response) == (11, 4)
+
+
+def test_metrics_endpoint_serves_the_registry(main_module):
+    response = main_module.app.test_client().get('/metrics', headers={'X-Request-ID': 'scrape-1'})
+
+    assert response.status_code == 200
+    assert response.headers['X-Request-ID'] == 'scrape-1'
+    assert "# TYPE turbot_http_request_seconds histogram" in response.get_data(as_text=True)
@@ -0,0 +1,179 @@
+from datetime import datetime, date, timedelta
+
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from package_catalog import (
+    parse_price, departure_month, parse_date, date_rows, search_columns,
+    encode_cursor, decode_cursor, CatalogQuery, CatalogQueryError, CatalogCache,
+)
+
+
+@pytest.mark.parametrize("value, amount", [
+    (999, 999.0), ("1.299 EUR", 1299.0), ("849,50€", 849.5), ("1 050 eur", 1050.0),
+    ("od 499", 499.0), (0, None), ("na upit", None), (True, None), (None, None),
+])
+def test_parse_price(value, amount):
+    assert parse_price(value) == amount
+
+
+@pytest.mark.parametrize("value, month, day", [
+    ("29.04.2025", 4, date(2025, 4, 29)),
+    ("2025-07-15", 7, date(2025, 7, 15)),
+    ("3. septembar 2025", 9, date(2025, 9, 3)),
+    ("15.08.", 8, None),
+    ("tokom avgusta", 8, None),
+    ("31.02.2025", 2, None),
+    ("uskoro", None, None),
+])
+def test_departure_dates(value, month, day):
+    assert departure_month(value) == month
+    assert parse_date(value) == day
+
+
+def test_search_columns_and_date_rows():
+    dates = [
+        {'departure_date': "10.05.2025", 'return_date': "17.05.2025", 'price_regular': "899 EUR", 'price_discounted': 849},
+        {'departure_date': "14.06.2025", 'price_regular': 949},
+        "nije termin",
+    ]
+
+    assert search_columns(dates) == {'price_min': 849.0, 'price_max': 949.0, 'departure_months': [5, 6]}
+    rows = date_rows(dates)
+    assert [row['position'] for row in rows] == [0, 1]
+    assert rows[0]['departure_date'] == date(2025, 5, 10) and rows[0]['price_regular'] == 899.0
+    assert rows[1]['return_date'] is None and rows[1]['return_text'] is None
+    assert search_columns(None) == {'price_min': None, 'price_max': None, 'departure_months': []}
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2025, 6, 1, 10, 15, 30, 123456)
+
+    assert decode_cursor(encode_cursor(created_at, 42)) == (created_at, 42)
+    with pytest.raises(CatalogQueryError):
+        decode_cursor("not-a-cursor")
+
+
+def test_query_parses_filters():
+    query = CatalogQuery(MultiDict([
+        ('destination', "Lisabon"), ('destination', "Rim"), ('transport_type', "Avion"),
+        ('duration_min', "5"), ('price_max', "999.5"), ('month', "maj,6"), ('month', "jul"),
+        ('fields', "id, title"),
+    ]))
+
+    assert query.destinations == ["Lisabon", "Rim"]
+    assert (query.duration_min, query.price_max, query.months) == (5, 999.5, [5, 6, 7])
+    assert query.fields == ["id", "title"]
+    sql, params = query.count_sql()
+    assert "destinations @> %s::jsonb OR destinations @> %s::jsonb" in sql
+    assert "lower(transport_type) = lower(%s)" in sql and "departure_months && %s::smallint[]" in sql
+    assert params == ['["Lisabon"]', '["Rim"]', "Avion", 5, 999.5, [5, 6, 7]]
+
+
+@pytest.mark.parametrize("args", [
+    {'duration': "pet"}, {'price_min': "jeftino"}, {'month': "13"}, {'month': "smarch"},
+    {'fields': "id,password"}, {'cursor': "xyz"},
+])
+def test_invalid_queries_are_rejected(args):
+    with pytest.raises(CatalogQueryError):
+        CatalogQuery(MultiDict(args))
+
+
+def test_without_limit_or_cursor_every_package_is_returned():
+    query = CatalogQuery(MultiDict(), default_limit=2)
+    rows = [{'id': n, 'created_at': datetime(2025, 1, n), **{field: None for field in query.fields if field != 'id'}}
+            for n in range(5, 0, -1)]
+
+    sql, params = query.page_sql()
+    packages, next_cursor = query.page(rows)
+
+    assert not query.paginated and "LIMIT" not in sql and params == []
+    assert len(packages) == 5 and next_cursor is None
+
+
+def test_limit_pages_with_a_cursor():
+    query = CatalogQuery(MultiDict({'limit': "2", 'fields': "id"}), max_limit=10)
+    rows = [{'id': n, 'created_at': datetime(2025, 1, n)} for n in (5, 4, 3)]
+
+    sql, params = query.page_sql()
+    packages, next_cursor = query.page(rows)
+
+    assert query.paginated and sql.rstrip().endswith("LIMIT %s") and params == [3]
+    assert packages == [{'id': 5}, {'id': 4}]
+    assert decode_cursor(next_cursor) == (datetime(2025, 1, 4), 4)
+
+    following = CatalogQuery(MultiDict({'cursor': next_cursor}), default_limit=7)
+    sql, params = following.page_sql()
+    assert following.limit == 7 and "(created_at, id) < (%s, %s)" in sql
+    assert params == [datetime(2025, 1, 4), 4, 8]
+
+
+def test_limit_is_capped():
+    assert CatalogQuery(MultiDict({'limit': "5000"}), max_limit=200).limit == 200
+
+
+def test_catalog_cache_is_emptied_by_a_new_version():
+    cache = CatalogCache(max_entries=1)
+    cache.put("v1", "a", b"A")
+    assert cache.get("v1", "a") == b"A"
+
+    cache.put("v1", "b", b"B")
+    assert cache.get("v1", "a") is None
+
+    assert cache.get("v2", "b") is None
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 2
+    assert CatalogCache.etag("v1", "a") != CatalogCache.etag("v2", "a")
+
+
+@pytest.fixture
+def catalog(chat_app, fake_connection, monkeypatch, tmp_path):
+    from response_cache import DocumentSetVersion
+
+    rows = [{'id': n, 'title': f"Paket {n}", 'created_at': datetime(2025, 1, 1) + timedelta(hours=n)}
+            for n in range(60, 0, -1)]
+
+    def respond(sql, params):
+        if sql.startswith("SELECT COUNT(*)"):
+            return [{'count': len(rows)}]
+        found = rows
+        if "(created_at, id) <" in sql:
+            after = tuple(params[-3:-1])
+            found = [row for row in found if (row['created_at'], row['id']) < after]
+        return found[:params[-1]] if "LIMIT" in sql else found
+
+    database = fake_connection(respond)
+    monkeypatch.setattr(chat_app, 'get_db_connection', database.connection)
+    monkeypatch.setattr(chat_app, 'catalog_cache', CatalogCache())
+    monkeypatch.setattr(chat_app, 'catalog_version', DocumentSetVersion(str(tmp_path / ".catalog_version")))
+    return database
+
+
+def test_endpoint_returns_everything_unless_a_page_is_asked_for(chat_app, catalog):
+    client = chat_app.app.test_client()
+
+    everything = client.get('/api/travel-packages?fields=id,title').get_json()
+    page = client.get('/api/travel-packages?fields=id&limit=25').get_json()
+
+    assert len(everything['packages']) == everything['total'] == 60 and everything['next_cursor'] is None
+    assert len(page['packages']) == 25 and page['total'] == 60 and page['next_cursor']
+    rest = client.get(f"/api/travel-packages?fields=id&limit=50&cursor={page['next_cursor']}").get_json()
+    assert rest['packages'][0] == {'id': 35}
+
+
+def test_endpoint_revalidates_with_etags(chat_app, catalog):
+    client = chat_app.app.test_client()
+
+    first = client.get('/api/travel-packages?fields=id')
+    again = client.get('/api/travel-packages?fields=id', headers={'If-None-Match': first.headers['ETag']})
+    assert first.status_code == 200 and again.status_code == 304
+    assert len(catalog.queries) == 1
+
+    chat_app.catalog_version.bump()
+    changed = client.get('/api/travel-packages?fields=id', headers={'If-None-Match': first.headers['ETag']})
+    assert changed.status_code == 200 and len(catalog.queries) == 2
+
+
+def test_endpoint_rejects_bad_filters(chat_app, catalog):
+    response = chat_app.app.test_client().get('/api/travel-packages?month=13')
+
+    assert response.status_code == 400 and response.get_json() == {'error': "Invalid month: 13"}
@@ -0,0 +1,97 @@
+import pytest
+
+PAGES = [
+    "PROGRAM PUTOVANJA:\n1. dan Beograd - Barselona, polazak autobusom u 06:00.",
+    "2. dan Barselona, razgledanje grada i slobodno vreme na plaži.",
+    "CENA ARANŽMANA:\nHotel Olympic 3* - Calella\n499 479 eur",
+]
+
+
+def sync_document(main, filename, pages):
+    sync = main.VectorStoreSync(filename)
+    for number, text in enumerate(pages, start=1):
+        sync.feed(text, page=number)
+    sync.finish()
+    return sync
+
+
+def stored_ids(store, source_name):
+    return set(store.get(where={"source_name": source_name}, include=[])["ids"])
+
+
+def test_source_name_drops_the_upload_timestamp(main_module):
+    assert main_module.get_source_name("20250601_101500_leto.pdf") == "leto.pdf"
+    assert main_module.get_source_name("leto.pdf") == "leto.pdf"
+
+
+def test_file_hash_depends_only_on_content(main_module, tmp_path):
+    first, second = tmp_path / "a.txt", tmp_path / "b.txt"
+    first.write_text("isti sadrzaj")
+    second.write_text("isti sadrzaj")
+
+    assert main_module.compute_file_hash(str(first)) == main_module.compute_file_hash(str(second))
+
+
+def test_identical_document_is_not_processed_again(main_module, tmp_path, monkeypatch):
+    path = tmp_path / "20250601_101500_leto.txt"
+    path.write_text("Putovanje, hotel, plaža")
+    monkeypatch.setattr(main_module, 'find_existing_document',
+                        lambda content_hash, source_name: ("20250101_080000_leto.txt", None))
+    monkeypatch.setattr(main_module, '_run_pipeline', lambda *args: pytest.fail("pipeline ran for a duplicate"))
+
+    result = main_module.process_document(str(path), path.name)
+
+    assert result['duplicate'] and result['filename'] == "20250101_080000_leto.txt"
+    assert not path.exists()
+
+
+def test_new_version_replaces_the_previous_file(main_module, tmp_path, monkeypatch):
+    uploads = tmp_path / "uploads"
+    uploads.mkdir()
+    monkeypatch.setitem(main_module.app.config, 'UPLOAD_FOLDER', str(uploads))
+    previous = uploads / "20250101_080000_leto.txt"
+    previous.write_text("stara verzija")
+    path = uploads / "20250601_101500_leto.txt"
+    path.write_text("Putovanje u Grčku, hotel uz plažu, polazak avionom.")
+
+    monkeypatch.setattr(main_module, 'vector_store', None)
+    monkeypatch.setattr(main_module, 'find_existing_document', lambda content_hash, source_name: (None, previous.name))
+    monkeypatch.setattr(main_module, 'extract_many_structured_data',
+                        lambda documents: {filename: {} for filename, _ in documents})
+    saved = []
+    monkeypatch.setattr(main_module, 'save_packages_to_database',
+                        lambda packages: saved.extend(packages) or [package['filename'] for package in packages])
+
+    result = main_module.process_document(str(path), path.name)
+
+    assert result['replaced'] == previous.name and result['saved_to_database']
+    assert saved[0]['replaces'] == previous.name
+    assert not previous.exists() and path.exists()
+
+
+def test_reupload_reembeds_only_changed_chunks(main_module, vector_store):
+    first = sync_document(main_module, "20250101_080000_leto.pdf", PAGES)
+    original_ids = stored_ids(vector_store, "leto.pdf")
+    assert first.added == len(original_ids) and first.kept == 0
+
+    changed = PAGES[:2] + ["CENA ARANŽMANA:\nHotel Olympic 3* - Calella\n529 509 eur"]
+    second = sync_document(main_module, "20250601_101500_leto.pdf", changed)
+
+    new_ids = stored_ids(vector_store, "leto.pdf")
+    assert second.kept > 0 and second.added > 0
+    assert second.removed == len(original_ids - new_ids) > 0
+    assert second.kept + second.added == len(new_ids)
+    # Kept chunks now point at the new upload
+    sources = {metadata["source"] for metadata in vector_store.get(where={"source_name": "leto.pdf"})["metadatas"]}
+    assert sources == {"20250601_101500_leto.pdf"}
+    # The keyword index holds exactly the chunks of the vector store
+    assert {doc_id for doc_id in new_ids if main_module.bm25_index.get_document(doc_id)} == new_ids
+    assert all(main_module.bm25_index.get_document(doc_id) is None for doc_id in original_ids - new_ids)
+
+
+def test_unchanged_reupload_adds_nothing(main_module, vector_store):
+    sync_document(main_module, "20250101_080000_leto.pdf", PAGES)
+
+    again = sync_document(main_module, "20250601_101500_leto.pdf", PAGES)
+
+    assert again.added == 0 and again.removed == 0 and again.kept > 0
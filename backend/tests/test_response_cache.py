@@ -0,0 +1,93 @@
+import os
+
+import pytest
+
+import response_cache
+from response_cache import normalize_message, ResponseCache, DocumentSetVersion
+
+VECTORS = {
+    "koliko kosta grcka": [1.0, 0.0, 0.0],
+    "kolika je cena za grcku": [0.96, 0.28, 0.0],
+    "kada je polazak za spaniju": [0.0, 0.0, 1.0],
+}
+
+
+def embed(message):
+    return VECTORS[normalize_message(message)]
+
+
+@pytest.mark.parametrize("message, normalized", [
+    ("Koliko košta Grčka?", "koliko kosta grcka"),
+    ("  KOLIKO   kosta\tgrcka!!! ", "koliko kosta grcka"),
+    ("Đurđevdan, u Novom Sadu.", "djurdjevdan u novom sadu"),
+    ("?!", ""),
+])
+def test_normalize_message(message, normalized):
+    assert normalize_message(message) == normalized
+
+
+def test_exact_match_ignores_case_diacritics_and_punctuation():
+    cache = ResponseCache()
+    cache.store("Koliko košta Grčka?", "v1", {'content': "Od 499 eur"})
+
+    response, match, _ = cache.lookup("koliko kosta grcka", "v1")
+
+    assert response == {'content': "Od 499 eur"} and match == 'exact'
+
+
+def test_semantic_match_above_the_threshold():
+    cache = ResponseCache(similarity_threshold=0.9, embed_fn=embed)
+    cache.store("Koliko košta Grčka?", "v1", {'content': "Od 499 eur"}, embedding=cache._embed("Koliko košta Grčka?"))
+
+    similar, match, _ = cache.lookup("Kolika je cena za Grčku?", "v1")
+    different, _, vector = cache.lookup("Kada je polazak za Španiju?", "v1")
+
+    assert match == 'semantic' and similar == {'content': "Od 499 eur"}
+    assert different is None and vector is not None
+    assert cache.stats()['semantic_hits'] == 1 and cache.stats()['misses'] == 1
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, 'time', lambda: now[0])
+    cache = ResponseCache(ttl=60)
+    cache.store("Koliko kosta Grcka", "v1", {'content': "Od 499 eur"})
+
+    now[0] += 59
+    assert cache.lookup("Koliko kosta Grcka", "v1")[0] is not None
+    now[0] += 2
+    assert cache.lookup("Koliko kosta Grcka", "v1")[0] is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_new_document_set_version_invalidates_entries():
+    cache = ResponseCache()
+    cache.store("Koliko kosta Grcka", "v1", {'content': "Od 499 eur"})
+
+    assert cache.lookup("Koliko kosta Grcka", "v2")[0] is None
+    assert cache.stats()['invalidations'] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResponseCache(max_entries=2)
+    cache.store("prvo pitanje", "v1", {'content': "1"})
+    cache.store("drugo pitanje", "v1", {'content': "2"})
+    cache.lookup("prvo pitanje", "v1")
+    cache.store("trece pitanje", "v1", {'content': "3"})
+
+    assert cache.lookup("drugo pitanje", "v1")[0] is None
+    assert cache.lookup("prvo pitanje", "v1")[0] == {'content': "1"}
+    assert cache.stats()['evictions'] == 1
+
+
+def test_document_set_version_is_shared_through_the_file(tmp_path):
+    path = str(tmp_path / "state" / ".docset_version")
+    writer, reader = DocumentSetVersion(path), DocumentSetVersion(path)
+    before = reader.current()
+
+    bumped = writer.bump()
+    # A new mtime is what tells the reader to re-read the file
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1))
+
+    assert before and bumped != before
+    assert reader.current() == bumped
@@ -0,0 +1,165 @@
+import pytest
+from langchain_core.documents import Document
+
+from bm25_index import matches_where
+from keyword_matcher import fold
+from retrieval_scope import RetrievalScope, months, transports, scope_metadata
+
+DESTINATIONS = {"lisabon": "Lisabon", "pariz": "Pariz", "kostabrava": "Costa Brava"}
+
+
+def known_destinations(text):
+    folded = fold(text).replace(" ", "")
+    return [name for key, name in DESTINATIONS.items() if key in folded]
+
+
+class RecordingRetriever:
+    """Retriever stand-in answering only the filters it was given documents for"""
+
+    def __init__(self, answers=None):
+        self.answers = answers or {}
+        self.filters = []
+
+    def invoke(self, message, config=None, filter=None):
+        self.filters.append(filter)
+        return self.answers.get(repr(filter), [])
+
+
+LISBON, JULY, PLANE = {'dest_lisabon': True}, {'month_7': True}, {'transport_avion': True}
+
+
+@pytest.mark.parametrize("where, matched", [
+    ({'dest_lisabon': True}, True),
+    ({'dest_pariz': True}, False),
+    ({'source_name': {'$eq': 'lisabon.pdf'}}, True),
+    ({'source_name': {'$in': ['pariz.pdf', 'lisabon.pdf']}}, True),
+    ({'$and': [{'dest_lisabon': True}, {'month_7': True}]}, True),
+    ({'$and': [{'dest_lisabon': True}, {'month_8': True}]}, False),
+    ({'$or': [{'month_8': True}, {'month_7': True}]}, True),
+    ({'$or': [{'month_8': True}, {'month_9': True}]}, False),
+])
+def test_matches_where(where, matched):
+    metadata = {'source_name': 'lisabon.pdf', 'dest_lisabon': True, 'month_7': True}
+
+    assert matches_where(metadata, where) is matched
+
+
+def test_months_from_names_and_dates():
+    assert months("Polasci u julu i 15. septembra, ili 03.08.2025.") == [7, 8, 9]
+    assert months("Majka i junak, 1/1 soba za 499 eur") == []
+
+
+def test_transports_from_values_and_questions():
+    assert transports("avion i autobus") == ["avion", "autobus"]
+    assert transports("Idemo li vozom ili brodom?") == ["voz", "brod"]
+    assert transports(None) == []
+
+
+def test_scope_metadata_flags_destinations_months_and_transport():
+    package = {'destinations': ["Lisabon", "Costa Brava", 7], 'transport_type': "Avion",
+               'dates': [{'departure_date': "29.04.2025"}, {'departure_date': "05.07.2025"}]}
+
+    assert scope_metadata(package) == {'dest_lisabon': True, 'dest_costa_brava': True,
+                                       'month_4': True, 'month_7': True, 'transport_avion': True}
+    assert scope_metadata({}) == {}
+
+
+def test_filters_relax_month_then_transport_keeping_the_destination():
+    scope = RetrievalScope(known_destinations)
+
+    assert scope.filters("Lisabon avionom u julu?") == [
+        {'$and': [LISBON, JULY, PLANE]},
+        {'$and': [LISBON, PLANE]},
+        LISBON,
+    ]
+
+
+def test_filters_without_a_destination_end_with_the_transport():
+    scope = RetrievalScope(known_destinations)
+
+    assert scope.filters("Nešto u julu ili avgustu autobusom") == [
+        {'$and': [{'$or': [JULY, {'month_8': True}]}, {'transport_autobus': True}]},
+        {'transport_autobus': True},
+    ]
+
+
+def test_missing_parts_come_from_the_latest_user_message():
+    scope = RetrievalScope(known_destinations)
+    earlier = ["Šta imate za Pariz?", "A Lisabon avionom?"]
+
+    assert scope.filters("A u julu?", earlier)[0] == {'$and': [LISBON, JULY, PLANE]}
+    assert scope.stats()['from_history'] == 1
+
+
+def test_message_naming_nothing_is_not_scoped():
+    scope = RetrievalScope(known_destinations)
+
+    assert scope.filters("Koja je cena?") == []
+    assert scope.stats() == {'queries': 1, 'scoped': 0, 'from_history': 0, 'relaxed': 0, 'fallback': 0,
+                             'scoped_rate': 0.0}
+
+
+def test_retrieve_uses_the_strictest_filter_that_finds_documents():
+    scope = RetrievalScope(known_destinations)
+    documents = [Document(page_content="Lisabon avionom")]
+    retriever = RecordingRetriever({repr({'$and': [LISBON, PLANE]}): documents})
+
+    assert scope.retrieve(retriever, "Lisabon avionom u julu?") == documents
+    assert retriever.filters == [{'$and': [LISBON, JULY, PLANE]}, {'$and': [LISBON, PLANE]}]
+    assert scope.stats()['relaxed'] == 1
+
+
+def test_retrieve_falls_back_to_an_unfiltered_search():
+    scope = RetrievalScope(known_destinations)
+    documents = [Document(page_content="Pariz")]
+    retriever = RecordingRetriever({repr(None): documents})
+
+    assert scope.retrieve(retriever, "Lisabon?") == documents
+    assert retriever.filters == [LISBON, None]
+    assert scope.stats()['fallback'] == 1
+
+
+def test_scope_errors_do_not_break_retrieval():
+    def broken(text):
+        raise RuntimeError("catalog unavailable")
+
+    retriever = RecordingRetriever({repr(None): [Document(page_content="x")]})
+
+    assert len(RetrievalScope(broken).retrieve(retriever, "Lisabon?")) == 1
+    assert retriever.filters == [None]
+
+
+def test_tagging_puts_flags_on_chroma_and_bm25_chunks(main_module, vector_store):
+    texts = {"lisabon-1": "Lisabon, polazak 29.04.", "lisabon-2": "Porto, hotel 4*", "pariz-1": "Pariz u avgustu"}
+    metadatas = [{"source_name": "lisabon.pdf"}, {"source_name": "lisabon.pdf"}, {"source_name": "pariz.pdf"}]
+    vector_store.add_texts(list(texts.values()), metadatas=metadatas, ids=list(texts))
+    with main_module.bm25_index.transaction() as index:
+        for (doc_id, text), metadata in zip(texts.items(), metadatas):
+            index.add(doc_id, text, metadata)
+
+    main_module.tag_document_chunks("20250622_105529_lisabon.pdf", {
+        'destinations': ["Lisabon"], 'transport_type': "avion", 'dates': [{'departure_date': "29.04.2025"}]})
+    # A new version of the document without the plane drops its flag
+    main_module.tag_document_chunks("lisabon.pdf", {
+        'destinations': ["Lisabon"], 'transport_type': "autobus", 'dates': [{'departure_date': "29.04.2025"}]})
+
+    expected = {"source_name": "lisabon.pdf", 'dest_lisabon': True, 'month_4': True, 'transport_autobus': True}
+    stored = vector_store.get(ids=["lisabon-1", "lisabon-2", "pariz-1"], include=["metadatas"])
+    assert dict(zip(stored['ids'], stored['metadatas'])) == {
+        "lisabon-1": expected, "lisabon-2": expected, "pariz-1": {"source_name": "pariz.pdf"}}
+    assert main_module.bm25_index.get_document("lisabon-2").metadata == expected
+    found = main_module.bm25_index.search("polazak hotel pariz", where=LISBON)
+    assert sorted(doc_id for doc_id, _ in found) == ["lisabon-1", "lisabon-2"]
+
+
+def test_scoped_hybrid_retrieval_returns_only_the_named_trip(main_module, vector_store):
+    texts = {"lisabon-1": "Polazak avionom, hotel u centru", "pariz-1": "Polazak avionom, hotel u centru grada"}
+    vector_store.add_texts(list(texts.values()), metadatas=[LISBON, {'dest_pariz': True}], ids=list(texts))
+    with main_module.bm25_index.transaction() as index:
+        index.add("lisabon-1", texts["lisabon-1"], LISBON)
+        index.add("pariz-1", texts["pariz-1"], {'dest_pariz': True})
+    retriever = main_module.HybridRetriever(vector_store=vector_store, bm25_index=main_module.bm25_index, k=4, fetch_k=4)
+
+    documents = RetrievalScope(known_destinations).retrieve(retriever, "Hotel u Lisabonu avionom?")
+
+    assert [document.page_content for document in documents] == [texts["lisabon-1"]]
@@ -0,0 +1,125 @@
+from rule_extraction import RuleExtractor, combine
+
+PRICE_LIST = """Cenovnik 2 važi od 14.02.2025
+
+MONAKO – BARSELONA
+SA POSETOM TRSTU
+5 DANA/4 NOĆENJA AUTOBUSOM
+26.04 – 30.04.2025.
+
+Posetite Trst, grad u kome se spajaju neoklasicizam, secesija i barokni stil. Prođite Azurnom obalom, obiđite stazu Formule 1 u Monaku i poznate kockarnice u Monte Karlu. Doživite neponovljivu Barselonu sa remek-delima Gaudija.
+
+PROGRAM PUTOVANJA:
+1. Dan (26.04.2025) TRST
+Polazak iz Beograda u 05:30h.
+2.Dan (27.04.2025) MONACO
+Doručak. Obilazak kneževine.
+3.Dan (28.04.2025) COSTA BRAVA
+Smeštaj u hotel.
+4.Dan (29.04.2025) P ADOVA
+Razgledanje.
+5.Dan (30.04.2025) BEOGRAD
+Dolazak u Beograd.
+
+HOTEL H TOP OLYMPIC 3* – Calella
+399 369 eur
+HOTEL H TOP PLANAMAR 3* – Malgrat de Mar
+409 379 eur
+
+ARANŽMAN OBUHVATA:
+• Prevoz turističkim autobusom
+• Smeštaj u hotelu sa 3* u 1/2 sobama,
+na bazi polupansiona
+• Usluge vodiča
+ARANŽMAN NE OBUHVATA:
+• Fakultativne izlete
+• Zdravstveno osiguranje
+NAPOMENA: Doplata za 1/1 sobu 140 eur.
+"""
+
+
+def test_price_list_fields_are_read_by_the_rules():
+    data = RuleExtractor().extract(PRICE_LIST)
+
+    assert data['title'] == "MONAKO – BARSELONA SA POSETOM TRSTU"
+    assert (data['duration_days'], data['duration_nights'], data['transport_type']) == (5, 4, 'autobus')
+    assert data['description'].startswith("Posetite Trst") and len(data['description']) <= 300
+    assert data['destinations'] == ["Trst", "Monaco", "Costa Brava", "Padova"]
+    assert data['hotels'] == [
+        {'name': "H TOP OLYMPIC", 'category': "3*", 'location': "Calella"},
+        {'name': "H TOP PLANAMAR", 'category': "3*", 'location': "Malgrat de Mar"},
+    ]
+    assert data['dates'] == [
+        {'departure_date': "26.04.2025", 'return_date': "30.04.2025", 'price_regular': 399.0,
+         'price_discounted': 369.0, 'hotel': "H TOP OLYMPIC"},
+        {'departure_date': "26.04.2025", 'return_date': "30.04.2025", 'price_regular': 409.0,
+         'price_discounted': 379.0, 'hotel': "H TOP PLANAMAR"},
+    ]
+    assert data['includes'] == ["Prevoz turističkim autobusom",
+                                "Smeštaj u hotelu sa 3* u 1/2 sobama, na bazi polupansiona", "Usluge vodiča"]
+    assert data['excludes'] == ["Fakultativne izlete", "Zdravstveno osiguranje"]
+    assert data['additional_costs'] == {'single_room_supplement': 140.0}
+
+
+def test_complete_price_list_needs_no_llm():
+    extractor = RuleExtractor()
+
+    assert extractor.is_confident(extractor.extract(PRICE_LIST))
+    assert extractor.stats() == {'documents': 1, 'confident': 1, 'llm_skip_rate': 1.0, 'fields': 11}
+
+
+def test_named_month_ranges_and_headline_price():
+    text = ("PORTUGALSKA TURA\n7 DANA/6 NOĆENJA AVIONOM\n899€\n"
+            "Termin: 29. april 2025 - 05. maj 2025\nSmeštaj u Lisabonu 29. april - 02. maj 2025\n")
+
+    data = RuleExtractor().extract(text)
+
+    assert data['transport_type'] == 'avion'
+    # The Lisbon stay is shorter than the trip, only the 7-day range is a departure
+    assert data['dates'] == [{'departure_date': "29.04.2025", 'return_date': "05.05.2025",
+                              'price_regular': 899.0, 'price_discounted': None}]
+
+
+def test_ranges_across_new_year_take_the_previous_year():
+    text = "NOVA GODINA U PRAGU\n4 DANA/3 NOĆENJA AUTOBUSOM\n199 eur\n30.12 – 02.01.2026.\n"
+
+    data = RuleExtractor().extract(text)
+
+    assert [(date['departure_date'], date['return_date']) for date in data['dates']] == [("30.12.2025", "02.01.2026")]
+
+
+def test_unstructured_text_is_not_confident():
+    extractor = RuleExtractor()
+
+    data = extractor.extract("Letovanje u Grčkoj, pozovite nas za ponudu.")
+
+    assert data == {} and not extractor.is_confident(data)
+
+
+def test_rule_fields_override_the_llm():
+    rules = {'title': "MONAKO", 'duration_days': 5, 'additional_costs': {'single_room_supplement': 140.0}}
+    extracted = {'title': "Monako i Barselona", 'duration_days': 4, 'highlights': ["Gaudi"],
+                 'additional_costs': {'single_room_supplement': 120.0, 'optional_tours': 35.0}}
+
+    assert combine(rules, extracted) == {
+        'title': "MONAKO", 'duration_days': 5, 'highlights': ["Gaudi"],
+        'additional_costs': {'single_room_supplement': 140.0, 'optional_tours': 35.0},
+    }
+    assert combine(rules, {}) == rules
+
+
+def test_confident_documents_skip_the_llm(main_module, monkeypatch):
+    calls = []
+
+    class RecordingExtractor:
+        def extract_many(self, documents):
+            calls.append([name for name, _ in documents])
+            return {name: {'highlights': ["LLM"]} for name, _ in documents}
+
+    monkeypatch.setattr(main_module, 'extractor', RecordingExtractor())
+
+    data = main_module.extract_many_structured_data([("cenovnik.pdf", PRICE_LIST), ("pismo.txt", "Pozovite nas.")])
+
+    assert calls == [["pismo.txt"]]
+    assert data["cenovnik.pdf"]['duration_days'] == 5 and 'highlights' not in data["cenovnik.pdf"]
+    assert data["pismo.txt"] == {'highlights': ["LLM"]}
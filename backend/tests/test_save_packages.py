@@ -0,0 +1,92 @@
+import json
+
+import pytest
+from psycopg2.extras import RealDictCursor
+
+
+def package(filename, title, dates=(), replaces=None, **data):
+    return {
+        'filename': filename,
+        'structured_data': {'title': title, 'destinations': ["Lisabon"], 'dates': list(dates), **data},
+        'raw_content': f"{title} tekst",
+        'content_hash': f"hash-{filename}",
+        'replaces': replaces,
+    }
+
+
+MAY = {'departure_date': "10.05.2025", 'return_date': "17.05.2025", 'price_regular': "899 EUR", 'price_discounted': 849}
+JUNE = {'departure_date': "14.06.2025", 'price_regular': 949}
+
+
+def rows(main, sql, params=()):
+    with main.get_db_connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def test_package_row_follows_package_columns(main_module):
+    row = main_module.package_row(package("20250601_101500_lisabon.pdf", "Lisabon", [MAY, JUNE],
+                                          additional_costs={'single_room_supplement': 250}))
+    values = dict(zip(main_module.PACKAGE_COLUMNS, row))
+
+    assert len(row) == len(main_module.PACKAGE_COLUMNS)
+    assert values['source_name'] == "lisabon.pdf"
+    assert json.loads(values['prices']) == {'single_room_supplement': 250}
+    assert json.loads(values['hotels']) == []
+    assert (values['price_min'], values['price_max'], values['departure_months']) == (849.0, 949.0, [5, 6])
+
+
+def test_nothing_to_save_needs_no_connection(main_module, monkeypatch):
+    monkeypatch.setattr(main_module, 'get_db_connection', lambda: pytest.fail("connection opened"))
+
+    assert main_module.save_packages_to_database([]) == []
+
+
+def test_batch_is_upserted_in_one_transaction(main_module, postgres):
+    saved = main_module.save_packages_to_database([
+        package("a.pdf", "Prva verzija", [MAY]),
+        package("b.pdf", "Rim", [JUNE]),
+        package("a.pdf", "Druga verzija", [MAY, JUNE]),
+    ])
+
+    assert sorted(saved) == ["a.pdf", "b.pdf"]
+    stored = {row['filename']: row for row in rows(main_module, "SELECT * FROM travel_packages")}
+    assert stored["a.pdf"]['title'] == "Druga verzija"
+    assert (stored["a.pdf"]['price_min'], stored["a.pdf"]['price_max']) == (849.0, 949.0)
+    dates = rows(main_module, "SELECT position, departure_date, price_regular FROM travel_package_dates "
+                              "WHERE package_id = %s ORDER BY position", (stored["a.pdf"]['id'],))
+    assert [(row['position'], str(row['departure_date']), row['price_regular']) for row in dates] == [
+        (0, "2025-05-10", 899.0), (1, "2025-06-14", 949.0)]
+
+
+def test_upsert_updates_rows_and_replaces_their_dates(main_module, postgres):
+    main_module.save_packages_to_database([package("a.pdf", "Lisabon", [MAY, JUNE])])
+    first = rows(main_module, "SELECT id, created_at FROM travel_packages")[0]
+
+    main_module.save_packages_to_database([package("a.pdf", "Lisabon popust", [JUNE])])
+
+    stored = rows(main_module, "SELECT id, title, created_at, updated_at FROM travel_packages")
+    assert len(stored) == 1 and stored[0]['id'] == first['id'] and stored[0]['title'] == "Lisabon popust"
+    assert stored[0]['updated_at'] >= first['created_at']
+    assert len(rows(main_module, "SELECT * FROM travel_package_dates")) == 1
+
+
+def test_new_version_takes_over_the_previous_row(main_module, postgres):
+    main_module.save_packages_to_database([package("20250101_080000_lisabon.pdf", "Staro")])
+    old_id = rows(main_module, "SELECT id FROM travel_packages")[0]['id']
+
+    main_module.save_packages_to_database([
+        package("20250601_101500_lisabon.pdf", "Novo", replaces="20250101_080000_lisabon.pdf")
+    ])
+
+    stored = rows(main_module, "SELECT id, filename, title FROM travel_packages")
+    assert [(row['id'], row['filename'], row['title']) for row in stored] == [
+        (old_id, "20250601_101500_lisabon.pdf", "Novo")]
+
+
+def test_failed_save_reports_nothing_saved(main_module, postgres):
+    broken = package("a.pdf", "Lisabon")
+    broken['structured_data']['duration_days'] = "osam"
+
+    assert main_module.save_packages_to_database([broken, package("b.pdf", "Rim")]) == []
+    assert rows(main_module, "SELECT * FROM travel_packages") == []
@@ -0,0 +1,113 @@
+import pytest
+
+import session_store
+from session_store import SessionStore, MemorySessionStore, SQLiteSessionStore, MAX_SESSION_ID_LENGTH
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(session_store.time, 'time', lambda: now[0])
+    return now
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def make_store(request, tmp_path):
+    def make(**options):
+        if request.param == 'memory':
+            return MemorySessionStore(**options)
+        return SQLiteSessionStore(str(tmp_path / "sessions" / "sessions.db"), **options)
+    return make
+
+
+def message(role, content):
+    return {'role': role, 'content': content, 'timestamp': '2025-06-01T10:00:00'}
+
+
+def test_session_store_is_abstract():
+    with pytest.raises(TypeError):
+        SessionStore()
+
+
+def test_messages_are_numbered_and_only_the_last_ones_kept(make_store):
+    store = make_store(max_messages=3)
+
+    counts = [store.append('s1', message('user', f"poruka {n}")) for n in range(1, 6)]
+
+    assert counts == [1, 2, 3, 4, 5]
+    messages = store.get_messages('s1')
+    assert [m['content'] for m in messages] == ["poruka 3", "poruka 4", "poruka 5"]
+    assert [m['seq'] for m in messages] == [3, 4, 5]
+    assert [m['content'] for m in store.get_messages('s1', limit=1)] == ["poruka 5"]
+    assert store.get_messages('unknown') == []
+
+
+def test_summary_only_moves_forward(make_store):
+    store = make_store()
+    store.append('s1', message('user', "Zdravo"))
+
+    store.set_summary('s1', "Korisnik pita za Grcku", 4)
+    store.set_summary('s1', "stariji sazetak", 2)
+
+    assert store.get_summary('s1') == ("Korisnik pita za Grcku", 4)
+    assert store.get_summary('unknown') == ("", 0)
+
+
+def test_expired_session_starts_over(make_store, clock):
+    store = make_store(ttl=60)
+    store.append('s1', message('user', "prva"))
+    store.set_summary('s1', "sazetak", 1)
+
+    clock[0] += 61
+    assert store.get_messages('s1') == []
+    assert store.append('s1', message('user', "nova")) == 1
+    assert [m['content'] for m in store.get_messages('s1')] == ["nova"]
+    assert store.get_summary('s1') == ("", 0)
+
+
+def test_memory_store_evicts_least_recently_used_sessions():
+    store = MemorySessionStore(max_sessions=2)
+    store.append('a', message('user', "1"))
+    store.append('b', message('user', "2"))
+    store.get_messages('a')
+    store.append('c', message('user', "3"))
+
+    assert store.get_messages('b') == []
+    assert store.get_messages('a') and store.get_messages('c')
+    assert store.stats()['evictions'] == 1
+
+
+def test_sqlite_sessions_are_shared_between_store_instances(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    SQLiteSessionStore(path).append('s1', message('user', "Zdravo"))
+
+    other = SQLiteSessionStore(path)
+
+    assert other.append('s1', message('assistant', "Dobar dan")) == 2
+    assert other.stats() == {'backend': 'sqlite', 'sessions': 1}
+
+
+def test_sqlite_cleanup_removes_expired_sessions(tmp_path, clock):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"), ttl=60)
+    store.append('old', message('user', "1"))
+    clock[0] += 61
+    store.append('new', message('user', "2"))
+
+    assert store.cleanup() == 1
+    assert store.stats()['sessions'] == 1
+
+
+@pytest.mark.parametrize("session_id", ["x" * (MAX_SESSION_ID_LENGTH + 1), "a b", "id;drop", 42])
+def test_chat_rejects_invalid_session_ids(chat_app, session_id):
+    response = chat_app.app.test_client().post('/api/chat', json={'message': 'Zdravo', 'session_id': session_id})
+
+    assert response.status_code == 400
+    assert 'session_id' in response.get_json()['error']
+
+
+def test_chat_accepts_client_uuid_session_ids(chat_app):
+    session_id = "0b6f5f1e-2c1d-4c3e-9f4a-1d2e3f4a5b6c"
+
+    response = chat_app.app.test_client().post('/api/chat', json={'message': 'Zdravo', 'session_id': session_id})
+
+    assert response.status_code == 200 and response.get_json()['session_id'] == session_id
@@ -0,0 +1,173 @@
+import threading
+import time
+
+import pytest
+
+from startup import Startup
+
+
+def test_steps_run_in_order_and_report_ready():
+    calls = []
+    startup = Startup()
+    startup.add_step("database", lambda: calls.append("database"))
+    startup.add_step("chat", lambda: calls.append("chat"))
+
+    assert not startup.ready
+    assert startup.wait(5)
+
+    status = startup.status()
+    assert calls == ["database", "chat"]
+    assert status['ready'] and status['ready_after'] is not None
+    assert {name: (step['status'], step['attempts']) for name, step in status['steps'].items()} == {
+        'database': ('done', 1), 'chat': ('done', 1)}
+
+
+def test_failing_step_is_retried_until_it_succeeds():
+    attempts = []
+
+    def connect():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ConnectionError("database is down")
+
+    startup = Startup(retry_delay=0.01, max_retry_delay=0.02)
+    startup.add_step("database", connect)
+
+    assert startup.wait(5)
+    step = startup.status()['steps']['database']
+    assert step['attempts'] == 3 and step['status'] == 'done' and step['error'] is None
+
+
+def test_readiness_waits_for_the_failing_step():
+    release = threading.Event()
+
+    def connect():
+        if not release.is_set():
+            raise ConnectionError("database is down")
+
+    startup = Startup(retry_delay=0.01, max_retry_delay=0.01)
+    startup.add_step("database", connect)
+
+    assert not startup.wait(0.1)
+    step = startup.status()['steps']['database']
+    assert step['status'] in ('retrying', 'running') and step['error'] == "database is down"
+
+    release.set()
+    assert startup.wait(5)
+
+
+def test_optional_steps_do_not_gate_readiness():
+    release = threading.Event()
+    startup = Startup()
+    startup.add_step("database", lambda: None)
+    startup.add_step("warm_up", lambda: release.wait(5), required=False)
+
+    try:
+        assert startup.wait(5)
+        assert startup.status()['steps']['warm_up']['status'] in ('pending', 'running')
+    finally:
+        release.set()
+
+
+def test_failing_optional_step_is_given_up():
+    attempts = []
+
+    def warm_up():
+        attempts.append(1)
+        raise ConnectionError("LLM is down")
+
+    startup = Startup(retry_delay=0.01, max_retry_delay=0.01, optional_attempts=3)
+    startup.add_step("database", lambda: None)
+    startup.add_step("warm_up", warm_up, required=False)
+
+    assert startup.wait(5)
+    deadline = time.monotonic() + 5
+    while startup.status()['steps']['warm_up']['status'] != 'failed' and time.monotonic() < deadline:
+        time.sleep(0.01)
+    step = startup.status()['steps']['warm_up']
+    assert step['status'] == 'failed' and step['error'] == "LLM is down"
+    time.sleep(0.05)
+    assert len(attempts) == step['attempts'] == 3
+
+
+def test_background_step_degrades_instead_of_gating_readiness():
+    release = threading.Event()
+
+    def connect():
+        if not release.is_set():
+            raise ConnectionError("database is down")
+
+    startup = Startup(retry_delay=0.01, max_retry_delay=0.01)
+    startup.add_step("database", connect, background=True)
+    startup.add_step("chat", lambda: None)
+
+    assert startup.wait(5)
+    assert startup.status()['degraded'] == ["database"]
+
+    release.set()
+    deadline = time.monotonic() + 5
+    while startup.status()['degraded'] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert startup.status()['degraded'] == []
+    assert startup.status()['steps']['database']['status'] == 'done'
+
+
+def test_required_steps_come_before_optional_ones():
+    startup = Startup()
+    startup.add_step("warm_up", lambda: None, required=False)
+
+    with pytest.raises(ValueError):
+        startup.add_step("database", lambda: None)
+    startup.add_step("database", lambda: None, background=True)
+
+
+def test_start_runs_the_steps_once():
+    calls = []
+    startup = Startup()
+    startup.add_step("database", lambda: calls.append(1))
+
+    startup.start()
+    startup.start()
+
+    assert startup.wait(5) and calls == [1]
+
+
+@pytest.fixture
+def starting(main_module, monkeypatch):
+    """main with a startup that stays pending until the test releases it"""
+    release = threading.Event()
+    pending = Startup()
+    pending.add_step("database", lambda: release.wait(5))
+    monkeypatch.setattr(main_module, 'startup', pending)
+    monkeypatch.setattr(main_module, 'STARTUP_WAIT_TIMEOUT', 0.05)
+    yield main_module
+    release.set()
+
+
+def test_requests_get_503_until_startup_finishes(starting):
+    client = starting.app.test_client()
+
+    response = client.post('/api/chat', json={'message': 'Zdravo'})
+
+    assert response.status_code == 503 and response.headers['Retry-After'] == '5'
+
+
+def test_probes_answer_while_starting(starting):
+    client = starting.app.test_client()
+
+    assert client.get('/health/live').status_code == 200
+    ready = client.get('/health/ready')
+    assert ready.status_code == 503
+    assert ready.get_json()['steps']['database']['status'] in ('pending', 'running')
+
+
+def test_database_outage_is_reported_as_degraded(main_module, monkeypatch):
+    startup = Startup(retry_delay=60)
+    startup.add_step("database", lambda: (_ for _ in ()).throw(ConnectionError("database is down")), background=True)
+    startup.add_step("chat", lambda: None)
+    monkeypatch.setattr(main_module, 'startup', startup)
+    assert startup.wait(5)
+
+    ready = main_module.app.test_client().get('/health/ready')
+
+    assert ready.status_code == 200 and ready.get_json()['degraded'] == ["database"]
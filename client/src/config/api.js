@@ -2,6 +2,7 @@ export const API_CONFIG = {
   BASE_URL: 'http://192.168.0.106:8000',
   ENDPOINTS: {
     CHAT: '/api/chat',
+    CHAT_STREAM: '/api/chat/stream',
     UPLOAD: '/api/upload',
     UPLOAD_MULTIPLE: '/api/upload-multiple',
     TRAVEL_PACKAGES: '/api/travel-packages',
@@ -39,4 +40,42 @@ export const apiRequest = async (endpoint, options = {}) => {
     console.error('API request failed:', error);
     throw error;
   }
+};
+
+// POST to a Server-Sent Events endpoint and call onEvent(event, data) for each event
+export const streamRequest = async (endpoint, body, onEvent) => {
+  const response = await fetch(`${API_CONFIG.BASE_URL}${endpoint}`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify(body),
+  });
+
+  if (!response.ok || !response.body) {
+    throw new Error(`HTTP error! status: ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    // Events are separated by a blank line
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const raw = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+
+      let event = 'message';
+      let data = '';
+      for (const line of raw.split('\n')) {
+        if (line.startsWith('event:')) event = line.slice(6).trim();
+        else if (line.startsWith('data:')) data += line.slice(5).trim();
+      }
+      if (data) onEvent(event, JSON.parse(data));
+    }
+  }
 };
\ No newline at end of file
@@ -2,7 +2,7 @@ import React, { useState, useEffect, useRef } from "react";
 import { MessageCircle, Send, X, User, Bot, Paperclip } from "lucide-react";
 import { Link, useParams } from "react-router-dom";
 import parse from 'html-react-parser';
-import { apiRequest, API_CONFIG } from "../config/api";
+import { streamRequest, API_CONFIG } from "../config/api";
 import { v4 as uuidv4 } from "uuid";
 const ChatPage = () => {
   const params = useParams();
@@ -61,37 +61,45 @@ const ChatPage = () => {
     setInputMessage("");
     setIsLoading(true);
 
-    try {
-      const response = await apiRequest(API_CONFIG.ENDPOINTS.CHAT, {
-        method: "POST",
-        body: JSON.stringify({
-          message: inputMessage,
-          session_id: sessionId,
-        }),
+    const botId = Date.now() + 1;
+    const updateBotMessage = (fields) =>
+      setMessages((prev) => {
+        const exists = prev.some((message) => message.id === botId);
+        const base = { id: botId, role: "assistant", content: "", timestamp: new Date().toISOString() };
+        return exists
+          ? prev.map((message) => (message.id === botId ? { ...message, ...fields(message) } : message))
+          : [...prev, { ...base, ...fields(base) }];
       });
 
-      const botMessage = {
-        id: Date.now() + 1,
-        role: "assistant",
-        content: response.response.content,
-        timestamp: response.timestamp,
-        sources: response.sources || [],
-        responseTime: response.response_time,
-        canReserve: response.response.reserve,
-        email: response.response.gmail,
-      };
-
-      setMessages((prev) => [...prev, botMessage]);
-      setSessionId(response.session_id);
+    try {
+      // Tokens are shown as they arrive, the final event carries the parsed answer
+      await streamRequest(
+        API_CONFIG.ENDPOINTS.CHAT_STREAM,
+        { message: inputMessage, session_id: sessionId },
+        (event, data) => {
+          if (event === "token") {
+            setIsLoading(false);
+            updateBotMessage((message) => ({ content: message.content + data.text }));
+          } else if (event === "done") {
+            updateBotMessage(() => ({
+              content: data.response.content,
+              timestamp: data.timestamp,
+              sources: data.sources || [],
+              responseTime: data.processing_time,
+              canReserve: data.response.reserve,
+              email: data.response.gmail,
+            }));
+            setSessionId(data.session_id);
+          } else if (event === "error") {
+            updateBotMessage(() => ({ content: data.response.content }));
+          }
+        }
+      );
     } catch (error) {
       console.error("Chat error:", error);
-      const errorMessage = {
-        id: Date.now() + 1,
-        role: "assistant",
+      updateBotMessage(() => ({
         content: "Izvinjavam se, došlo je do greške. Molimo pokušajte ponovo.",
-        timestamp: new Date().toISOString(),
-      };
-      setMessages((prev) => [...prev, errorMessage]);
+      }));
     } finally {
       setIsLoading(false);
     }